@@ -0,0 +1,126 @@
+import os
+import time
+
+from PIL import features
+
+from renderer import render_from_data
+
+# 扩展名 -> Pillow 格式名
+ANIMATION_FORMATS = {
+    '.gif': 'GIF',
+    '.apng': 'PNG',
+    '.webp': 'WEBP',
+}
+DEFAULT_DURATION_MS = 100
+
+def animation_format(path):
+    """
+    根据扩展名返回动画格式（'GIF'、'PNG' 即 APNG、'WEBP'）。
+    :raises ValueError: 扩展名不受支持，或当前的 Pillow 不支持 WebP。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ANIMATION_FORMATS:
+        raise ValueError(f"不支持的动画格式：{ext or '无扩展名'}，可选值为 {', '.join(ANIMATION_FORMATS)}。")
+    fmt = ANIMATION_FORMATS[ext]
+    if fmt == 'WEBP' and not features.check('webp'):
+        raise ValueError("当前安装的 Pillow 不支持 WebP。")
+    return fmt
+
+def merge_identical_frames(images, durations):
+    """
+    合并内容完全相同的相邻帧，把它们的持续时间累加到第一帧上。
+    :return: (images, durations) 元组。
+    """
+    merged_images, merged_durations = [], []
+    previous_bytes = None
+    for img, duration in zip(images, durations):
+        img_bytes = img.tobytes()
+        if merged_images and img_bytes == previous_bytes and img.mode == merged_images[-1].mode:
+            merged_durations[-1] += duration
+            continue
+        merged_images.append(img)
+        merged_durations.append(duration)
+        previous_bytes = img_bytes
+    return merged_images, merged_durations
+
+def export_animation(images, path, duration_ms=DEFAULT_DURATION_MS, loop=0):
+    """
+    将帧序列保存为动画 GIF、APNG 或动画 WebP，格式由扩展名决定（.gif / .apng / .webp）。
+
+    GIF 直接使用 "P" 模式帧自带的项目调色板，不做颜色量化；索引0作为透明色。
+    APNG 和 WebP（无损）使用 RGBA 帧。相同的相邻帧会被合并为一帧并累加持续时间。
+
+    :param images: 帧图像列表。GIF 应传入 render_from_data(..., indexed=True) 的结果。
+    :param duration_ms: 每帧的持续时间（毫秒），可以是单个整数或与帧数相同的列表。
+    :param loop: 循环次数，0 表示无限循环。
+    :return: 描述本次导出的字典。
+    """
+    if not images:
+        raise ValueError("没有可导出的图像。")
+    fmt = animation_format(path)
+    start = time.perf_counter()
+
+    durations = list(duration_ms) if isinstance(duration_ms, (list, tuple)) else [duration_ms] * len(images)
+    if len(durations) != len(images):
+        raise ValueError("持续时间列表的长度必须与帧数相同。")
+    frames, durations = merge_identical_frames(images, [int(d) for d in durations])
+
+    options = {'save_all': True, 'append_images': frames[1:], 'duration': durations, 'loop': loop}
+    if fmt == 'GIF':
+        if all(img.mode == 'P' for img in frames):
+            # 每一帧都用透明索引清空后再绘制，避免透明区域残留上一帧的内容；
+            # 关闭调色板优化，使输出的颜色索引与项目调色板一一对应
+            options.update(transparency=0, disposal=2, optimize=False)
+    else:
+        frames = [img if img.mode == 'RGBA' else img.convert('RGBA') for img in frames]
+        options['append_images'] = frames[1:]
+        if fmt == 'WEBP':
+            options.update(lossless=True)
+    frames[0].save(path, fmt, **options)
+
+    return {
+        'path': path,
+        'format': 'APNG' if fmt == 'PNG' else fmt,
+        'frames': len(images),
+        'encoded_frames': len(frames),
+        'bytes': os.path.getsize(path),
+        'seconds': round(time.perf_counter() - start, 6),
+    }
+
+def export_animation_from_data(data, path, transparent_bg=True, duration_ms=None, loop=0):
+    """
+    渲染项目数据并导出为动画。GIF 使用索引色渲染，其他格式使用 RGBA 渲染。
+
+    :param data: 遵循项目JSON模式的字典。
+    :param duration_ms: 每帧的持续时间（毫秒），默认使用数据中的 'duration_ms'，否则为 DEFAULT_DURATION_MS。
+    :return: 与 export_animation 相同的字典。
+    """
+    indexed = animation_format(path) == 'GIF'
+    images, _ = render_from_data(data, transparent_bg, delta=True, indexed=indexed)
+    if duration_ms is None:
+        duration_ms = data.get('duration_ms', DEFAULT_DURATION_MS)
+    return export_animation(images, path, duration_ms, loop)
+
+# 当该脚本作为主程序运行时
+if __name__ == '__main__':
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description='将 JSON 动画导出为 GIF、APNG 或动画 WebP。')
+    parser.add_argument('json_file', type=str, help='JSON 文件的路径。')
+    parser.add_argument('output_file', type=str, help='输出文件的路径，格式由扩展名决定 (.gif / .apng / .webp)。')
+    parser.add_argument('--duration', type=int, default=None, help="每帧的持续时间 (ms)，默认使用 JSON 中的 'duration_ms' 或 100。")
+    parser.add_argument('--loop', type=int, default=0, help='循环次数，0 表示无限循环。')
+    parser.add_argument('--opaque', action='store_true', help='使用默认的纯色背景而不是透明背景。')
+    args = parser.parse_args()
+
+    try:
+        with open(args.json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        result = export_animation_from_data(data, args.output_file, not args.opaque, args.duration, args.loop)
+    except (ValueError, KeyError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"成功将 {result['frames']} 帧（编码 {result['encoded_frames']} 帧）导出为 {result['format']}: {result['path']}")
@@ -1,14 +1,26 @@
+import functools
+from collections import OrderedDict
 import tkinter as tk
-from tkinter import scrolledtext, filedialog, messagebox, ttk
+from tkinter import messagebox, ttk
 import json
 import os
-from PIL import Image, ImageTk
+import time
+from PIL import ImageTk
 # 从渲染器模块导入核心函数
-from renderer import render_from_data, create_sprite_sheet
+from renderer import render_from_data, apply_pixel_updates, DELTA_MAX_CHANGED_RATIO
 from app_state import AppState
 from file_io import FileIOManager
 from ui_manager import UIManager
 from event_handlers import EventHandlers
+from json_sync import JsonTextSync
+from render_worker import RenderWorker
+from export_pipeline import ExportPipeline, DEFAULT_PRESET
+from perf_stats import stats, timed
+from stats_panel import StatsPanel
+from asset_browser import AssetBrowser
+from history import History
+from tools import TOOL_PENCIL
+from viewport import Viewport, VIEW_CACHE_SIZE
 
 # 主应用程序类
 class PixelArtApp:
@@ -31,10 +43,29 @@ class PixelArtApp:
         self.file_io = FileIOManager(self)
         self.ui = UIManager(self)
         self.event_handlers = EventHandlers(self)
+        self.json_sync = JsonTextSync(self)
+        self.render_worker = RenderWorker(self)
+        self.export_pipeline = ExportPipeline(self)
+        self.stats_panel = StatsPanel(self)
+        self.asset_browser = AssetBrowser(self)
+        self.history = History()
+        self.viewport = Viewport()
+        self.view_photo = None  # 当前显示在视口中的 PhotoImage
+        self.view_photos = OrderedDict()  # id(视口图像) -> (视口图像, PhotoImage)，最多 VIEW_CACHE_SIZE 个
+        self.displayed_image = None  # 当前显示在视口中的帧图像
+        self.render_started = None  # 当前渲染任务的开始时间，用于记录 render_image 区段
 
         # 初始化Tkinter变量
         self.transparent_var = tk.BooleanVar()
         self.duration_var = tk.StringVar(value='100')
+        self.export_preset_var = tk.StringVar(value=DEFAULT_PRESET)
+        self.export_frames_var = tk.BooleanVar()
+        self.indexed_var = tk.BooleanVar()
+        self.tool_var = tk.StringVar(value=TOOL_PENCIL)
+        self.perf_stats_var = tk.BooleanVar()
+        self.perf_stats_var.trace_add('write', self.toggle_perf_stats)
+        # 切换透明背景时，已缓存的瓦片不再有效
+        self.transparent_var.trace_add('write', self.invalidate_preview_cache)
 
         # --- 设置UI ---
         self.ui.setup_ui()
@@ -46,24 +77,55 @@ class PixelArtApp:
 
     # 渲染图像或动画的函数
     def render_image(self):
+        """
+        在后台线程中解析和渲染JSON，主线程保持响应。
+        再次点击渲染会取消仍在进行的渲染并重新开始。
+        """
         # 如果有正在播放的动画，先暂停
         if self.state.is_playing:
             self.pause_animation()
 
+        # 先写出尚未同步到文本框的编辑，保证读取到的是最新内容
+        self.json_sync.flush()
         json_string = self.json_text.get("1.0", tk.END)
         if not json_string.strip():
             messagebox.showwarning("警告", "JSON输入为空。")
             return
 
+        self.render_progress.config(value=0)
+        self.render_started = time.perf_counter()
+        transparent_bg, indexed = settings = self._render_settings()
+        self.render_worker.start(json_string, transparent_bg,
+                                 functools.partial(self._on_render_done, render_settings=settings),
+                                 self._on_render_error, self._on_render_progress, indexed=indexed)
+
+    def cancel_render(self):
+        """取消正在进行的后台渲染，例如用户修改了JSON输入时。"""
+        if self.render_worker.busy:
+            self.render_worker.cancel()
+            self.render_started = None
+            self.render_progress.config(value=0)
+
+    def _on_render_progress(self, done, total):
+        """更新渲染进度条，由 RenderWorker 在主线程中调用。"""
+        self.render_progress.config(maximum=total, value=done)
+
+    def _on_render_done(self, data, pil_images, sprite_sheet, render_settings=None):
+        """
+        后台渲染完成后在主线程中更新状态和界面。
+        :param render_settings: 渲染这些图像时使用的 (透明背景, 索引色) 选项。
+        """
+        if self.render_started is not None:
+            # render_image 区段覆盖从点击渲染到结果返回主线程的全过程
+            stats.record('render_image', time.perf_counter() - self.render_started)
+            self.render_started = None
         try:
-            data = json.loads(json_string)
-            use_transparency = self.transparent_var.get()
-
             # 从JSON数据中提取并存储关键信息
             self.state.canvas_size = tuple(data.get('canvas_size', (16, 16))) # 提供默认值以防万一
             self.state.palette = data.get('palette', {})
             
-            # 根据JSON中是否存在'frames'或'pixels'来确定模式
+            # 根据JSON中是否存在'frames'或'pixels'来确定模式；
+            # 渲染线程已把像素数据转换为紧凑存储（FrameStore / Frame），编辑直接写入其缓冲区
             if 'frames' in data:
                 self.state.frames_data = data.get('frames', [])
                 self.state.pixels_data = None # 确保像素数据被清空
@@ -74,8 +136,14 @@ class PixelArtApp:
                 self.state.frames_data = None
                 self.state.pixels_data = None
             
-            # 调用渲染器核心函数，获取Pillow图像列表和可能的雪碧图
-            self.state.pil_images, self.state.sprite_sheet = render_from_data(data, transparent_bg=use_transparency)
+            # 像素数据已被替换，旧的撤销记录和尚未写入的笔触采样点都不再适用
+            self.event_handlers.stroke.cancel()
+            self.history.clear()
+
+            # 渲染器核心函数返回的Pillow图像列表和可能的雪碧图
+            self.state.pil_images, self.state.sprite_sheet = pil_images, sprite_sheet
+            self.state.render_settings = render_settings
+            self.invalidate_preview_cache()
             
             if not self.state.pil_images:
                 messagebox.showwarning("警告", "无法从JSON渲染任何帧。")
@@ -88,37 +156,107 @@ class PixelArtApp:
             self.play_animation() # 自动播放
             self.update_palette_ui() # 更新调色板UI
 
-        except json.JSONDecodeError:
-            messagebox.showerror("错误", "无效的JSON格式。")
-            self.save_button.config(state=tk.DISABLED)
-            self.update_animation_controls() # 禁用控件
         except Exception as e:
-            messagebox.showerror("错误", f"渲染失败: {e}")
-            self.save_button.config(state=tk.DISABLED)
-            self.update_animation_controls() # 禁用控件
+            self._on_render_error(e)
 
+    def _on_render_error(self, error):
+        """后台渲染失败时在主线程中报告错误。"""
+        self.render_started = None
+        self.render_progress.config(value=0)
+        if isinstance(error, json.JSONDecodeError):
+            messagebox.showerror("错误", "无效的JSON格式。")
+        else:
+            messagebox.showerror("错误", f"渲染失败: {error}")
+        self.save_button.config(state=tk.DISABLED)
+        self.update_animation_controls() # 禁用控件
+
+    def toggle_perf_stats(self, *args):
+        """根据“性能统计”复选框启用或禁用计时，并显示或关闭统计面板。"""
+        enabled = self.perf_stats_var.get()
+        stats.enabled = enabled
+        if enabled:
+            self.stats_panel.show()
+        else:
+            self.stats_panel.hide()
+
+    def invalidate_preview_cache(self, *args):
+        """清空视口的瓦片缓存。帧被重新渲染或透明背景选项改变时调用。"""
+        self.viewport.clear()
+
+    def _render_settings(self):
+        """界面上当前的渲染选项 (透明背景, 索引色)。"""
+        return self.transparent_var.get(), self.indexed_var.get()
+
+    def _render_data(self, frames):
+        """用当前的画布尺寸、调色板和给定的帧（省略时为单帧像素）构建渲染用的数据字典。"""
+        render_data = {'canvas_size': self.state.canvas_size, 'palette': self.state.palette}
+        if frames is not None:
+            render_data['frames'] = frames
+        else:
+            render_data['pixels'] = self.state.pixels_data
+        return render_data
+
+    def _rerender_all(self):
+        """
+        用界面上当前的渲染选项重新渲染所有帧和雪碧图。
+        已缓存的图像是用另一组选项渲染的，不能只按新选项修补其中几帧或几个像素。
+        """
+        transparent_bg, indexed = settings = self._render_settings()
+        pil_images, sprite_sheet = render_from_data(self._render_data(self.state.frames_data), transparent_bg,
+                                                    delta=True, indexed=indexed)
+        self.state.pil_images, self.state.sprite_sheet = pil_images, sprite_sheet
+        self.state.render_settings = settings
+        self.invalidate_preview_cache()
+        if pil_images:
+            self.state.current_frame_index = min(self.state.current_frame_index, len(pil_images) - 1)
+            self._update_display_image(pil_images[self.state.current_frame_index])
+
+    @timed('_update_display_image')
     def _update_display_image(self, pil_image):
         """
-        更新预览区域的图像，处理缩放和显示。
+        更新预览区域的图像：由视口拼接当前缩放和平移下可见的瓦片，画面没有变化时直接返回。
         :param pil_image: 要显示的Pillow图像对象。
         """
-        preview_size = 256  # 预览区域的大小
-        width, height = pil_image.size
-        
-        # 计算缩放比例以适应预览区域
-        scale = min(preview_size / width, preview_size / height) if width > 0 and height > 0 else 1
-        new_size = (int(width * scale), int(height * scale))
-        
-        # 使用最近邻插值以保持像素风格
-        preview_image = pil_image.resize(new_size, Image.NEAREST)
-        
-        # 将Pillow图像转换为Tkinter PhotoImage
-        tk_image = ImageTk.PhotoImage(preview_image)
-        
-        # 更新Label以显示新图像
-        self.image_label.config(image=tk_image, text="")
-        # 必须保留对PhotoImage的引用，否则它会被垃圾回收
-        self.image_label.image = tk_image
+        self.displayed_image = pil_image
+        view_image = self.viewport.render(pil_image)
+        if view_image is None:
+            return
+        zoom = self.viewport.zoom
+        self.zoom_label.config(text=f"{zoom}x" if zoom >= 1 else f"1/{round(1 / zoom)}x")
+
+        entry = self.view_photos.get(id(view_image))
+        if entry is not None and entry[0] is view_image:
+            # 视口缓存命中（例如固定缩放和平移下播放动画）：直接切换到已有的 PhotoImage
+            self.view_photos.move_to_end(id(view_image))
+            photo = entry[1]
+        else:
+            if len(self.view_photos) >= VIEW_CACHE_SIZE:
+                # 回收最久未使用的 PhotoImage，避免每次重绘都重新分配
+                _, (_, photo) = self.view_photos.popitem(last=False)
+                photo.paste(view_image)
+            else:
+                photo = ImageTk.PhotoImage(view_image)
+            # 同时保存视口图像的引用，保证 id() 在缓存期间不会被复用
+            self.view_photos[id(view_image)] = (view_image, photo)
+        if photo is not self.view_photo:
+            self.view_photo = photo
+            # 更新Label以显示新图像；必须保留对PhotoImage的引用，否则它会被垃圾回收
+            self.image_label.config(image=photo, text="")
+            self.image_label.image = photo
+
+    def _update_display_pixels(self, pil_image, cells):
+        """
+        只修补视口瓦片中发生变化的像素块，再重新拼接可见区域，而不是重新缩放整张图像。
+        :param pil_image: 已经更新过像素的原始帧图像。
+        :param cells: 发生变化的 (行, 列) 坐标序列。
+        """
+        self.viewport.update_cells(pil_image, cells)
+        self._update_display_image(pil_image)
+
+    def refresh_view(self):
+        """视口的缩放或平移改变后重绘当前显示的帧。"""
+        if self.displayed_image is not None:
+            self._update_display_image(self.displayed_image)
 
     def play_animation(self):
         """开始或恢复动画播放。"""
@@ -149,6 +287,7 @@ class PixelArtApp:
         current_pil_image = self.state.pil_images[self.state.current_frame_index]
         self._update_display_image(current_pil_image)
         self.update_animation_controls() # 更新帧指示器
+        stats.tick('playback')
 
         self.state.current_frame_index = (self.state.current_frame_index + 1) % len(self.state.pil_images)
         
@@ -226,94 +365,97 @@ class PixelArtApp:
             first_key = list(self.state.palette.keys())[0]
             self.event_handlers.select_color(first_key)
 
+    @timed('update_canvas_image')
     def update_canvas_image(self):
         """
         根据当前帧数据或单帧像素数据，重新渲染并更新画布上的图像。
         """
         if not self.state.canvas_size or (self.state.frames_data is None and self.state.pixels_data is None):
             return
+        if self.state.render_settings != self._render_settings():
+            # 渲染选项在上次渲染之后改变了：只重新渲染当前帧会让各帧和雪碧图混用两种选项
+            self._rerender_all()
+            return
 
-        # 准备用于渲染的数据
-        render_data = {
-            'canvas_size': self.state.canvas_size,
-            'palette': self.state.palette,
-        }
-
-        # 根据是动画还是单帧，准备不同的数据结构
+        # 根据是动画还是单帧，准备不同的数据结构；动画只渲染和更新当前显示的帧
         if self.state.frames_data is not None:
-            # 如果是动画，我们只渲染和更新当前显示的帧
-            current_frame_data = self.state.frames_data[self.state.current_frame_index]
-            render_data['frames'] = [current_frame_data]
-        elif self.state.pixels_data is not None:
-            # 如果是单张图片
-            render_data['pixels'] = self.state.pixels_data
+            render_data = self._render_data([self.state.frames_data[self.state.current_frame_index]])
+        else:
+            render_data = self._render_data(None)
 
         # 使用渲染器生成新的Pillow图像，并正确解包返回值
-        pil_images, _ = render_from_data(render_data, transparent_bg=self.transparent_var.get())
+        transparent_bg, indexed = self.state.render_settings
+        pil_images, _ = render_from_data(render_data, transparent_bg=transparent_bg, indexed=indexed)
 
         if pil_images:
             new_pil_image = pil_images[0]
             
             # 更新我们存储的Pillow图像列表
             if self.state.frames_data is not None:
-                # 对于动画，替换当前帧的图像
+                # 对于动画，替换当前帧的图像，并丢弃旧帧缓存的瓦片
+                old_image = self.state.pil_images[self.state.current_frame_index]
+                self.viewport.discard(old_image)
                 self.state.pil_images[self.state.current_frame_index] = new_pil_image
             else:
                 # 对于单帧图像，整个列表就是这个新图像
+                self.invalidate_preview_cache()
                 self.state.pil_images = [new_pil_image]
 
             # 使用新方法更新显示
             self._update_display_image(new_pil_image)
 
-    def _update_json_text(self):
+    def update_canvas_pixels(self, cells):
         """
-        根据当前的应用状态，重建JSON数据并更新文本框，同时优化可读性。
+        增量更新：只把发生变化的单元格写入当前帧已缓存的图像、雪碧图和预览，
+        每次笔触的开销与修改的像素数成正比，而不是与画布面积成正比。
+        :param cells: 发生变化的 (行, 列) 坐标序列。
         """
-        if not self.state.canvas_size:
+        if not cells:
             return
 
-        # 手动构建JSON字符串以获得更好的格式
-        lines = [
-            "{",
-            f'    "canvas_size": {json.dumps(self.state.canvas_size)},',
-            f'    "palette": {json.dumps(self.state.palette, indent=4)},'
-        ]
-
-        # 格式化 'pixels' 或 'frames' 数据
         if self.state.frames_data is not None:
-            lines.append('    "frames": [')
-            num_frames = len(self.state.frames_data)
-            for frame_index, frame in enumerate(self.state.frames_data):
-                lines.append('        [')
-                num_rows = len(frame)
-                for row_index, row in enumerate(frame):
-                    row_str = f'            {json.dumps(row)}'
-                    if row_index < num_rows - 1:
-                        row_str += ','
-                    lines.append(row_str)
-                
-                frame_end = '        ]'
-                if frame_index < num_frames - 1:
-                    frame_end += ','
-                lines.append(frame_end)
-            lines.append('    ]')
-
+            frame_index = self.state.current_frame_index
+            pixel_data = self.state.frames_data[frame_index]
         elif self.state.pixels_data is not None:
-            lines.append('    "pixels": [')
-            num_rows = len(self.state.pixels_data)
-            for row_index, row in enumerate(self.state.pixels_data):
-                row_str = f'        {json.dumps(row)}'
-                if row_index < num_rows - 1:
-                    row_str += ','
-                lines.append(row_str)
-            lines.append('    ]')
-        
-        lines.append("}")
-        json_string = "\n".join(lines)
+            frame_index = 0
+            pixel_data = self.state.pixels_data
+        else:
+            return
+
+        if frame_index >= len(self.state.pil_images) or self.state.render_settings != self._render_settings():
+            # 还没有可供增量更新的图像，或者已缓存的图像是用另一组渲染选项生成的，回退到完整渲染
+            self.update_canvas_image()
+            return
+
+        canvas_width, canvas_height = self.state.canvas_size
+        if len(cells) > DELTA_MAX_CHANGED_RATIO * canvas_width * canvas_height:
+            # 大面积修改（例如填充）时完整渲染该帧比逐像素更新更快，雪碧图中对应的位置整块替换
+            self.update_canvas_image()
+            if self.state.sprite_sheet is not None:
+                new_pil_image = self.state.pil_images[frame_index]
+                self.state.sprite_sheet.paste(new_pil_image, (frame_index * new_pil_image.width, 0))
+            return
 
-        # 更新文本框内容
-        self.json_text.delete('1.0', tk.END)
-        self.json_text.insert(tk.END, json_string)
+        # 已缓存的图像与当前选项一致；索引色图像由 apply_pixel_updates 按图像模式处理
+        use_transparency = self.state.render_settings[0]
+        pil_image = self.state.pil_images[frame_index]
+        apply_pixel_updates(pil_image, pixel_data, cells, self.state.palette, use_transparency)
+
+        if self.state.sprite_sheet is not None:
+            # 同步更新雪碧图中对应帧的位置，保存时无需重新拼接
+            frame_width = pil_image.width
+            apply_pixel_updates(self.state.sprite_sheet, pixel_data, cells, self.state.palette,
+                                use_transparency, offset=(frame_index * frame_width, 0))
+
+        self._update_display_pixels(pil_image, cells)
+
+    @timed('_update_json_text')
+    def _update_json_text(self):
+        """
+        根据当前的应用状态，重建JSON数据并立即更新文本框，同时优化可读性。
+        编辑过程中的增量同步由 JsonTextSync 负责。
+        """
+        self.json_sync.full_sync()
 
 # 主执行块
 if __name__ == "__main__":
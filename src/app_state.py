@@ -4,10 +4,11 @@ class AppState:
         self.is_playing = False
         self.pil_images = []
         self.sprite_sheet = None # 用于存储渲染好的雪碧图
+        self.render_settings = None # pil_images 和 sprite_sheet 渲染时使用的 (透明背景, 索引色) 选项
         self.current_frame_index = 0
         self.canvas_size = None
-        self.frames_data = None
-        self.pixels_data = None
+        self.frames_data = None # 动画帧：FrameStore，无法紧凑存储时为JSON中的帧列表
+        self.pixels_data = None # 单帧像素：Frame，无法紧凑存储时为JSON中的行列表
         self.palette = None
         self.selected_color = None
         self.palette_buttons = {}
\ No newline at end of file
@@ -0,0 +1,171 @@
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+from PIL import Image, ImageTk
+
+from asset_index import AssetIndex, DEFAULT_THUMB_SIZE
+
+# 主线程检查缩略图生成进度的间隔（毫秒）
+ASSET_POLL_MS = 50
+
+class AssetBrowser:
+    """
+    素材浏览器：列出素材目录中的项目文件及其缩略图，双击即可加载并渲染。
+
+    打开时先显示索引中已缓存的缩略图，再由后台线程只重新渲染新增或变化的文件；
+    工作线程不接触Tk对象，结果通过队列交给主线程，由 root.after 轮询后更新列表。
+    """
+    def __init__(self, app):
+        """
+        :param app: PixelArtApp 的实例，用于访问素材目录、root 和文件加载。
+        """
+        self.app = app
+        self.cache_dir = os.path.join(app.project_root, '.cache', 'thumbnails')
+        self.index = None
+        self.window = None
+        self.tree = None
+        self.status_label = None
+        self.photos = {}  # 相对路径 -> PhotoImage，必须保留引用，否则会被垃圾回收
+        self.updates = queue.Queue()
+        self.cancel_event = None
+        self.poll_job = None
+
+    def show(self):
+        """打开（或提到前台）素材浏览器窗口，并在后台刷新缩略图。"""
+        if self.window is not None:
+            self.window.lift()
+            return
+        if self.index is None:
+            self.index = AssetIndex(self.app.assets_dir, self.cache_dir)
+
+        self.window = tk.Toplevel(self.app.root)
+        self.window.title("素材浏览器")
+        self.window.geometry("420x520")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+
+        top_frame = tk.Frame(self.window)
+        top_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Button(top_frame, text="刷新", command=self.refresh).pack(side=tk.LEFT)
+        self.status_label = tk.Label(top_frame, text="")
+        self.status_label.pack(side=tk.LEFT, padx=5)
+
+        # 行高需要容纳缩略图
+        style = ttk.Style(self.window)
+        style.configure('AssetBrowser.Treeview', rowheight=DEFAULT_THUMB_SIZE + 6)
+        tree_frame = tk.Frame(self.window)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        self.tree = ttk.Treeview(tree_frame, columns=('canvas', 'frames'), style='AssetBrowser.Treeview')
+        self.tree.heading('#0', text='素材')
+        self.tree.column('#0', width=240)
+        self.tree.heading('canvas', text='尺寸')
+        self.tree.column('canvas', width=70, anchor='center')
+        self.tree.heading('frames', text='帧数')
+        self.tree.column('frames', width=50, anchor='e')
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree.bind('<Double-1>', self._on_open)
+        self.tree.bind('<Return>', self._on_open)
+
+        self.refresh()
+
+    def hide(self):
+        """关闭窗口并停止后台刷新。已生成的缩略图和索引保留在缓存中。"""
+        self._stop_worker()
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+            self.tree = None
+            self.status_label = None
+            self.photos.clear()
+
+    def refresh(self):
+        """重新扫描素材目录：立即列出所有素材和已缓存的缩略图，然后在后台渲染变化的文件。"""
+        self._stop_worker()
+        rel_paths, stale = self.index.scan()
+
+        for item in set(self.tree.get_children()) - set(rel_paths):
+            self.tree.delete(item)
+            self.photos.pop(item, None)
+        for position, rel_path in enumerate(rel_paths):
+            if not self.tree.exists(rel_path):
+                self.tree.insert('', position, iid=rel_path, text=rel_path)
+            if rel_path not in stale:
+                self._show_entry(rel_path, self.index.get(rel_path))
+
+        if not stale:
+            self.status_label.config(text=f"{len(rel_paths)} 个素材")
+            return
+        self.status_label.config(text=f"正在生成缩略图 0/{len(stale)}")
+        self.cancel_event = threading.Event()
+        thread = threading.Thread(target=self._run, args=(self.cancel_event, len(stale)), daemon=True)
+        thread.start()
+        self.poll_job = self.app.root.after(ASSET_POLL_MS, self._poll)
+
+    def _stop_worker(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+        if self.poll_job:
+            self.app.root.after_cancel(self.poll_job)
+            self.poll_job = None
+
+    def _run(self, cancel_event, total):
+        """工作线程入口：重新渲染变化的素材，结果通过队列交给主线程。"""
+        def on_update(rel_path, entry):
+            if not cancel_event.is_set():
+                self.updates.put((cancel_event, rel_path, entry))
+        self.index.refresh(cancel_event, on_update)
+        self.updates.put((cancel_event, None, total))
+
+    def _poll(self):
+        """在主线程中取出已完成的缩略图并更新列表。"""
+        self.poll_job = None
+        done = False
+        while True:
+            try:
+                cancel_event, rel_path, payload = self.updates.get_nowait()
+            except queue.Empty:
+                break
+            if cancel_event is not self.cancel_event:
+                continue  # 已取消的刷新
+            if rel_path is None:
+                done = True
+                self.status_label.config(text=f"已更新 {payload} 个缩略图，共 {len(self.tree.get_children())} 个素材")
+                continue
+            if self.tree.exists(rel_path):
+                self._show_entry(rel_path, payload)
+                self.status_label.config(text=f"正在生成缩略图... {rel_path}")
+        if done:
+            self.cancel_event = None
+        else:
+            self.poll_job = self.app.root.after(ASSET_POLL_MS, self._poll)
+
+    def _show_entry(self, rel_path, entry):
+        """显示素材的缩略图和信息；渲染失败的素材显示错误信息。"""
+        if entry is None:
+            return
+        if entry.get('error'):
+            self.tree.item(rel_path, values=('错误', ''))
+            return
+        thumb_path = self.index.thumbnail_path(rel_path, entry)
+        try:
+            with Image.open(thumb_path) as thumbnail:
+                photo = ImageTk.PhotoImage(thumbnail)
+        except (OSError, TypeError):
+            return
+        self.photos[rel_path] = photo
+        width, height = entry['canvas_size']
+        self.tree.item(rel_path, image=photo, values=(f'{width}x{height}', entry['frames']))
+
+    def _on_open(self, event):
+        """双击或回车时加载选中的素材并立即渲染。"""
+        selection = self.tree.selection()
+        if not selection:
+            return
+        if self.app.file_io.load_file(self.index.asset_path(selection[0])):
+            self.app.render_image()
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import threading
+
+from PIL import Image
+
+from binary_format import BINARY_EXTENSION, read_binary
+from renderer import create_image_from_pixels
+
+# 索引格式版本，缩略图的渲染方式发生变化时递增以使旧索引失效
+INDEX_FORMAT_VERSION = 1
+# 缩略图的最大边长（像素）
+DEFAULT_THUMB_SIZE = 64
+# 会被编入索引的项目文件扩展名
+ASSET_EXTENSIONS = ('.json', BINARY_EXTENSION)
+
+_INDEX_NAME = 'index.json'
+
+def _load_asset(path):
+    """读取JSON或二进制项目文件，返回项目数据字典。"""
+    if path.lower().endswith(BINARY_EXTENSION):
+        with read_binary(path) as doc:
+            return doc.to_data()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def render_thumbnail(path, thumb_size=DEFAULT_THUMB_SIZE):
+    """
+    渲染项目文件的缩略图：只渲染第一帧（透明背景），按整数倍最近邻放大或缩小到不超过 thumb_size。
+
+    :return: (缩略图, 信息字典) 元组，信息字典包含 'canvas_size' 和 'frames'。
+    """
+    data = _load_asset(path)
+    try:
+        canvas_width, canvas_height = data['canvas_size']
+    except (KeyError, ValueError, TypeError):
+        raise ValueError("JSON 必须包含一个 'canvas_size' 键，其值为 [宽度, 高度] 列表。")
+    # 与 render_from_data 的判断顺序一致：非空的 'frames' 优先于 'pixels'
+    if 'frames' in data and data['frames']:
+        first_frame, frame_count = data['frames'][0], len(data['frames'])
+    elif 'pixels' in data:
+        first_frame, frame_count = data['pixels'], 1
+    else:
+        raise ValueError("JSON 数据必须包含 'pixels' 或 'frames' 键。")
+
+    image = create_image_from_pixels(first_frame, data.get('palette', {}), canvas_width, canvas_height,
+                                     transparent_bg=True)
+    longest = max(canvas_width, canvas_height, 1)
+    if longest <= thumb_size:
+        scale = thumb_size // longest
+        size = (canvas_width * scale, canvas_height * scale)
+    else:
+        size = (max(1, canvas_width * thumb_size // longest), max(1, canvas_height * thumb_size // longest))
+    if size != image.size:
+        image = image.resize(size, Image.NEAREST)
+    return image, {'canvas_size': [canvas_width, canvas_height], 'frames': frame_count}
+
+class AssetIndex:
+    """
+    素材目录的增量缩略图索引。
+
+    索引文件记录每个素材的相对路径、修改时间、大小和缩略图文件名，缩略图以PNG保存在缓存目录中。
+    只有新增或修改时间/大小发生变化的文件需要重新渲染，重启后未变化的素材直接使用缓存的缩略图。
+    可以在后台线程中调用 update()，内部用锁保护索引。
+    """
+    def __init__(self, assets_dir, cache_dir, thumb_size=DEFAULT_THUMB_SIZE):
+        """
+        :param assets_dir: 素材根目录，递归索引其中的 .json 和 .pxb 文件。
+        :param cache_dir: 保存索引文件和缩略图的目录，不存在时自动创建。
+        :param thumb_size: 缩略图的最大边长。
+        """
+        self.assets_dir = assets_dir
+        self.cache_dir = cache_dir
+        self.thumb_size = thumb_size
+        self._lock = threading.Lock()
+        self.entries = {}  # 相对路径 -> 索引条目
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """读取索引文件；版本或缩略图尺寸不匹配、文件损坏时从空索引开始。"""
+        try:
+            with open(os.path.join(self.cache_dir, _INDEX_NAME), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get('version') == INDEX_FORMAT_VERSION and index.get('thumb_size') == self.thumb_size:
+            self.entries = index.get('entries', {})
+
+    def save(self):
+        """原子地写入索引文件。"""
+        with self._lock:
+            index = {'version': INDEX_FORMAT_VERSION, 'thumb_size': self.thumb_size, 'entries': dict(self.entries)}
+        index_path = os.path.join(self.cache_dir, _INDEX_NAME)
+        tmp_path = f'{index_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    def _list_assets(self):
+        """递归列出素材目录中的项目文件：{相对路径: (绝对路径, os.stat 结果)}。"""
+        assets = {}
+        for dirpath, dirnames, filenames in os.walk(self.assets_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(ASSET_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                assets[os.path.relpath(path, self.assets_dir).replace(os.sep, '/')] = (path, stat)
+        return assets
+
+    def _thumb_name(self, rel_path, stat):
+        """缩略图文件名由路径、修改时间和大小决定，文件变化后自然对应新的缩略图。"""
+        key = f'{rel_path}\0{stat.st_mtime_ns}\0{stat.st_size}'.encode('utf-8')
+        return hashlib.sha1(key).hexdigest() + '.png'
+
+    def scan(self):
+        """
+        扫描素材目录，与索引比较。已删除文件的条目和缩略图会被移除。
+
+        :return: (全部素材的相对路径列表, 需要重新渲染的相对路径列表)，均按路径排序。
+        """
+        assets = self._list_assets()
+        stale = []
+        removed = []
+        with self._lock:
+            for rel_path in list(self.entries):
+                if rel_path not in assets:
+                    removed.append(self.entries.pop(rel_path))
+            for rel_path, (_, stat) in assets.items():
+                entry = self.entries.get(rel_path)
+                if (entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size
+                        or (entry['thumb'] and not os.path.exists(self.thumbnail_path(rel_path, entry)))):
+                    stale.append(rel_path)
+        for entry in removed:
+            self._remove_thumb(entry)
+        return sorted(assets), stale
+
+    def _remove_thumb(self, entry):
+        if entry and entry.get('thumb'):
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['thumb']))
+            except OSError:
+                pass
+
+    def update(self, rel_path):
+        """
+        重新渲染一个素材的缩略图并更新索引条目。渲染失败时在条目中记录错误，之后文件不变就不再重试。
+        :return: 更新后的索引条目。
+        """
+        path = os.path.join(self.assets_dir, rel_path.replace('/', os.sep))
+        stat = os.stat(path)
+        entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'thumb': None,
+                 'canvas_size': None, 'frames': 0, 'error': None}
+        try:
+            thumbnail, info = render_thumbnail(path, self.thumb_size)
+            entry.update(info)
+            entry['thumb'] = self._thumb_name(rel_path, stat)
+            thumbnail.save(os.path.join(self.cache_dir, entry['thumb']), 'PNG')
+        except Exception as e:
+            entry['error'] = f"{type(e).__name__}: {e}"
+
+        with self._lock:
+            old_entry = self.entries.get(rel_path)
+            self.entries[rel_path] = entry
+        if old_entry and old_entry.get('thumb') != entry['thumb']:
+            self._remove_thumb(old_entry)
+        return entry
+
+    def get(self, rel_path):
+        """返回素材的索引条目，不存在时返回 None。"""
+        with self._lock:
+            return self.entries.get(rel_path)
+
+    def thumbnail_path(self, rel_path, entry=None):
+        """返回素材缩略图的路径；没有缩略图（尚未渲染或渲染失败）时返回 None。"""
+        entry = entry or self.get(rel_path)
+        if not entry or not entry.get('thumb'):
+            return None
+        return os.path.join(self.cache_dir, entry['thumb'])
+
+    def asset_path(self, rel_path):
+        """返回素材的绝对路径。"""
+        return os.path.join(self.assets_dir, rel_path.replace('/', os.sep))
+
+    def refresh(self, cancel_event=None, on_update=None):
+        """
+        扫描并重新渲染所有变化的素材，最后保存索引。
+
+        :param cancel_event: 可选的 threading.Event，被设置时尽快停止（已完成的部分仍会保存）。
+        :param on_update: 可选回调，每更新一个素材以 (相对路径, 条目) 调用一次。
+        :return: 实际重新渲染的素材数。
+        """
+        _, stale = self.scan()
+        updated = 0
+        try:
+            for rel_path in stale:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                try:
+                    entry = self.update(rel_path)
+                except OSError:
+                    continue  # 扫描之后文件被删除
+                updated += 1
+                if on_update:
+                    on_update(rel_path, entry)
+        finally:
+            self.save()
+        return updated
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import math
+import os
+import sys
+
+from PIL import Image
+
+from renderer import render_from_data
+
+# 支持的布局方式
+LAYOUT_GRID = 'grid'    # 所有帧占用相同大小的格子，按行排列
+LAYOUT_SHELF = 'shelf'  # 按高度排序后逐行（货架）装箱，适合裁剪后大小不一的帧
+LAYOUTS = (LAYOUT_GRID, LAYOUT_SHELF)
+
+# 默认的图集边长上限，与常见GPU纹理尺寸限制一致
+DEFAULT_MAX_SIZE = 2048
+
+def _frame_digest(img):
+    """计算图像内容的哈希，用于识别完全相同的帧。"""
+    digest = hashlib.sha1(img.tobytes())
+    digest.update(f'{img.mode}{img.size}'.encode('ascii'))
+    return digest.hexdigest()
+
+def _trim(img):
+    """
+    裁掉四周完全透明的边框。
+    :return: (裁剪后的图像, 裁剪区域在原图中的左上角坐标)。全透明的帧保留左上角的1x1像素。
+    """
+    bbox = img.getchannel('A').getbbox()
+    if bbox is None:
+        bbox = (0, 0, 1, 1)
+    if bbox == (0, 0) + img.size:
+        return img, (0, 0)
+    return img.crop(bbox), bbox[:2]
+
+def _layout_grid(sizes, max_size, padding):
+    """
+    网格布局：格子大小取所有帧的最大宽高。
+    :return: ([(x, y)], 图集宽, 图集高)。
+    """
+    cell_width = max(w for w, _ in sizes)
+    cell_height = max(h for _, h in sizes)
+    if cell_width > max_size:
+        raise ValueError(f"帧宽度 {cell_width} 超出图集最大尺寸 {max_size}。")
+    # 列数取接近正方形的值，但不超过最大宽度所能容纳的列数
+    columns = min(math.ceil(math.sqrt(len(sizes))), max(1, (max_size + padding) // (cell_width + padding)))
+    rows = (len(sizes) + columns - 1) // columns
+    positions = [((i % columns) * (cell_width + padding), (i // columns) * (cell_height + padding))
+                 for i in range(len(sizes))]
+    return positions, columns * (cell_width + padding) - padding, rows * (cell_height + padding) - padding
+
+def _layout_shelf(sizes, max_size, padding):
+    """
+    货架装箱：按高度从高到低排序，从左到右依次放置，超出目标行宽时另起一行。
+    :return: ([(x, y)]（与 sizes 顺序一致）, 图集宽, 图集高)。
+    """
+    positions = [None] * len(sizes)
+    # 目标行宽取接近正方形的边长，不小于最宽的帧，也不超过最大尺寸
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    shelf_width = min(max_size, max(max(w for w, _ in sizes), math.ceil(math.sqrt(area))))
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0], i))
+    x = y = shelf_height = atlas_width = 0
+    for i in order:
+        w, h = sizes[i]
+        if w > max_size:
+            raise ValueError(f"帧宽度 {w} 超出图集最大尺寸 {max_size}。")
+        if x and x + w > shelf_width:
+            # 当前行放不下，另起一行
+            y += shelf_height + padding
+            x = shelf_height = 0
+        positions[i] = (x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+        atlas_width = max(atlas_width, x - padding)
+    return positions, atlas_width, y + shelf_height
+
+def pack_atlas(animations, layout=LAYOUT_SHELF, max_size=DEFAULT_MAX_SIZE, padding=0, trim=False,
+               image_name='atlas.png'):
+    """
+    将多个动画的帧打包进一张图集。内容完全相同的帧只存储一次。
+
+    :param animations: [(动画名称, 帧图像列表, 每帧持续时间或 None)] 列表。
+    :param layout: 布局方式，'grid' 或 'shelf'。
+    :param max_size: 图集的最大宽高（像素），超出时引发 ValueError。
+    :param padding: 帧之间的间距（像素）。
+    :param trim: 是否裁掉每帧四周完全透明的边框。
+    :param image_name: 写入描述文件的图集图像文件名。
+    :return: (atlas_image, descriptor) 元组。descriptor 是可直接序列化为JSON的字典，
+             'frames' 将 '动画名/帧索引' 映射到图集中的矩形，'animations' 列出每个动画的帧名称。
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"未知的图集布局：{layout}，可选值为 {', '.join(LAYOUTS)}。")
+
+    # 去重：每个唯一帧记录 (裁剪后的图像, 裁剪偏移, 原始尺寸)
+    unique = []
+    digest_to_unique = {}
+    frame_refs = []  # [(帧名称, 唯一帧下标)]
+    animation_frames = {}
+    durations = {}
+    total_frames = 0
+    for name, images, duration in animations:
+        names = []
+        for i, img in enumerate(images):
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+            digest = _frame_digest(img)
+            if digest not in digest_to_unique:
+                trimmed, offset = _trim(img) if trim else (img, (0, 0))
+                digest_to_unique[digest] = len(unique)
+                unique.append((trimmed, offset, img.size))
+            frame_name = f'{name}/{i}'
+            frame_refs.append((frame_name, digest_to_unique[digest]))
+            names.append(frame_name)
+            total_frames += 1
+        animation_frames[name] = names
+        if duration is not None:
+            durations[name] = duration
+
+    if not unique:
+        raise ValueError("没有可打包的帧。")
+
+    sizes = [img.size for img, _, _ in unique]
+    layout_func = _layout_grid if layout == LAYOUT_GRID else _layout_shelf
+    positions, atlas_width, atlas_height = layout_func(sizes, max_size, padding)
+    if atlas_height > max_size:
+        raise ValueError(f"图集高度 {atlas_height} 超出最大尺寸 {max_size}，请增大 max_size 或拆分输入。")
+
+    atlas = Image.new('RGBA', (atlas_width, atlas_height), (0, 0, 0, 0))
+    for (img, _, _), position in zip(unique, positions):
+        # 底板全透明，直接复制像素，不需要按透明度混合
+        atlas.paste(img, position)
+
+    frames = {}
+    for frame_name, index in frame_refs:
+        img, (offset_x, offset_y), (source_width, source_height) = unique[index]
+        x, y = positions[index]
+        w, h = img.size
+        frames[frame_name] = {
+            'frame': {'x': x, 'y': y, 'w': w, 'h': h},
+            'trimmed': (w, h) != (source_width, source_height),
+            'sprite_source_size': {'x': offset_x, 'y': offset_y, 'w': w, 'h': h},
+            'source_size': {'w': source_width, 'h': source_height},
+        }
+
+    descriptor = {
+        'frames': frames,
+        'animations': animation_frames,
+        'meta': {
+            'image': image_name,
+            'size': {'w': atlas_width, 'h': atlas_height},
+            'layout': layout,
+            'padding': padding,
+            'trim': trim,
+            'total_frames': total_frames,
+            'unique_frames': len(unique),
+            'duration_ms': durations,
+        },
+    }
+    return atlas, descriptor
+
+def load_animations(inputs, transparent_bg=True):
+    """
+    渲染JSON文件，得到 pack_atlas 所需的动画列表。
+
+    :param inputs: batch_render.collect_inputs 返回的 [(json_path, relative_path)] 列表。
+                   动画名称取相对路径去掉扩展名（使用 '/' 分隔目录）。
+    :param transparent_bg: 是否使用透明背景。图集默认使用透明背景，以便裁剪透明边框。
+    :return: [(动画名称, 帧图像列表, 每帧持续时间或 None)] 列表。
+    """
+    animations = []
+    for json_path, rel_path in inputs:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        images, _ = render_from_data(data, transparent_bg)
+        name = os.path.splitext(rel_path)[0].replace(os.sep, '/')
+        animations.append((name, images, data.get('duration_ms')))
+    return animations
+
+def save_atlas(atlas, descriptor, image_path, descriptor_path=None):
+    """
+    保存图集图像和描述文件。描述文件默认与图像同名，扩展名为 .json。
+    :return: 描述文件的路径。
+    """
+    descriptor_path = descriptor_path or os.path.splitext(image_path)[0] + '.json'
+    descriptor['meta']['image'] = os.path.relpath(image_path, os.path.dirname(descriptor_path) or os.curdir).replace(os.sep, '/')
+    atlas.save(image_path, 'PNG')
+    with open(descriptor_path, 'w', encoding='utf-8') as f:
+        json.dump(descriptor, f, ensure_ascii=False, indent=2)
+    return descriptor_path
+
+# 当该脚本作为主程序运行时
+if __name__ == '__main__':
+    import argparse
+
+    from batch_render import collect_inputs
+
+    parser = argparse.ArgumentParser(description='将多个 JSON 动画打包为一张纹理图集。')
+    parser.add_argument('sources', nargs='+', help='JSON 文件、目录或 glob 模式（例如 "assets/*.json"）。')
+    parser.add_argument('-o', '--output', default='atlas.png', help='输出的图集 PNG 路径，描述文件保存为同名的 .json。')
+    parser.add_argument('--layout', choices=LAYOUTS, default=LAYOUT_SHELF, help='图集布局方式。')
+    parser.add_argument('--max-size', type=int, default=DEFAULT_MAX_SIZE, help='图集的最大宽高（像素）。')
+    parser.add_argument('--padding', type=int, default=0, help='帧之间的间距（像素）。')
+    parser.add_argument('--trim', action='store_true', help='裁掉每帧四周完全透明的边框。')
+    parser.add_argument('--opaque', action='store_true', help='使用默认的纯色背景而不是透明背景。')
+    args = parser.parse_args()
+
+    inputs = collect_inputs(args.sources)
+    if not inputs:
+        print("错误：没有找到任何 JSON 文件。", file=sys.stderr)
+        sys.exit(2)
+
+    try:
+        animations = load_animations(inputs, transparent_bg=not args.opaque)
+        atlas, descriptor = pack_atlas(animations, args.layout, args.max_size, args.padding, args.trim)
+        descriptor_path = save_atlas(atlas, descriptor, args.output)
+    except (ValueError, KeyError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    meta = descriptor['meta']
+    print(f"成功将 {len(animations)} 个动画（{meta['total_frames']} 帧，其中 {meta['unique_frames']} 帧不重复）"
+          f"打包为 {meta['size']['w']}x{meta['size']['h']} 的图集: {args.output}, {descriptor_path}")
@@ -0,0 +1,218 @@
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from renderer import render_from_data
+from render_cache import RenderCache, DEFAULT_MAX_BYTES
+
+# 每个工作进程复用同一个缓存对象，使计数器在进程内累积
+_caches = {}
+
+def _get_cache(cache_dir, cache_max_bytes):
+    key = (os.path.abspath(cache_dir), cache_max_bytes)
+    if key not in _caches:
+        _caches[key] = RenderCache(cache_dir, cache_max_bytes)
+    return _caches[key]
+
+# glob 模式中的通配符
+_GLOB_MAGIC = '*?['
+
+def _glob_base(pattern):
+    """
+    返回 glob 模式中不含通配符的目录前缀，用作输出目录树的镜像根。
+    例如 'assets/**/*.json' 返回 'assets'。
+    """
+    parts = os.path.normpath(pattern).split(os.sep)
+    base_parts = []
+    for part in parts[:-1]:
+        if any(ch in part for ch in _GLOB_MAGIC):
+            break
+        base_parts.append(part)
+    return os.sep.join(base_parts) or os.curdir
+
+def collect_inputs(sources):
+    """
+    将目录和 glob 模式展开为待渲染的 JSON 文件列表。
+
+    :param sources: 目录、文件路径或 glob 模式的列表。
+    :return: [(json_path, relative_path)] 列表，relative_path 用于在输出目录中镜像目录结构。
+    """
+    inputs = []
+    seen = set()
+    for source in sources:
+        if os.path.isdir(source):
+            base = source
+            files = glob.glob(os.path.join(source, '**', '*.json'), recursive=True)
+        else:
+            base = _glob_base(source)
+            files = glob.glob(source, recursive=True)
+
+        for json_path in sorted(files):
+            key = os.path.abspath(json_path)
+            if key in seen or not os.path.isfile(json_path):
+                continue
+            seen.add(key)
+            inputs.append((json_path, os.path.relpath(json_path, base)))
+    return inputs
+
+def _new_result(json_path, output_path):
+    """返回一个尚未成功的单文件结果字典。"""
+    return {
+        'input': json_path,
+        'output': output_path,
+        'frames': 0,
+        'seconds': 0.0,
+        'cache': None,
+        'ok': False,
+        'error': None,
+    }
+
+def render_file(json_path, output_path, transparent_bg=False, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES):
+    """
+    渲染单个 JSON 文件并保存为 PNG（动画保存为雪碧图）。
+    任何错误都会被捕获并记录在返回的结果中，而不会中断整个批处理。
+
+    :param cache_dir: 可选的渲染缓存目录。命中时直接复制缓存中的 PNG，不再渲染和编码。
+    :param cache_max_bytes: 渲染缓存的容量上限（字节）。
+    :return: 描述本次渲染的字典，包含输入/输出路径、帧数、耗时、缓存状态和错误信息。
+    """
+    result = _new_result(json_path, output_path)
+    start = time.perf_counter()
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        os.makedirs(os.path.dirname(output_path) or os.curdir, exist_ok=True)
+
+        cache = _get_cache(cache_dir, cache_max_bytes) if cache_dir else None
+        cached = None
+        if cache is not None:
+            key = cache.make_key(data, transparent_bg)
+            cached = cache.get_output_file(key)
+            result['cache'] = 'hit' if cached else 'miss'
+
+        if cached:
+            png_path, frame_count = cached
+            shutil.copyfile(png_path, output_path)
+        else:
+            images, sprite_sheet = render_from_data(data, transparent_bg, delta=True, prepare=True)
+            if not images:
+                raise ValueError("未能从JSON数据生成任何图像。")
+            if cache is not None:
+                cache.put(key, images, sprite_sheet)
+            (sprite_sheet or images[0]).save(output_path, 'PNG')
+            frame_count = len(images)
+
+        result['frames'] = frame_count
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    return result
+
+def render_batch(inputs, output_dir, transparent_bg=False, jobs=None, on_result=None,
+                 cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES):
+    """
+    使用进程池批量渲染文件。
+
+    :param inputs: collect_inputs 返回的 [(json_path, relative_path)] 列表。
+    :param output_dir: 输出根目录，输出文件按 relative_path 镜像存放并改为 .png 扩展名。同名文件映射到同一输出路径时，只渲染第一个，其余记为失败。
+    :param transparent_bg: 是否使用透明背景。
+    :param jobs: 工作进程数，默认为 CPU 核心数；为1时在当前进程内顺序渲染。
+    :param on_result: 可选回调，每完成一个文件时以结果字典调用一次。
+    :param cache_dir: 可选的渲染缓存目录，所有工作进程共享。
+    :param cache_max_bytes: 渲染缓存的容量上限（字节）。
+    :return: 机器可读的汇总字典。
+    """
+    jobs = jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    results = []
+
+    # 不同来源中同名的文件（例如两个目录下都有 a.json）会映射到同一个输出文件。
+    # 只有第一个输入使用该路径，其余的报告为失败，而不是静默地互相覆盖
+    tasks = []
+    owners = {}
+    for json_path, rel_path in inputs:
+        output_path = os.path.join(output_dir, os.path.splitext(rel_path)[0] + '.png')
+        owner = owners.setdefault(os.path.normcase(os.path.abspath(output_path)), json_path)
+        if owner == json_path:
+            tasks.append((json_path, output_path))
+            continue
+        result = _new_result(json_path, output_path)
+        result['error'] = f"输出路径冲突: 与 {owner} 都会输出到 {output_path}"
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    if jobs == 1 or len(tasks) <= 1:
+        for json_path, output_path in tasks:
+            result = render_file(json_path, output_path, transparent_bg, cache_dir, cache_max_bytes)
+            results.append(result)
+            if on_result:
+                on_result(result)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(render_file, json_path, output_path, transparent_bg,
+                                       cache_dir, cache_max_bytes)
+                       for json_path, output_path in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+
+    # 按输入顺序输出，保证汇总结果稳定可比较
+    order = {json_path: i for i, (json_path, _) in enumerate(inputs)}
+    results.sort(key=lambda r: order[r['input']])
+    failed = [r for r in results if not r['ok']]
+    return {
+        'total': len(results),
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'frames': sum(r['frames'] for r in results),
+        'jobs': jobs,
+        'transparent': transparent_bg,
+        'cache_hits': sum(1 for r in results if r['cache'] == 'hit'),
+        'cache_misses': sum(1 for r in results if r['cache'] == 'miss'),
+        'elapsed_seconds': round(time.perf_counter() - start, 6),
+        'files': results,
+    }
+
+# 当该脚本作为主程序运行时
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='批量将 JSON 文件渲染为 PNG。')
+    parser.add_argument('sources', nargs='+', help='JSON 文件、目录或 glob 模式（例如 "assets/*.json"）。')
+    parser.add_argument('-o', '--output-dir', default='output', help='输出根目录，目录结构与输入保持一致。')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='并行的工作进程数，默认为 CPU 核心数。')
+    parser.add_argument('--transparent', action='store_true', help='使用透明背景。')
+    parser.add_argument('--cache-dir', type=str, default=None, help='渲染缓存目录，未变化的文件直接使用缓存结果。')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024), help='渲染缓存的容量上限 (MB)。')
+    parser.add_argument('--summary', type=str, default=None, help='将 JSON 汇总写入该文件，默认输出到标准输出。')
+    args = parser.parse_args()
+
+    inputs = collect_inputs(args.sources)
+    if not inputs:
+        print("错误：没有找到任何 JSON 文件。", file=sys.stderr)
+        sys.exit(2)
+
+    def report(result):
+        status = "成功" if result['ok'] else f"失败 ({result['error']})"
+        print(f"{status}: {result['input']} -> {result['output']}", file=sys.stderr)
+
+    summary = render_batch(inputs, args.output_dir, args.transparent, args.jobs, on_result=report,
+                           cache_dir=args.cache_dir, cache_max_bytes=int(args.cache_max_mb * 1024 * 1024))
+
+    summary_json = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(summary_json)
+    else:
+        print(summary_json)
+
+    sys.exit(1 if summary['failed'] else 0)
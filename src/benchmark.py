@@ -0,0 +1,299 @@
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import PIL
+
+# NumPy 为可选依赖，这里只用于记录运行环境
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from batch_render import collect_inputs
+from frame_store import FrameStore, compact_document
+from json_sync import PIXELS_ROW_INDENT, format_json_document, format_row
+from renderer import apply_pixel_updates, create_image_from_pixels, create_sprite_sheet, render_from_data
+from validation import validate_document
+
+# 合成画布的边长与动画帧数
+CANVAS_SIZES = (16, 64, 256, 1024)
+FRAME_COUNTS = (1, 10, 100, 500)
+# 帧数测试使用的画布边长
+FRAME_SWEEP_CANVAS = 32
+# --quick 模式下的上限，用于快速冒烟测试
+QUICK_MAX_CANVAS = 256
+QUICK_MAX_FRAMES = 100
+
+DEFAULT_REPEAT = 5
+DEFAULT_OUTPUT = 'benchmark_results.json'
+# 与基线比较时，中位数耗时超过基线的该倍数即视为性能回退
+DEFAULT_THRESHOLD = 1.2
+RESULTS_VERSION = 1
+
+# 合成数据使用的调色板：'0' 为背景色，其余为常见的像素画颜色
+SYNTHETIC_PALETTE = {
+    '0': '#FFFFFF', '1': '#000000', '2': '#FF0000', '3': '#00BFFF',
+    '4': '#F0FFFF', '5': '#228B22', '6': '#FFD700', '7': '#8B4513',
+}
+
+def make_synthetic_data(width, height, frames=1, seed=0):
+    """
+    生成确定性的合成项目数据：约一半为背景色，其余为随机颜色；
+    后续每一帧在前一帧的基础上修改约 5% 的像素，接近真实动画的帧间变化。
+
+    :param frames: 帧数。为1时生成单帧图像（'pixels'），否则生成动画（'frames'）。
+    :param seed: 随机种子，相同参数总是生成相同的数据。
+    """
+    rng = random.Random(seed)
+    colors = [int(key) for key in SYNTHETIC_PALETTE]
+    frame = [[rng.choice(colors) if rng.random() < 0.5 else 0 for _ in range(width)] for _ in range(height)]
+    data = {'canvas_size': [width, height], 'palette': dict(SYNTHETIC_PALETTE)}
+    if frames == 1:
+        data['pixels'] = frame
+        return data
+
+    frames_data = [frame]
+    changes = max(1, width * height // 20)
+    for _ in range(frames - 1):
+        frame = [row[:] for row in frame]
+        for _ in range(changes):
+            frame[rng.randrange(height)][rng.randrange(width)] = rng.choice(colors)
+        frames_data.append(frame)
+    data['frames'] = frames_data
+    return data
+
+def _brush_stroke(data):
+    """
+    构造模拟笔触的函数：沿对角线逐个单元格落笔，每个单元格的处理与编辑器中一次鼠标事件相同——
+    修改像素数据、增量更新帧图像和雪碧图、重新格式化JSON文本中对应的行。
+    每次调用交替使用两种颜色，保证每个单元格都确实发生变化。
+    """
+    width, height = data['canvas_size']
+    palette = data['palette']
+    pixel_data = data['pixels']
+    image = create_image_from_pixels(pixel_data, palette, width, height)
+    sprite_sheet = create_sprite_sheet([image])
+    steps = max(width, height)
+    path = [(i * height // steps, i * width // steps) for i in range(steps)]
+    stroke_colors = [1, 2]
+
+    def run():
+        color = stroke_colors[0]
+        stroke_colors.reverse()
+        for row, col in path:
+            pixel_data[row][col] = color
+            cells = [(row, col)]
+            apply_pixel_updates(image, pixel_data, cells, palette)
+            apply_pixel_updates(sprite_sheet, pixel_data, cells, palette)
+            format_row(pixel_data[row], PIXELS_ROW_INDENT, row == height - 1)
+    return run
+
+def _create_image(data):
+    """构造渲染单帧图像的函数。"""
+    width, height = data['canvas_size']
+    return lambda: create_image_from_pixels(data['pixels'], data['palette'], width, height)
+
+def _render(data, **options):
+    """构造以给定选项调用 render_from_data 的函数。"""
+    return lambda: render_from_data(data, **options)
+
+def _compacted(data):
+    """与渲染线程相同，先把像素数据转换为紧凑存储（FrameStore / Frame）。"""
+    compact_document(data)
+    return data
+
+def _compact_frames(data):
+    """构造把帧列表转换为 FrameStore 的函数。"""
+    width, height = data['canvas_size']
+    frames = data['frames'] if 'frames' in data else [data['pixels']]
+    return lambda: FrameStore.from_lists(frames, width, height, data['palette'])
+
+def _validate(data):
+    """构造与 renderer.py --validate 相同的整份文档校验函数。"""
+    return lambda: validate_document(data)
+
+def _sprite_sheet(data):
+    """先渲染出帧图像，再构造只拼接雪碧图的函数。"""
+    images, _ = render_from_data(data)
+    return lambda: create_sprite_sheet(images)
+
+def _serialize(data):
+    """与 PixelArtApp._update_json_text 相同的完整序列化（不含写入文本框）。"""
+    return lambda: format_json_document(data['canvas_size'], data['palette'],
+                                        data.get('frames'), data.get('pixels'))
+
+def build_cases(quick=False, assets_dir=None):
+    """
+    构建基准测试用例列表。
+
+    :param quick: 是否限制画布和帧数的上限，用于快速冒烟测试。
+    :param assets_dir: 可选的真实素材目录，其中的每个JSON文件都会生成渲染和序列化用例。
+    :return: [(用例ID, 名称, 参数字典, 无参函数)] 列表。数据在调用时惰性生成，避免一次占用过多内存。
+    """
+    canvas_sizes = [s for s in CANVAS_SIZES if not quick or s <= QUICK_MAX_CANVAS]
+    frame_counts = [n for n in FRAME_COUNTS if not quick or n <= QUICK_MAX_FRAMES]
+    cases = []
+
+    def add(name, params, factory):
+        label = ','.join(f'{k}={v}' for k, v in params.items())
+        cases.append((f'{name}[{label}]', name, params, factory))
+
+    for size in canvas_sizes:
+        params = {'canvas': f'{size}x{size}'}
+        def synthetic(size=size):
+            return make_synthetic_data(size, size)
+        add('create_image_from_pixels', params, lambda load=synthetic: _create_image(load()))
+        add('serialize_json', params, lambda load=synthetic: _serialize(load()))
+        add('brush_stroke', params, lambda load=synthetic: _brush_stroke(load()))
+
+    for count in frame_counts:
+        params = {'canvas': f'{FRAME_SWEEP_CANVAS}x{FRAME_SWEEP_CANVAS}', 'frames': count}
+        def frames_data(count=count):
+            return make_synthetic_data(FRAME_SWEEP_CANVAS, FRAME_SWEEP_CANVAS, count)
+        add('render_from_data', params, lambda load=frames_data: _render(load()))
+        add('render_from_data_delta', params, lambda load=frames_data: _render(load(), delta=True))
+        add('render_from_data_compact', params, lambda load=frames_data: _render(_compacted(load()), delta=True))
+        add('render_from_data_prepared', params, lambda load=frames_data: _render(load(), delta=True, prepare=True))
+        add('compact_frames', params, lambda load=frames_data: _compact_frames(load()))
+        add('validate_document', params, lambda load=frames_data: _validate(load()))
+        add('create_sprite_sheet', params, lambda load=frames_data: _sprite_sheet(load()))
+        add('serialize_json', params, lambda load=frames_data: _serialize(load()))
+
+    if assets_dir:
+        for json_path, rel_path in collect_inputs([assets_dir]):
+            params = {'asset': rel_path.replace(os.sep, '/')}
+            def asset_data(json_path=json_path):
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            add('render_from_data', params, lambda load=asset_data: _render(load()))
+            add('serialize_json', params, lambda load=asset_data: _serialize(load()))
+    return cases
+
+def measure(func, repeat=DEFAULT_REPEAT, memory=True):
+    """
+    测量函数的耗时和峰值内存。先预热一次，再计时 repeat 次；峰值内存在单独的一次运行中用 tracemalloc 测量，
+    只统计 Python 层面的分配（Pillow 图像缓冲区由C代码分配，不计入）。
+
+    :return: 包含 min_s、median_s、mean_s 和 peak_kb（不测内存时为 None）的字典。
+    """
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    peak_kb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_kb = round(peak / 1024, 1)
+
+    return {
+        'min_s': round(min(times), 6),
+        'median_s': round(statistics.median(times), 6),
+        'mean_s': round(statistics.mean(times), 6),
+        'peak_kb': peak_kb,
+    }
+
+def environment_info():
+    """记录影响结果可比性的运行环境信息。"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'pillow': PIL.__version__,
+        'numpy': np.__version__ if np is not None else None,
+        'cpu_count': os.cpu_count(),
+    }
+
+def run_benchmarks(cases, repeat=DEFAULT_REPEAT, memory=True, name_filter=None, on_result=None):
+    """
+    依次运行基准测试用例。
+
+    :param cases: build_cases 返回的用例列表。
+    :param name_filter: 可选的子串，只运行ID中包含该子串的用例。
+    :param on_result: 可选的回调，每完成一个用例以结果字典调用一次（用于打印进度）。
+    :return: 可直接序列化为JSON的结果字典。
+    """
+    results = []
+    for case_id, name, params, factory in cases:
+        if name_filter and name_filter not in case_id:
+            continue
+        result = {'id': case_id, 'name': name, 'params': params, 'repeat': repeat}
+        result.update(measure(factory(), repeat, memory))
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment_info(),
+        'results': results,
+    }
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    按用例ID将结果与基线比较中位数耗时。
+
+    :return: [(用例ID, 基线耗时, 当前耗时, 比值, 是否回退)] 列表，只包含两边都存在的用例。
+    """
+    baseline_by_id = {result['id']: result for result in baseline.get('results', [])}
+    comparisons = []
+    for result in current['results']:
+        base = baseline_by_id.get(result['id'])
+        if base is None or not base['median_s']:
+            continue
+        ratio = result['median_s'] / base['median_s']
+        comparisons.append((result['id'], base['median_s'], result['median_s'], ratio, ratio > threshold))
+    return comparisons
+
+# 当该脚本作为主程序运行时
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='对渲染器和编辑器的热点路径运行基准测试（无需图形界面）。')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='结果JSON文件的路径。')
+    parser.add_argument('--baseline', help='可选的基线结果文件，用于检测性能回退。')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='中位数耗时超过基线的该倍数时视为回退。')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每个用例的计时次数。')
+    parser.add_argument('--quick', action='store_true',
+                        help=f'只测试不超过 {QUICK_MAX_CANVAS}x{QUICK_MAX_CANVAS} 的画布和不超过 {QUICK_MAX_FRAMES} 帧的动画。')
+    parser.add_argument('--assets', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'assets'),
+                        help='真实素材目录，传入空字符串时跳过。')
+    parser.add_argument('--filter', help='只运行ID中包含该子串的用例。')
+    parser.add_argument('--no-memory', action='store_true', help='不测量峰值内存，缩短运行时间。')
+    args = parser.parse_args()
+
+    def print_result(result):
+        peak = f"{result['peak_kb']:>10.1f} KB" if result['peak_kb'] is not None else ''
+        print(f"{result['id']:<60} {result['median_s'] * 1000:>10.3f} ms {peak}")
+
+    cases = build_cases(args.quick, args.assets if args.assets and os.path.isdir(args.assets) else None)
+    report = run_benchmarks(cases, args.repeat, not args.no_memory, args.filter, print_result)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"已运行 {len(report['results'])} 个用例，结果已保存到: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparisons = compare_results(report, baseline, args.threshold)
+        regressions = [c for c in comparisons if c[4]]
+        for case_id, base_s, current_s, ratio, regressed in comparisons:
+            mark = '  回退' if regressed else ''
+            print(f"{case_id:<60} {base_s * 1000:>10.3f} -> {current_s * 1000:>10.3f} ms  x{ratio:.2f}{mark}")
+        print(f"与基线比较了 {len(comparisons)} 个用例，其中 {len(regressions)} 个超过 {args.threshold} 倍。")
+        if regressions:
+            sys.exit(1)
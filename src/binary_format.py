@@ -0,0 +1,260 @@
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+# NumPy 为可选依赖：存在时可以直接在内存映射上渲染，不构建 Python 列表
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from palette import compile_palette
+from renderer import create_sprite_sheet, image_from_indices, render_from_data
+
+# 文件扩展名与魔数
+BINARY_EXTENSION = '.pxb'
+MAGIC = b'PXBN'
+FORMAT_VERSION = 1
+
+# 标志位
+FLAG_ZLIB = 0x01    # 每个帧平面单独使用 zlib 压缩
+FLAG_FRAMES = 0x02  # 文档为动画（'frames'），否则为单帧图像（'pixels'）
+
+# 魔数、版本、标志、索引字节数、保留、宽、高、帧数、值表长度、元数据长度
+_HEADER = struct.Struct('<4sBBBBIIIII')
+_VALUE = struct.Struct('<q')
+_FRAME_ENTRY = struct.Struct('<QQ')
+
+def _frame_planes_from_data(data):
+    """
+    检查文档是否可以无损地存入二进制格式，并返回 (宽, 高, 帧列表, 是否为动画, 行长度表)。
+
+    帧平面固定为 高 x 宽 的矩阵；行数或列数不足的帧会用填充值补齐，
+    并在行长度表 {帧索引: [每行长度]} 中记录原始形状，以便无损还原。
+    超出画布的行或列以及非整数的像素值无法存入二进制格式。
+    """
+    try:
+        canvas_width, canvas_height = data['canvas_size']
+    except (KeyError, ValueError, TypeError):
+        raise ValueError("JSON 必须包含一个 'canvas_size' 键，其值为 [宽度, 高度] 列表。")
+    # 文件头以 32 位无符号整数保存宽高
+    for name, length in (('宽度', canvas_width), ('高度', canvas_height)):
+        if type(length) is not int or not 0 <= length < 2 ** 32:
+            raise ValueError(f"画布{name} {length!r} 必须是 0 到 {2 ** 32 - 1} 之间的整数，无法编码为二进制格式。")
+
+    if 'frames' in data and data['frames']:
+        frames, is_animation = data['frames'], True
+    elif 'pixels' in data:
+        frames, is_animation = [data['pixels']], False
+    else:
+        raise ValueError("JSON 数据必须包含 'pixels' 或 'frames' 键。")
+
+    row_lengths = {}
+    for frame_index, frame in enumerate(frames):
+        if len(frame) > canvas_height:
+            raise ValueError(f"第 {frame_index} 帧有 {len(frame)} 行，超出画布高度 {canvas_height}。")
+        for row_index, row in enumerate(frame):
+            if len(row) > canvas_width:
+                raise ValueError(f"第 {frame_index} 帧第 {row_index} 行有 {len(row)} 列，超出画布宽度 {canvas_width}。")
+            for col_index, value in enumerate(row):
+                if type(value) is not int:
+                    raise ValueError(f"第 {frame_index} 帧第 {row_index} 行第 {col_index} 列的值 {value!r} 不是整数。")
+        lengths = [len(row) for row in frame]
+        if len(frame) != canvas_height or any(length != canvas_width for length in lengths):
+            row_lengths[str(frame_index)] = lengths
+    return canvas_width, canvas_height, frames, is_animation, row_lengths
+
+def encode_document(data, compress=False):
+    """
+    将项目JSON数据编码为二进制容器。
+
+    :param data: 遵循项目JSON模式的字典。
+    :param compress: 是否用 zlib 压缩每个帧平面。压缩后的文件更小，但不能零拷贝地内存映射。
+    :return: 编码后的 bytes。
+    """
+    canvas_width, canvas_height, frames, is_animation, row_lengths = _frame_planes_from_data(data)
+
+    # 值表：文档中出现的所有像素值，帧平面中存储的是值表的下标；
+    # 紧随值表之后的下标用作不规整帧的填充值
+    values = sorted({value for frame in frames for row in frame for value in row})
+    if values and not (-2 ** 63 <= values[0] and values[-1] < 2 ** 63):
+        raise ValueError("像素值超出 64 位整数范围，无法编码为二进制格式。")
+    if len(values) + 1 > 65536:
+        raise ValueError("像素值的种类超过 65535 种，无法编码为二进制格式。")
+    index_size = 1 if len(values) + 1 <= 256 else 2
+    value_to_index = {value: i for i, value in enumerate(values)}
+    pad_index = len(values)
+
+    # 调色板与其他顶层字段以JSON保存，保证与原始文档无损往返
+    extra = {k: v for k, v in data.items() if k not in ('canvas_size', 'palette', 'frames', 'pixels')}
+    meta = {'palette': data.get('palette'), 'extra': extra, 'row_lengths': row_lengths}
+    if is_animation and 'pixels' in data:
+        meta['pixels'] = data['pixels']
+    elif not is_animation and 'frames' in data:
+        meta['frames'] = data['frames']
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+
+    planes = []
+    typecode = 'B' if index_size == 1 else 'H'
+    for frame_index, frame in enumerate(frames):
+        if str(frame_index) in row_lengths:
+            plane = array(typecode, [pad_index]) * (canvas_width * canvas_height)
+            for row_index, row in enumerate(frame):
+                start = row_index * canvas_width
+                plane[start:start + len(row)] = array(typecode, (value_to_index[value] for value in row))
+        else:
+            plane = array(typecode, (value_to_index[value] for row in frame for value in row))
+        if typecode == 'H' and sys.byteorder == 'big':
+            plane.byteswap()
+        plane_bytes = plane.tobytes()
+        planes.append(zlib.compress(plane_bytes) if compress else plane_bytes)
+
+    flags = (FLAG_ZLIB if compress else 0) | (FLAG_FRAMES if is_animation else 0)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, flags, index_size, 0, canvas_width, canvas_height,
+                          len(frames), len(values), len(meta_bytes))
+    value_table = b''.join(_VALUE.pack(value) for value in values)
+
+    offset = len(header) + len(value_table) + len(meta_bytes) + _FRAME_ENTRY.size * len(frames)
+    frame_table = []
+    for plane in planes:
+        frame_table.append(_FRAME_ENTRY.pack(offset, len(plane)))
+        offset += len(plane)
+
+    return b''.join([header, value_table, meta_bytes] + frame_table + planes)
+
+def write_binary(data, path, compress=False):
+    """将项目JSON数据写入二进制文件。"""
+    with open(path, 'wb') as f:
+        f.write(encode_document(data, compress))
+
+class BinaryDocument:
+    """
+    只读的二进制项目文档。未压缩的帧平面直接在内存映射上访问，不会构建 Python 列表。
+    可以作为上下文管理器使用，退出时关闭内存映射。
+    """
+    def __init__(self, buffer):
+        """
+        :param buffer: 支持缓冲区协议的对象（bytes 或 mmap）。
+        """
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < _HEADER.size:
+            raise ValueError("不是有效的二进制像素文件：文件过短。")
+        (magic, version, flags, index_size, _, self.width, self.height,
+         self.frame_count, value_count, meta_len) = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError("不是有效的二进制像素文件：魔数不匹配。")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的二进制格式版本：{version}。")
+
+        self.compressed = bool(flags & FLAG_ZLIB)
+        self.is_animation = bool(flags & FLAG_FRAMES)
+        self.index_size = index_size
+
+        offset = _HEADER.size
+        self.values = [_VALUE.unpack_from(view, offset + i * _VALUE.size)[0] for i in range(value_count)]
+        offset += value_count * _VALUE.size
+        meta = json.loads(bytes(view[offset:offset + meta_len]).decode('utf-8'))
+        offset += meta_len
+        self.palette = meta['palette']
+        self._meta = meta
+        self._frame_table = [_FRAME_ENTRY.unpack_from(view, offset + i * _FRAME_ENTRY.size)
+                             for i in range(self.frame_count)]
+        self._view = view
+
+    def close(self):
+        """
+        释放缓冲区；如果是内存映射则将其关闭。
+        frame_indices 返回的零拷贝数组仍被引用时内存映射无法立即关闭，此时推迟到这些数组都被回收后自动解除映射。
+        """
+        self._view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                # 仍有数组引用内存映射：只放弃本对象持有的引用，最后一个引用消失时由 mmap 自己解除映射
+                pass
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _plane_bytes(self, frame_index):
+        offset, length = self._frame_table[frame_index]
+        plane = self._view[offset:offset + length]
+        return zlib.decompress(plane) if self.compressed else plane
+
+    def frame_indices(self, frame_index):
+        """
+        返回一帧的值表下标数组（形状为 (高, 宽)），需要 NumPy。
+        未压缩时直接引用内存映射，不复制数据；数组在文档关闭后仍然有效，内存映射会保留到数组被回收。
+        """
+        dtype = np.uint8 if self.index_size == 1 else np.dtype('<u2')
+        return np.frombuffer(self._plane_bytes(frame_index), dtype=dtype).reshape(self.height, self.width)
+
+    def frame_rows(self, frame_index):
+        """返回一帧的二维像素值列表（与JSON中的形式相同）。"""
+        plane = array('B' if self.index_size == 1 else 'H')
+        plane.frombytes(self._plane_bytes(frame_index))
+        if self.index_size == 2 and sys.byteorder == 'big':
+            plane.byteswap()
+        values = self.values
+        width = self.width
+        lengths = self._meta.get('row_lengths', {}).get(str(frame_index))
+        if lengths is None:
+            return [[values[i] for i in plane[y * width:(y + 1) * width]] for y in range(self.height)]
+        # 不规整的帧：按记录的原始行长度去掉填充值
+        return [[values[i] for i in plane[y * width:y * width + length]] for y, length in enumerate(lengths)]
+
+    def to_data(self):
+        """无损地转换回项目JSON数据字典。"""
+        data = {'canvas_size': [self.width, self.height]}
+        if self.palette is not None:
+            data['palette'] = self.palette
+        frames = [self.frame_rows(i) for i in range(self.frame_count)]
+        if self.is_animation:
+            data['frames'] = frames
+            if 'pixels' in self._meta:
+                data['pixels'] = self._meta['pixels']
+        else:
+            if 'frames' in self._meta:
+                data['frames'] = self._meta['frames']
+            data['pixels'] = frames[0]
+        data.update(self._meta['extra'])
+        return data
+
+    def render(self, transparent_bg=False, indexed=False):
+        """
+        渲染文档，返回值与 render_from_data 相同。
+        安装了 NumPy 时直接把帧平面映射为颜色，不构建 Python 列表。
+
+        :param indexed: 是否渲染为 "P" 模式的索引色图像，见 render_from_data。
+        """
+        if np is None:
+            return render_from_data(self.to_data(), transparent_bg, indexed=indexed)
+
+        compiled = compile_palette(self.palette or {})
+        # 值表下标 -> 调色板稠密索引；最后一项是填充值，始终透明
+        index_lut = np.array([compiled.index_of(value, transparent_bg) for value in self.values] + [0],
+                             dtype=np.intp)
+        indexed = indexed and compiled.supports_indexed()
+        images = [image_from_indices(index_lut[self.frame_indices(i)], compiled, indexed)
+                  for i in range(self.frame_count)]
+        if self.is_animation:
+            return images, create_sprite_sheet(images, indexed)
+        return images, None
+
+def read_binary(path):
+    """
+    以内存映射方式打开二进制项目文件。
+    :return: BinaryDocument，使用完毕后应调用 close() 或使用 with 语句。
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return BinaryDocument(buffer)
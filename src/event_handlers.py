@@ -1,4 +1,10 @@
-import json
+import tkinter as tk
+
+from frame_store import Frame
+from history import uniform_values
+from stroke_engine import StrokeEngine
+from tools import (TOOL_FILL, TOOL_LINE, TOOL_RECT, SpanCells, apply_cells, flood_fill, line_cells, rect_cells,
+                   spans_to_cells)
 
 class EventHandlers:
     """
@@ -11,52 +17,189 @@ class EventHandlers:
         :param app: PixelArtApp的实例，用于访问状态、UI和核心逻辑。
         """
         self.app = app
+        self.shape = None  # 正在拖动的直线或矩形：锚点、数值以及预览时写入的单元格和旧值
+        self.pan_anchor = None  # 中键平移时上一次的鼠标位置
+        self.stroke = StrokeEngine(app)  # 合并画笔的拖动事件
 
     def handle_draw(self, event):
-        """处理鼠标左键点击和拖动事件，用于绘制。"""
+        """处理鼠标左键点击和拖动事件，用当前选中的颜色和工具绘制。"""
         if self.app.state.selected_color is None:
             return
-
-        coords = self.screen_to_grid_coords(event.x, event.y)
-        if not coords:
-            return
-        
-        row, col = coords
         try:
             color_key = int(self.app.state.selected_color)
         except (ValueError, TypeError):
             return
+        self._use_tool(event, color_key)
 
-        if self.app.state.pixels_data is not None:
-            if 0 <= row < len(self.app.state.pixels_data) and 0 <= col < len(self.app.state.pixels_data[0]):
-                self.app.state.pixels_data[row][col] = color_key
-        elif self.app.state.frames_data is not None:
-            current_frame_data = self.app.state.frames_data[self.app.state.current_frame_index]
-            if 0 <= row < len(current_frame_data) and 0 <= col < len(current_frame_data[0]):
-                current_frame_data[row][col] = color_key
-        
-        self.app.update_canvas_image()
-        self.app._update_json_text()
-
-    def handle_erase(self, event):
-        """处理鼠标右键点击和拖动事件，用于擦除。"""
+    def _use_tool(self, event, value):
+        """按当前工具处理一次鼠标按下或拖动事件。"""
+        tool = self.app.tool_var.get()
+        is_press = event.type == tk.EventType.ButtonPress
         coords = self.screen_to_grid_coords(event.x, event.y)
         if not coords:
+            if tool not in (TOOL_FILL, TOOL_LINE, TOOL_RECT) and not is_press:
+                # 光标离开画布时断开笔画，重新进入时不与离开前的位置连线
+                self.stroke.add(None, None, value)
             return
-        
         row, col = coords
+
+        if tool == TOOL_FILL:
+            if is_press:
+                self._fill(row, col, value)
+        elif tool in (TOOL_LINE, TOOL_RECT):
+            if is_press or self.shape is None:
+                self._begin_shape(row, col, value)
+            self._update_shape(row, col)
+        elif is_press:
+            self.stroke.begin(row, col, value)
+        else:
+            # 拖动事件只加入队列，由笔触引擎插值并按帧率批量写入和刷新
+            self.stroke.add(row, col, value)
+
+    def _fill(self, row, col, value):
+        """油漆桶填充：整个区域一次写入像素数据，作为一条撤销记录，并只刷新一次预览和JSON文本。"""
+        pixel_data = self._current_pixel_data()
+        if pixel_data is None:
+            return
+        spans, target = flood_fill(pixel_data, row, col, value)
+        if not spans:
+            return
+        rows, cols = spans_to_cells(spans)
+        frame_index = self.app.state.current_frame_index if self.app.state.frames_data is not None else 0
+        count = len(rows)
+        self.app.history.push(frame_index, rows, cols, uniform_values(target, count), uniform_values(value, count))
+        cells = SpanCells(spans)
+        self._refresh_cells(cells, cells.rows)
+
+    def _begin_shape(self, row, col, value):
+        """开始拖动直线或矩形。拖动期间暂停动画，保证预览始终写在同一帧上。"""
+        self._commit_shape()
+        if self.app.state.is_playing:
+            self.app.pause_animation()
+        self.shape = {'anchor': (row, col), 'value': value, 'changed': [], 'old_values': []}
+
+    def _update_shape(self, row, col):
+        """撤回上一次的预览，再把从锚点到 (row, col) 的直线或矩形写入像素数据并刷新。"""
+        pixel_data = self._current_pixel_data()
+        if pixel_data is None or self.shape is None:
+            return
+        shape = self.shape
+        for (r, c), old_value in zip(shape['changed'], shape['old_values']):
+            pixel_data[r][c] = old_value
+        reverted = shape['changed']
+
+        anchor_row, anchor_col = shape['anchor']
+        if self.app.tool_var.get() == TOOL_LINE:
+            cells = line_cells(anchor_row, anchor_col, row, col)
+        else:
+            cells = rect_cells(anchor_row, anchor_col, row, col)
+        shape['changed'], shape['old_values'] = apply_cells(pixel_data, cells, shape['value'])
+        self._refresh_cells(list(set(reverted).union(shape['changed'])))
+
+    def _commit_shape(self):
+        """把正在拖动的直线或矩形作为一条撤销记录提交。"""
+        shape, self.shape = self.shape, None
+        if not shape or not shape['changed']:
+            return
+        frame_index = self.app.state.current_frame_index if self.app.state.frames_data is not None else 0
+        self.app.history.push(frame_index, [r for r, _ in shape['changed']], [c for _, c in shape['changed']],
+                              shape['old_values'], [shape['value']] * len(shape['changed']))
+
+    def handle_stroke_end(self, event):
+        """松开鼠标按键时结束当前笔触或图形，整次拖动作为一条撤销记录。"""
+        self.stroke.end()
+        self._commit_shape()
+        self.app.history.end_stroke()
+
+    def handle_undo(self, event=None):
+        """撤销最近一次笔触（Ctrl+Z）。焦点在JSON文本框中时保留文本框自己的行为。"""
+        if self._focus_in_text():
+            return None
+        self.stroke.end()
+        self._commit_shape()
+        record = self.app.history.undo()
+        if record is not None:
+            self._apply_history(record, undo=True)
+        return 'break'
+
+    def handle_redo(self, event=None):
+        """重做最近撤销的笔触（Ctrl+Y 或 Ctrl+Shift+Z）。"""
+        if self._focus_in_text():
+            return None
+        self.stroke.end()
+        self._commit_shape()
+        record = self.app.history.redo()
+        if record is not None:
+            self._apply_history(record, undo=False)
+        return 'break'
+
+    def _focus_in_text(self):
+        return self.app.root.focus_get() is self.app.json_text
+
+    def _apply_history(self, record, undo):
+        """
+        把撤销/重做记录写回像素数据，并像绘制一样增量刷新预览和JSON文本。
+        记录所在的帧不是当前帧时先切换到该帧。
+        """
+        state = self.app.state
+        if state.frames_data is not None:
+            if record.frame_index >= len(state.frames_data):
+                return
+            if record.frame_index != state.current_frame_index:
+                self.app.change_frame(record.frame_index - state.current_frame_index)
+            pixel_data = state.frames_data[record.frame_index]
+        elif state.pixels_data is not None:
+            pixel_data = state.pixels_data
+        else:
+            return
+
+        cells = []
+        values = record.old_values if undo else record.new_values
+        if isinstance(pixel_data, Frame):
+            # 紧凑存储：直接写入扁平缓冲区，不为每个单元格创建行视图
+            buffer, width, height = pixel_data.buffer, pixel_data.width, pixel_data.height
+            for row, col, value in zip(record.rows, record.cols, values):
+                if row < height and col < width:
+                    buffer[row * width + col] = value
+                    cells.append((row, col))
+        else:
+            num_rows = len(pixel_data)
+            for row, col, value in zip(record.rows, record.cols, values):
+                if row < num_rows and col < len(pixel_data[row]):
+                    pixel_data[row][col] = value
+                    cells.append((row, col))
+        self._refresh_cells(cells)
+
+    def handle_erase(self, event):
+        """处理鼠标右键点击和拖动事件，用当前工具擦除（写入0）。"""
         erase_key = 0
+        self._use_tool(event, erase_key)
 
+    def _refresh_cells(self, cells, rows=None):
+        """
+        只刷新被修改的像素和JSON文本中对应的行，而不是重新渲染整帧、重写整个文本。
+        :param rows: 涉及的行号，省略时从 cells 中取得。
+        """
+        self.app.update_canvas_pixels(cells)
+        frame_index = self.app.state.current_frame_index if self.app.state.frames_data is not None else 0
+        self.app.json_sync.update_rows(frame_index, rows if rows is not None else [row for row, _ in cells])
+
+    def _current_pixel_data(self):
+        """返回当前正在编辑的二维像素数据（单帧图像或当前动画帧），没有数据时返回None。"""
         if self.app.state.pixels_data is not None:
-            if 0 <= row < len(self.app.state.pixels_data) and 0 <= col < len(self.app.state.pixels_data[0]):
-                self.app.state.pixels_data[row][col] = erase_key
-        elif self.app.state.frames_data is not None:
-            current_frame_data = self.app.state.frames_data[self.app.state.current_frame_index]
-            if 0 <= row < len(current_frame_data) and 0 <= col < len(current_frame_data[0]):
-                current_frame_data[row][col] = erase_key
+            return self.app.state.pixels_data
+        if self.app.state.frames_data is not None:
+            return self.app.state.frames_data[self.app.state.current_frame_index]
+        return None
 
-        self.app.update_canvas_image()
-        self.app._update_json_text()
+    def handle_json_edit(self, event):
+        """JSON文本框中发生编辑（输入、删除、粘贴或剪切）时，取消正在进行的后台渲染。"""
+        # 粘贴、剪切等虚拟事件总是视为编辑；按键事件只有产生字符或删除时才算编辑
+        is_edit = (event.type == tk.EventType.VirtualEvent
+                   or event.keysym in ('BackSpace', 'Delete')
+                   or (event.char and (event.char.isprintable() or event.char in '\r\t')))
+        if is_edit:
+            self.app.cancel_render()
 
     def select_color(self, color_key):
         """
@@ -96,26 +239,51 @@ class EventHandlers:
         if not self.app.state.canvas_size or not hasattr(self.app.image_label, 'image'):
             return None
 
-        displayed_image = self.app.image_label.image
-        img_width, img_height = displayed_image.width(), displayed_image.height()
-        
+        x_in_view, y_in_view = self._to_view_coords(event_x, event_y)
+        # 视口负责缩放和平移的逆变换
+        return self.app.viewport.screen_to_grid(x_in_view, y_in_view)
+
+    def _to_view_coords(self, event_x, event_y):
+        """把相对于预览Label的坐标转换为相对于视口图像左上角的坐标（图像在Label中居中显示）。"""
         label_width, label_height = self.app.image_label.winfo_width(), self.app.image_label.winfo_height()
+        offset_x = (label_width - self.app.viewport.view_width) // 2
+        offset_y = (label_height - self.app.viewport.view_height) // 2
+        return event_x - offset_x, event_y - offset_y
 
-        offset_x = (label_width - img_width) // 2
-        offset_y = (label_height - img_height) // 2
+    def handle_zoom(self, event):
+        """鼠标滚轮缩放，保持光标下的像素不动。Windows/macOS 使用 event.delta，X11 使用按钮4/5。"""
+        if event.num == 4 or (event.num != 5 and event.delta > 0):
+            steps = 1
+        else:
+            steps = -1
+        if self.app.viewport.zoom_by(steps, *self._to_view_coords(event.x, event.y)):
+            self.app.refresh_view()
 
-        x_in_img = event_x - offset_x
-        y_in_img = event_y - offset_y
+    def handle_zoom_in(self):
+        """处理“放大”按钮，以视口中心为基准。"""
+        if self.app.viewport.zoom_by(1):
+            self.app.refresh_view()
 
-        if not (0 <= x_in_img < img_width and 0 <= y_in_img < img_height):
-            return None
+    def handle_zoom_out(self):
+        """处理“缩小”按钮，以视口中心为基准。"""
+        if self.app.viewport.zoom_by(-1):
+            self.app.refresh_view()
 
-        canvas_w, canvas_h = self.app.state.canvas_size
-        
-        pixel_width = img_width / canvas_w
-        pixel_height = img_height / canvas_h
+    def handle_zoom_fit(self):
+        """处理“适应”按钮：缩放到能完整显示画布并居中。"""
+        self.app.viewport.fit()
+        self.app.refresh_view()
 
-        col = int(x_in_img / pixel_width)
-        row = int(y_in_img / pixel_height)
+    def handle_pan_start(self, event):
+        """按下鼠标中键时记录平移的起点。"""
+        self.pan_anchor = (event.x, event.y)
 
-        return row, col
\ No newline at end of file
+    def handle_pan(self, event):
+        """拖动鼠标中键平移视口。"""
+        if self.pan_anchor is None:
+            self.pan_anchor = (event.x, event.y)
+            return
+        dx, dy = event.x - self.pan_anchor[0], event.y - self.pan_anchor[1]
+        self.pan_anchor = (event.x, event.y)
+        if self.app.viewport.pan_by(dx, dy):
+            self.app.refresh_view()
\ No newline at end of file
@@ -0,0 +1,112 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# PNG 编码预设：在编码速度和文件大小之间取舍
+PNG_PRESETS = {
+    'fast': {'compress_level': 1},                     # 编码最快，文件较大
+    'balanced': {'compress_level': 6},                 # Pillow 的默认设置
+    'small': {'compress_level': 9, 'optimize': True},  # 文件最小，编码最慢
+}
+DEFAULT_PRESET = 'balanced'
+
+# 主线程检查导出是否完成的间隔（毫秒）
+EXPORT_POLL_MS = 50
+
+def frame_png_path(png_path, index):
+    """逐帧PNG的路径：与雪碧图同目录，文件名追加帧序号，例如 'walk_frame_0003.png'。"""
+    stem, _ = os.path.splitext(png_path)
+    return f'{stem}_frame_{index:04d}.png'
+
+def encode_png(image, path, preset=DEFAULT_PRESET):
+    """
+    按预设把图像编码为PNG文件。
+    :return: 写入的字节数。
+    """
+    if preset not in PNG_PRESETS:
+        raise ValueError(f"未知的PNG预设：{preset}，可选值为 {', '.join(PNG_PRESETS)}。")
+    image.save(path, 'PNG', **PNG_PRESETS[preset])
+    return os.path.getsize(path)
+
+def export_images(png_path, images, sprite_sheet=None, per_frame=False, preset=DEFAULT_PRESET,
+                  jobs=None, json_path=None, json_content=None):
+    """
+    导出渲染结果。雪碧图（或单帧图像）和可选的逐帧PNG在线程池中并行编码，
+    Pillow 在 zlib 压缩期间会释放 GIL，因此多个文件可以真正并行。
+
+    :param png_path: 主PNG的路径。动画时写入雪碧图，单帧图像时写入该图像。
+    :param images: 帧图像列表。调用方应传入副本，避免导出期间被编辑器修改。
+    :param sprite_sheet: 动画的雪碧图，单帧图像时为 None。
+    :param per_frame: 是否额外为每一帧写入单独的PNG（见 frame_png_path）。
+    :param preset: PNG 编码预设，见 PNG_PRESETS。
+    :param jobs: 编码线程数，默认为 CPU 核心数。
+    :param json_path: 可选，同时写入的JSON文件路径。
+    :param json_content: 写入 json_path 的文本内容。
+    :return: 描述本次导出的字典，包含写入的文件列表、总字节数和耗时。
+    """
+    if not images:
+        raise ValueError("没有可导出的图像。")
+    start = time.perf_counter()
+
+    tasks = [(sprite_sheet or images[0], png_path)]
+    if per_frame and sprite_sheet is not None:
+        tasks.extend((img, frame_png_path(png_path, i)) for i, img in enumerate(images))
+
+    with ThreadPoolExecutor(max_workers=min(len(tasks), jobs or os.cpu_count() or 1)) as executor:
+        sizes = list(executor.map(lambda task: encode_png(task[0], task[1], preset), tasks))
+    files = [path for _, path in tasks]
+
+    if json_path and json_content:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            f.write(json_content)
+        files.append(json_path)
+
+    return {
+        'files': files,
+        'png_bytes': sum(sizes),
+        'preset': preset,
+        'seconds': round(time.perf_counter() - start, 6),
+    }
+
+class ExportPipeline:
+    """
+    在后台线程中运行导出任务（默认为 export_images），导出期间编辑器保持响应。
+    完成后通过 root.after 在主线程中回调，同一时间只运行一个导出任务。
+    """
+    def __init__(self, app):
+        """
+        :param app: PixelArtApp 的实例，用于访问 root 以调度完成检查。
+        """
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+
+    @property
+    def busy(self):
+        """是否有正在进行的导出任务。"""
+        return self.future is not None
+
+    def start(self, on_done, on_error, task=export_images, **task_args):
+        """
+        启动导出任务。
+
+        :param on_done: 完成时在主线程中以任务的返回值（结果字典）调用。
+        :param on_error: 出错时在主线程中以异常对象调用。
+        :param task: 在后台线程中执行的导出函数，默认为 export_images。
+        :param task_args: 传给 task 的关键字参数。
+        """
+        if self.busy:
+            raise RuntimeError("已有导出任务正在进行。")
+        self.future = self.executor.submit(task, **task_args)
+        self.app.root.after(EXPORT_POLL_MS, self._poll, on_done, on_error)
+
+    def _poll(self, on_done, on_error):
+        if not self.future.done():
+            self.app.root.after(EXPORT_POLL_MS, self._poll, on_done, on_error)
+            return
+        future, self.future = self.future, None
+        error = future.exception()
+        if error is not None:
+            on_error(error)
+        else:
+            on_done(future.result())
@@ -1,6 +1,12 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
+import json
+
+from animation_export import export_animation_from_data
+from binary_format import BINARY_EXTENSION, read_binary, write_binary
+from frame_store import copy_frames, copy_pixels
+from json_sync import format_project_data
 
 class FileIOManager:
     """
@@ -18,32 +24,52 @@ class FileIOManager:
 
     def load_json_file(self):
         """
-        打开一个文件对话框来加载JSON文件，并将其内容放入JSON文本框中。
+        打开一个文件对话框来加载JSON文件或二进制项目文件，并将其内容放入JSON文本框中。
+        二进制文件会被转换为格式化的JSON文本。
         """
         file_path = filedialog.askopenfilename(
             initialdir=self.assets_dir,
             title="选择一个JSON文件",
-            filetypes=(("JSON 文件", "*.json"), ("所有文件", "*.*"))
+            filetypes=(("项目文件", f"*.json *{BINARY_EXTENSION}"), ("JSON 文件", "*.json"),
+                       ("二进制像素文件", f"*{BINARY_EXTENSION}"), ("所有文件", "*.*"))
         )
-        if not file_path:
-            return
+        if file_path:
+            self.load_file(file_path)
 
+    def load_file(self, file_path):
+        """
+        将JSON文件或二进制项目文件的内容放入JSON文本框中。
+        :return: 加载成功时返回 True，失败时显示错误并返回 False。
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                json_content = f.read()
+            if file_path.lower().endswith(BINARY_EXTENSION):
+                with read_binary(file_path) as doc:
+                    json_content = format_project_data(doc.to_data())
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    json_content = f.read()
+            # 丢弃尚未执行的编辑同步和正在进行的渲染，避免覆盖新加载的内容
+            self.app.json_sync.invalidate()
+            self.app.cancel_render()
             self.app.json_text.delete('1.0', tk.END)
             self.app.json_text.insert(tk.END, json_content)
         except Exception as e:
             messagebox.showerror("错误", f"加载文件失败: {e}")
+            return False
+        return True
 
     def save_image(self):
         """
         打开一个文件对话框，将当前渲染的图像（单帧或雪碧图）保存为PNG，
         并自动将文本框中的JSON内容保存为同名的.json文件。
+        编码在后台线程中进行，可选地同时导出逐帧PNG，完成后弹窗提示。
         """
         if not self.app.state.pil_images:
             messagebox.showwarning("警告", "没有可保存的内容。")
             return
+        if self.app.export_pipeline.busy:
+            messagebox.showwarning("警告", "正在导出，请稍候。")
+            return
 
         # 统一保存为PNG格式
         file_types = [("PNG 图像", "*.png")]
@@ -67,26 +93,111 @@ class FileIOManager:
         png_path = file_path # PNG路径由用户指定
         json_path = os.path.join(self.assets_dir, f"{filename_without_ext}.json") # JSON路径固定到assets
 
+        # 在主线程中取得JSON文本和图像的快照，导出期间的编辑不会影响输出
+        self.app.json_sync.flush()
+        json_content = self.app.json_text.get("1.0", tk.END)
+        images = [img.copy() for img in self.app.state.pil_images]
+        sprite_sheet = self.app.state.sprite_sheet.copy() if self.app.state.sprite_sheet else None
+
+        self.app.save_button.config(state=tk.DISABLED)
+        self.app.export_pipeline.start(
+            self._on_export_done, self._on_export_error,
+            png_path=png_path,
+            images=images,
+            sprite_sheet=sprite_sheet,
+            per_frame=self.app.export_frames_var.get(),
+            preset=self.app.export_preset_var.get(),
+            json_path=json_path,
+            json_content=json_content if json_content.strip() else None, # 确保有内容才保存
+        )
+
+    def _on_export_done(self, result):
+        """导出完成后在主线程中提示结果。"""
+        self.app.save_button.config(state=tk.NORMAL)
+        file_list = "\n".join(f"- {path}" for path in result['files'])
+        messagebox.showinfo("成功", f"文件已成功保存 ({result['seconds']:.2f} 秒):\n{file_list}")
+
+    def _on_export_error(self, error):
+        """导出失败时在主线程中报告错误。"""
+        self.app.save_button.config(state=tk.NORMAL)
+        messagebox.showerror("错误", f"保存文件失败: {error}")
+
+    def save_animation(self):
+        """
+        打开一个文件对话框，将当前动画导出为 GIF、APNG 或动画 WebP。
+        每帧的持续时间取自“持续时间”输入框，编码在后台线程中进行。
+        """
+        state = self.app.state
+        if not state.pil_images or (state.frames_data is None and state.pixels_data is None):
+            messagebox.showwarning("警告", "没有可导出的内容。")
+            return
+        if self.app.export_pipeline.busy:
+            messagebox.showwarning("警告", "正在导出，请稍候。")
+            return
         try:
-            # --- 保存PNG图像 ---
-            # 根据是否存在雪碧图来决定保存内容
-            if self.app.state.sprite_sheet:
-                self.app.state.sprite_sheet.save(png_path, 'PNG')
-            elif self.app.state.pil_images:
-                # 如果没有雪碧图，但有单帧图像
-                self.app.state.pil_images[0].save(png_path, 'PNG')
-            else:
-                # 此情况理论上不应发生，因为保存按钮在无图时是禁用的
-                messagebox.showwarning("警告", "没有图像可保存。")
-                return
-            
-            # --- 保存JSON文件 ---
-            json_content = self.app.json_text.get("1.0", tk.END)
-            if json_content.strip(): # 确保有内容才保存
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    f.write(json_content)
-            
-            messagebox.showinfo("成功", f"文件已成功保存:\n- 图像: {png_path}\n- 数据: {json_path}")
+            duration = int(self.app.duration_var.get())
+        except ValueError:
+            messagebox.showerror("错误", "持续时间必须是整数。")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            initialdir=self.output_dir,
+            defaultextension=".gif",
+            filetypes=[("GIF 动画", "*.gif"), ("APNG 动画", "*.apng"), ("WebP 动画", "*.webp")],
+            title="导出动画"
+        )
+        if not file_path:
+            return
+
+        # 复制当前的像素数据，导出期间的编辑不会影响输出
+        data = {'canvas_size': list(state.canvas_size), 'palette': dict(state.palette)}
+        if state.frames_data is not None:
+            data['frames'] = copy_frames(state.frames_data)
+        else:
+            data['pixels'] = copy_pixels(state.pixels_data)
+
+        self.app.save_button.config(state=tk.DISABLED)
+        self.app.export_pipeline.start(
+            self._on_animation_done, self._on_export_error,
+            task=export_animation_from_data,
+            data=data,
+            path=file_path,
+            transparent_bg=self.app.transparent_var.get(),
+            duration_ms=duration,
+        )
+
+    def _on_animation_done(self, result):
+        """动画导出完成后在主线程中提示结果。"""
+        self.app.save_button.config(state=tk.NORMAL)
+        messagebox.showinfo("成功", f"{result['format']} 动画已成功保存 ({result['encoded_frames']}/{result['frames']} 帧):\n{result['path']}")
+
+    def save_binary(self):
+        """
+        打开一个文件对话框，将JSON文本框中的项目数据导出为压缩的二进制项目文件。
+        """
+        self.app.json_sync.flush()
+        json_content = self.app.json_text.get("1.0", tk.END)
+        if not json_content.strip():
+            messagebox.showwarning("警告", "没有可导出的内容。")
+            return
 
+        try:
+            data = json.loads(json_content)
+        except json.JSONDecodeError:
+            messagebox.showerror("错误", "无效的JSON格式。")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            initialdir=self.assets_dir,
+            defaultextension=BINARY_EXTENSION,
+            filetypes=[("二进制像素文件", f"*{BINARY_EXTENSION}")],
+            title="导出二进制"
+        )
+        if not file_path:
+            return
+
+        try:
+            write_binary(data, file_path, compress=True)
+            messagebox.showinfo("成功", f"二进制文件已成功保存:\n{file_path}")
         except Exception as e:
-            messagebox.showerror("错误", f"保存文件失败: {e}")
\ No newline at end of file
+            messagebox.showerror("错误", f"导出二进制文件失败: {e}")
@@ -0,0 +1,187 @@
+import itertools
+from array import array
+
+# NumPy 为可选依赖：存在时帧可以零拷贝地视为二维数组
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 可用的存储类型，按从小到大的顺序尝试：uint8、uint16
+STORE_TYPECODES = ('B', 'H')
+
+class Frame:
+    """
+    一帧像素数据的紧凑表示：一个按行主序存放 高 x 宽 个像素值的连续 array。
+
+    接口与JSON中的行列表保持兼容：len(frame) 为行数，frame[row] 返回该行的可写 memoryview
+    （零拷贝，frame[row][col] = value 直接写入缓冲区），迭代时逐行产生。
+    需要整块访问时使用 buffer（扁平 array）、row_bounds() 或 to_numpy()。
+    """
+    __slots__ = ('buffer', 'width', 'height', '_view')
+
+    def __init__(self, buffer, width, height):
+        """
+        :param buffer: 长度为 width * height 的 array('B') 或 array('H')。
+        """
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self._view = memoryview(buffer)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self.height))]
+        if row < 0:
+            row += self.height
+        if not 0 <= row < self.height:
+            raise IndexError("行号超出帧的范围。")
+        start = row * self.width
+        return self._view[start:start + self.width]
+
+    def __iter__(self):
+        for row in range(self.height):
+            yield self[row]
+
+    def row_bounds(self, row):
+        """:return: 该行在 buffer 中的 [start, stop) 区间。"""
+        start = row * self.width
+        return start, start + self.width
+
+    def to_numpy(self):
+        """返回形状为 (高, 宽) 的 NumPy 数组，与 buffer 共享内存（零拷贝），需要 NumPy。"""
+        return np.frombuffer(self.buffer, dtype=self.buffer.typecode).reshape(self.height, self.width)
+
+    def tolist(self):
+        """转换为JSON中的行列表形式。"""
+        buffer, width = self.buffer, self.width
+        return [buffer[start:start + width].tolist() for start in range(0, width * self.height, width)]
+
+    def copy(self):
+        return Frame(array(self.buffer.typecode, self.buffer), self.width, self.height)
+
+class FrameStore:
+    """
+    动画帧的紧凑存储：每帧一个连续的 uint8/uint16 缓冲区（见 Frame），每个像素只占1或2字节，
+    而JSON形式的行列表每个像素需要一个列表槽位（8字节）外加整数对象。
+
+    只有规整（每帧恰好 高 x 宽）、只包含整数且值（以及调色板中的整数键）在 uint16 范围内的数据才能紧凑存储；
+    其他数据由 from_lists() 返回 None，调用方继续使用行列表，渲染和编辑逻辑两种形式都支持。
+    """
+    def __init__(self, frames, width, height):
+        """
+        :param frames: Frame 列表，尺寸都是 width x height，使用相同的存储类型。
+        """
+        self.frames = frames
+        self.width = width
+        self.height = height
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    @property
+    def typecode(self):
+        return self.frames[0].buffer.typecode if self.frames else STORE_TYPECODES[0]
+
+    @property
+    def nbytes(self):
+        """像素数据占用的字节数。"""
+        return sum(frame.buffer.itemsize * len(frame.buffer) for frame in self.frames)
+
+    def tolist(self):
+        """转换为JSON中 'frames' 的形式。"""
+        return [frame.tolist() for frame in self.frames]
+
+    def copy(self):
+        """复制所有帧缓冲区，例如在后台导出前保存一份快照。"""
+        return FrameStore([frame.copy() for frame in self.frames], self.width, self.height)
+
+    @classmethod
+    def from_lists(cls, frames, width, height, palette=None):
+        """
+        把JSON中的帧列表转换为紧凑存储。
+
+        :param frames: 帧列表，每帧为行列表。
+        :param palette: 可选的调色板字典。编辑时写入的是调色板键对应的整数，
+                        因此整数键也必须能放进所选的存储类型。
+        :return: FrameStore；数据不规整、包含非整数（包括布尔值）或超出 uint16 范围时返回 None。
+        """
+        if not isinstance(width, int) or not isinstance(height, int) or width < 0 or height < 0:
+            return None
+        for frame in frames:
+            if not isinstance(frame, list) or len(frame) != height:
+                return None
+            for row in frame:
+                if not isinstance(row, list) or len(row) != width:
+                    return None
+            # 与渲染器一致，1 和 True 对应不同的调色板键，不能存为同一个整数
+            if not set(map(type, itertools.chain.from_iterable(frame))) <= {int}:
+                return None
+
+        max_key = 0
+        for key in palette or ():
+            try:
+                value = int(key)
+            except (TypeError, ValueError):
+                continue
+            if value < 0:
+                return None
+            max_key = max(max_key, value)
+
+        for typecode in STORE_TYPECODES:
+            if max_key >= 1 << (8 * array(typecode).itemsize):
+                continue
+            try:
+                buffers = [array(typecode, itertools.chain.from_iterable(frame)) for frame in frames]
+            except OverflowError:
+                continue
+            return cls([Frame(buffer, width, height) for buffer in buffers], width, height)
+        return None
+
+def compact_document(data):
+    """
+    在解析后的项目文档中就地把 'frames' 替换为 FrameStore、把 'pixels' 替换为 Frame，
+    之后渲染器和编辑器直接在紧凑缓冲区上工作；无法紧凑存储的数据保持原样。
+    :return: 是否发生了替换。
+    """
+    if not isinstance(data, dict):
+        return False
+    try:
+        width, height = data['canvas_size']
+    except (KeyError, ValueError, TypeError):
+        return False
+    palette = data.get('palette') if isinstance(data.get('palette'), dict) else None
+    if isinstance(data.get('frames'), list) and data['frames']:
+        store = FrameStore.from_lists(data['frames'], width, height, palette)
+        if store is None:
+            return False
+        data['frames'] = store
+        return True
+    if 'frames' not in data and isinstance(data.get('pixels'), list):
+        store = FrameStore.from_lists([data['pixels']], width, height, palette)
+        if store is None:
+            return False
+        data['pixels'] = store[0]
+        return True
+    return False
+
+def copy_pixels(pixel_data):
+    """复制一帧像素数据（Frame 或行列表），结果与输入不共享数据。"""
+    if isinstance(pixel_data, Frame):
+        return pixel_data.copy()
+    return [list(row) for row in pixel_data]
+
+def copy_frames(frames_data):
+    """复制动画帧数据（FrameStore 或帧列表），例如在后台导出前保存快照。"""
+    if isinstance(frames_data, FrameStore):
+        return frames_data.copy()
+    return [copy_pixels(frame) for frame in frames_data]
@@ -0,0 +1,190 @@
+import sys
+from array import array
+from collections import deque
+
+# 撤销历史的默认内存上限（字节）
+DEFAULT_HISTORY_MAX_BYTES = 16 * 1024 * 1024
+# 每条记录除数组内容之外的固定开销估计（对象、属性和数组头）
+_RECORD_OVERHEAD = 256
+
+def _pack_values(values):
+    """像素值全部是64位整数时压缩存储为 array('q')，否则（格式错误的数据）退回为元组，保证写回的值与原值完全相同。"""
+    if isinstance(values, array) and values.typecode == 'q':
+        return values
+    values = list(values)
+    if all(type(value) is int for value in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            pass
+    return tuple(values)
+
+def uniform_values(value, count):
+    """返回 count 个相同值的序列，整数直接构造 array('q')，避免批量编辑时逐个检查和打包。"""
+    if type(value) is int:
+        try:
+            return array('q', (value,)) * count
+        except OverflowError:
+            pass
+    return [value] * count
+
+def _container_bytes(container):
+    if isinstance(container, array):
+        return container.itemsize * len(container)
+    return sys.getsizeof(container)
+
+class StrokeRecord:
+    """
+    一次笔触（一次鼠标拖动）的像素增量：所在帧、被修改的坐标以及修改前后的值。
+    同一个单元格在一次笔触中被多次修改时只保留最早的旧值和最新的新值。
+    """
+    __slots__ = ('frame_index', 'rows', 'cols', 'old_values', 'new_values')
+
+    def __init__(self, frame_index, rows, cols, old_values, new_values):
+        """
+        :param frame_index: 帧索引，单帧图像时为0。
+        :param rows: 被修改单元格的行号序列。
+        :param cols: 被修改单元格的列号序列。
+        :param old_values: 修改前的值序列。
+        :param new_values: 修改后的值序列。
+        """
+        self.frame_index = frame_index
+        self.rows = rows if isinstance(rows, array) and rows.typecode == 'I' else array('I', rows)
+        self.cols = cols if isinstance(cols, array) and cols.typecode == 'I' else array('I', cols)
+        self.old_values = _pack_values(old_values)
+        self.new_values = _pack_values(new_values)
+
+    @classmethod
+    def from_changes(cls, frame_index, changes):
+        """
+        :param changes: {(行, 列): (旧值, 新值)}，按插入顺序保存。
+        """
+        return cls(frame_index, (row for row, _ in changes), (col for _, col in changes),
+                   (old for old, _ in changes.values()), (new for _, new in changes.values()))
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        """记录占用内存的估计值（字节），用于历史的容量控制。"""
+        return _RECORD_OVERHEAD + sum(_container_bytes(c) for c in
+                                      (self.rows, self.cols, self.old_values, self.new_values))
+
+    def changes(self, undo):
+        """
+        :param undo: True 返回撤销时要写回的旧值，False 返回重做时要写回的新值。
+        :return: [(行, 列, 值)] 列表。
+        """
+        values = self.old_values if undo else self.new_values
+        return list(zip(self.rows, self.cols, values))
+
+class History:
+    """
+    基于像素增量的撤销/重做历史。
+
+    每次笔触只记录被修改的单元格，而不是整帧或整个动画的快照；撤销和重做栈的总大小超过
+    max_bytes 时淘汰最旧的记录（最新的一条总是保留）。新的笔触会清空重做栈。
+    """
+    def __init__(self, max_bytes=DEFAULT_HISTORY_MAX_BYTES):
+        """
+        :param max_bytes: 撤销和重做栈合计的内存上限（字节）。
+        """
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.nbytes = 0
+        self._frame_index = None
+        self._changes = None  # 正在进行的笔触：{(行, 列): (旧值, 新值)}
+
+    @property
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def begin_stroke(self, frame_index):
+        """开始一次新的笔触；仍未结束的笔触会先被提交。"""
+        self.end_stroke()
+        self._frame_index = frame_index
+        self._changes = {}
+
+    def record(self, frame_index, row, col, old_value, new_value):
+        """
+        记录笔触中的一次单元格修改。没有进行中的笔触时自动开始一次；
+        拖动期间帧发生变化（例如动画仍在播放）时，当前笔触在帧切换处拆分为两条记录。
+        """
+        if self._changes is None or frame_index != self._frame_index:
+            self.begin_stroke(frame_index)
+        key = (row, col)
+        previous = self._changes.get(key)
+        self._changes[key] = (previous[0] if previous else old_value, new_value)
+
+    def end_stroke(self):
+        """结束当前笔触并压入撤销栈。没有实际修改的笔触会被丢弃。"""
+        changes, self._changes = self._changes, None
+        if not changes:
+            return
+        # 在一次笔触中被改回原值的单元格无需记录
+        changes = {key: values for key, values in changes.items() if values[0] != values[1]}
+        if not changes:
+            return
+        self._push_record(StrokeRecord.from_changes(self._frame_index, changes))
+
+    def push(self, frame_index, rows, cols, old_values, new_values):
+        """
+        把一次批量编辑（例如填充、直线或矩形）作为一条完整的记录压入撤销栈，
+        不经过逐格的 record()。各序列按单元格一一对应，调用方保证每个单元格只出现一次且值确实变化。
+        """
+        self.end_stroke()
+        if len(rows):
+            self._push_record(StrokeRecord(frame_index, rows, cols, old_values, new_values))
+
+    def _push_record(self, record):
+        self._discard_redo()
+        self.undo_stack.append(record)
+        self.nbytes += record.nbytes
+        self._evict()
+
+    def undo(self):
+        """
+        弹出最近的一次笔触，调用方应写回 record.changes(undo=True)。
+        :return: StrokeRecord，没有可撤销的记录时返回 None。
+        """
+        self.end_stroke()
+        if not self.undo_stack:
+            return None
+        record = self.undo_stack.pop()
+        self.redo_stack.append(record)
+        return record
+
+    def redo(self):
+        """
+        重新应用最近撤销的笔触，调用方应写回 record.changes(undo=False)。
+        :return: StrokeRecord，没有可重做的记录时返回 None。
+        """
+        self.end_stroke()
+        if not self.redo_stack:
+            return None
+        record = self.redo_stack.pop()
+        self.undo_stack.append(record)
+        return record
+
+    def clear(self):
+        """清空所有历史，例如重新渲染或加载了新的数据后。"""
+        self._changes = None
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.nbytes = 0
+
+    def _discard_redo(self):
+        for record in self.redo_stack:
+            self.nbytes -= record.nbytes
+        self.redo_stack.clear()
+
+    def _evict(self):
+        """淘汰最旧的撤销记录，直到总大小不超过上限。"""
+        while self.nbytes > self.max_bytes and len(self.undo_stack) > 1:
+            self.nbytes -= self.undo_stack.popleft().nbytes
@@ -0,0 +1,133 @@
+import io
+import json
+
+# 每次从文件读取的字符数
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+class FrameStreamReader:
+    """
+    流式读取项目JSON文档：顶层的其他字段照常解码，'frames' 数组中的帧则一次只解码一帧。
+
+    内存占用只与当前帧和读取缓冲区的大小有关，而与帧的总数无关。
+    用法：先调用 read_header() 得到 'frames' 之前的顶层字段，再迭代 iter_frames()；
+    迭代结束后，'frames' 之后出现的字段也会被补充到 header 中。
+    """
+    def __init__(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param source: 以文本模式打开的文件对象，或JSON字符串。
+        :param chunk_size: 每次读取的字符数。
+        """
+        self.fp = io.StringIO(source) if isinstance(source, str) else source
+        self.chunk_size = chunk_size
+        self.header = {}
+        self.has_frames = False
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._state = 'start'
+
+    # --- 缓冲区操作 ---
+
+    def _fill(self, min_chars=0):
+        """从源读取更多内容，至少读取 chunk_size 和 min_chars 中较大的字符数。"""
+        if self._eof:
+            return False
+        # 丢弃已消费的内容，使缓冲区只保留尚未解析的部分
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        chunk = self.fp.read(max(self.chunk_size, min_chars))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf += chunk
+        return True
+
+    def _peek(self):
+        """跳过空白并返回下一个字符，到达末尾时返回空字符串。"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars):
+        ch = self._peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"JSON 格式错误：期望 {' 或 '.join(repr(c) for c in chars)}，实际为 {ch or '文件结尾'!r}。")
+        self._pos += 1
+        return ch
+
+    def _decode_value(self):
+        """解码缓冲区当前位置的一个完整JSON值，必要时继续读取。"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # 数字可能恰好在缓冲区末尾被截断，只有后面还有字符或已到末尾时才可信
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # 每次至少读入与已缓冲内容相同的量，避免大值被反复从头解析
+            self._fill(len(self._buf) - self._pos)
+
+    # --- 文档结构解析 ---
+
+    def _read_members(self):
+        """读取顶层字段，直到遇到 'frames' 数组的开头或对象结束。"""
+        while True:
+            ch = self._peek()
+            if ch == '}':
+                self._pos += 1
+                self._state = 'done'
+                return
+            if self.header or self.has_frames:
+                self._expect(',')
+            key = self._decode_value()
+            if not isinstance(key, str):
+                raise ValueError("JSON 格式错误：对象的键必须是字符串。")
+            self._expect(':')
+            if key == 'frames' and self._peek() == '[':
+                self._pos += 1
+                self.has_frames = True
+                self._state = 'frames'
+                return
+            self.header[key] = self._decode_value()
+
+    def read_header(self):
+        """
+        读取 'frames' 之前的所有顶层字段。
+        :return: 顶层字段字典（不含 'frames'）。
+        """
+        if self._state == 'start':
+            self._expect('{')
+            self._state = 'members'
+            self._read_members()
+        return self.header
+
+    def iter_frames(self):
+        """
+        逐帧解码 'frames' 数组，每次产出一帧的二维像素数据。
+        迭代结束后继续读取 'frames' 之后的顶层字段。
+        """
+        self.read_header()
+        if self._state != 'frames':
+            return
+        first = True
+        while True:
+            if self._peek() == ']':
+                self._pos += 1
+                break
+            if not first:
+                self._expect(',')
+            first = False
+            yield self._decode_value()
+        self._state = 'members'
+        self._read_members()
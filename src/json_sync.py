@@ -0,0 +1,186 @@
+import json
+
+from perf_stats import timed
+
+# 完整重新序列化的防抖延迟（毫秒）
+JSON_SYNC_DELAY_MS = 300
+
+# 'frames' 中每一行与 'pixels' 中每一行的缩进
+FRAME_ROW_INDENT = ' ' * 12
+PIXELS_ROW_INDENT = ' ' * 8
+
+def format_row(row, indent, is_last):
+    """格式化JSON文本中的一行像素数据。紧凑存储的行（memoryview）先转换为列表。"""
+    if isinstance(row, memoryview):
+        row = row.tolist()
+    row_str = f'{indent}{json.dumps(row)}'
+    if not is_last:
+        row_str += ','
+    return row_str
+
+def format_json_document(canvas_size, palette, frames_data=None, pixels_data=None, extra=None):
+    """
+    手动构建JSON字符串以获得更好的格式：每一行像素数据占据文本中的一行。
+
+    :param canvas_size: 画布尺寸 (宽度, 高度)。
+    :param palette: 调色板字典。
+    :param frames_data: 动画帧数据，与 pixels_data 二选一。
+    :param pixels_data: 单帧像素数据。
+    :param extra: 可选的其他顶层字段（例如 duration_ms），追加在像素数据之后。
+    :return: (json_string, row_lines) 元组。row_lines[i] 是第 i 帧（单帧图像时只有一项）
+             第一行像素数据在文本中的行号（从1开始，与Tk文本索引一致）。
+    """
+    lines = [
+        "{",
+        f'    "canvas_size": {json.dumps(canvas_size)},',
+        f'    "palette": {json.dumps(palette, indent=4)},'
+    ]
+    # 调色板本身可能跨越多行
+    lines = "\n".join(lines).split("\n")
+    row_lines = []
+
+    # 格式化 'pixels' 或 'frames' 数据
+    if frames_data is not None:
+        lines.append('    "frames": [')
+        num_frames = len(frames_data)
+        for frame_index, frame in enumerate(frames_data):
+            lines.append('        [')
+            row_lines.append(len(lines) + 1)
+            num_rows = len(frame)
+            for row_index, row in enumerate(frame):
+                lines.append(format_row(row, FRAME_ROW_INDENT, row_index == num_rows - 1))
+
+            frame_end = '        ]'
+            if frame_index < num_frames - 1:
+                frame_end += ','
+            lines.append(frame_end)
+        lines.append('    ]')
+
+    elif pixels_data is not None:
+        lines.append('    "pixels": [')
+        row_lines.append(len(lines) + 1)
+        num_rows = len(pixels_data)
+        for row_index, row in enumerate(pixels_data):
+            lines.append(format_row(row, PIXELS_ROW_INDENT, row_index == num_rows - 1))
+        lines.append('    ]')
+
+    if extra:
+        lines[-1] += ','
+        extra_items = list(extra.items())
+        for i, (key, value) in enumerate(extra_items):
+            item = f'    {json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}'
+            if i < len(extra_items) - 1:
+                item += ','
+            lines.append(item)
+
+    lines.append("}")
+    return "\n".join(lines), row_lines
+
+def format_project_data(data):
+    """
+    将完整的项目数据字典格式化为JSON文本，保留 canvas_size、palette 和像素数据之外的其他顶层字段。
+    :return: JSON 字符串。
+    """
+    extra = {k: v for k, v in data.items() if k not in ('canvas_size', 'palette', 'frames', 'pixels')}
+    if 'frames' in data and data['frames']:
+        json_string, _ = format_json_document(data['canvas_size'], data.get('palette', {}),
+                                              frames_data=data['frames'], extra=extra)
+    else:
+        json_string, _ = format_json_document(data['canvas_size'], data.get('palette', {}),
+                                              pixels_data=data.get('pixels'), extra=extra)
+    return json_string
+
+class JsonTextSync:
+    """
+    负责把编辑器状态同步到JSON文本框。
+
+    编辑过程中以 AppState 为准：如果文本框的内容由本类生成且之后未被用户修改，
+    则只改写受影响的像素行；否则把完整的重新序列化推迟到停止编辑后的空闲时刻统一执行。
+    """
+    def __init__(self, app):
+        """
+        :param app: PixelArtApp 的实例，用于访问状态和JSON文本框。
+        """
+        self.app = app
+        self.row_lines = None  # 当前文本中每帧第一行像素数据的行号，None 表示布局未知
+        self.pending_job = None
+
+    @timed('JsonTextSync.full_sync')
+    def full_sync(self):
+        """根据当前的应用状态重建完整的JSON文本，并记录每一行像素数据所在的位置。"""
+        self.cancel()
+        state = self.app.state
+        if not state.canvas_size:
+            return
+
+        json_string, self.row_lines = format_json_document(
+            state.canvas_size, state.palette, state.frames_data, state.pixels_data)
+
+        # 更新文本框内容
+        self.app.json_text.delete('1.0', 'end')
+        self.app.json_text.insert('end', json_string)
+        self.app.json_text.edit_modified(False)
+
+    @timed('JsonTextSync.update_rows')
+    def update_rows(self, frame_index, row_indices):
+        """
+        同步一帧中若干行像素数据的修改。
+        文本布局已知时只改写这些行；否则安排一次防抖的完整同步。
+
+        :param frame_index: 帧索引，单帧图像时为0。
+        :param row_indices: 发生变化的行号序列。
+        """
+        state = self.app.state
+        if state.frames_data is not None:
+            pixel_data = state.frames_data[frame_index]
+            indent = FRAME_ROW_INDENT
+        elif state.pixels_data is not None:
+            pixel_data = state.pixels_data
+            indent = PIXELS_ROW_INDENT
+        else:
+            return
+
+        if not self._layout_is_current() or frame_index >= len(self.row_lines):
+            self.schedule_full_sync()
+            return
+
+        text = self.app.json_text
+        first_line = self.row_lines[frame_index]
+        num_rows = len(pixel_data)
+        for row in sorted(set(row_indices)):
+            if not 0 <= row < num_rows:
+                continue
+            line = first_line + row
+            text.delete(f'{line}.0', f'{line}.end')
+            text.insert(f'{line}.0', format_row(pixel_data[row], indent, row == num_rows - 1))
+        text.edit_modified(False)
+
+    def _layout_is_current(self):
+        """文本框内容是否仍是上次完整同步的结果（之后只有本类做过修改）。"""
+        return self.row_lines is not None and not self.app.json_text.edit_modified()
+
+    def schedule_full_sync(self):
+        """安排一次防抖的完整同步，连续的调用只会在最后一次之后执行一次。"""
+        if self.pending_job:
+            self.app.root.after_cancel(self.pending_job)
+        self.pending_job = self.app.root.after(JSON_SYNC_DELAY_MS, self._run_pending)
+
+    def _run_pending(self):
+        self.pending_job = None
+        self.full_sync()
+
+    def flush(self):
+        """如果有待执行的完整同步，立即执行，以便读取文本框时得到最新内容。"""
+        if self.pending_job:
+            self.full_sync()
+
+    def cancel(self):
+        """取消待执行的完整同步。"""
+        if self.pending_job:
+            self.app.root.after_cancel(self.pending_job)
+            self.pending_job = None
+
+    def invalidate(self):
+        """文本框内容被外部替换（例如加载文件）时调用：取消待执行的同步并丢弃已知布局。"""
+        self.cancel()
+        self.row_lines = None
@@ -0,0 +1,156 @@
+import functools
+
+# NumPy 为可选依赖：仅在向量化渲染路径中需要查找表数组
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 透明槽在稠密索引中的位置
+TRANSPARENT_INDEX = 0
+# 整数像素值映射表允许的最大键值
+MAX_LUT_VALUE = 65535
+# 进程级调色板缓存的容量
+PALETTE_CACHE_SIZE = 128
+# 索引色（"P" 模式）图像最多容纳的颜色数，包括透明槽
+MAX_INDEXED_COLORS = 256
+
+def hex_to_rgb(hex_color):
+    """将十六进制颜色字符串转换为 (R, G, B) 元组。"""
+    # 移除颜色字符串开头的 '#'
+    hex_color = hex_color.lstrip('#')
+    # 将十六进制字符串按每两位分割，并转换为整数，最终返回RGB元组
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+class CompiledPalette:
+    """
+    预编译的调色板：只解析一次十六进制颜色，并为每个颜色键分配稠密索引。
+
+    索引0固定为透明槽，调色板中的键按原顺序依次占用索引1..N。
+    无法解析的颜色不会在编译时报错，而是在实际渲染到该颜色时才抛出异常，
+    以保持与逐像素解析时相同的行为。
+    """
+    def __init__(self, palette):
+        """
+        :param palette: 原始调色板字典，键为颜色键字符串，值为十六进制颜色字符串。
+        """
+        self.palette = dict(palette)
+        self.colors = [(0, 0, 0, 0)]
+        self.key_to_index = {}
+        self.invalid_keys = {}
+
+        for color_key, hex_color in self.palette.items():
+            index = len(self.colors)
+            try:
+                self.colors.append(hex_to_rgb(hex_color) + (255,))
+            except (ValueError, TypeError, AttributeError):
+                # 占位为透明，真正使用时由 check_index 抛出原始异常
+                self.colors.append((0, 0, 0, 0))
+                self.invalid_keys[index] = color_key
+            self.key_to_index[color_key] = index
+
+        self._transparent_key_to_index = dict(self.key_to_index)
+        if '0' in self._transparent_key_to_index:
+            self._transparent_key_to_index['0'] = TRANSPARENT_INDEX
+
+        self._rgba_lut = None
+        self._value_luts = {}
+
+    def __len__(self):
+        """返回包括透明槽在内的索引总数。"""
+        return len(self.colors)
+
+    def keys_to_indices(self, transparent_bg=False):
+        """
+        返回颜色键到稠密索引的映射。
+        :param transparent_bg: 为True时键'0'映射到透明槽。
+        """
+        return self._transparent_key_to_index if transparent_bg else self.key_to_index
+
+    def index_of(self, pixel_value, transparent_bg=False):
+        """返回像素值对应的稠密索引，未知的值映射到透明槽。"""
+        return self.keys_to_indices(transparent_bg).get(str(pixel_value), TRANSPARENT_INDEX)
+
+    def check_index(self, index):
+        """如果索引对应的颜色无法解析，则抛出与 hex_to_rgb 相同的异常。"""
+        if index in self.invalid_keys:
+            hex_to_rgb(self.palette[self.invalid_keys[index]])
+
+    def rgba_of(self, pixel_value, transparent_bg=False):
+        """
+        返回像素值对应的 RGBA 元组；未知的值（或透明背景下的'0'）返回 None。
+        """
+        index = self.index_of(pixel_value, transparent_bg)
+        if index == TRANSPARENT_INDEX:
+            return None
+        self.check_index(index)
+        return self.colors[index]
+
+    def supports_indexed(self):
+        """调色板（含透明槽）是否能放进一张 "P" 模式图像。"""
+        return len(self.colors) <= MAX_INDEXED_COLORS
+
+    def apply_indexed_palette(self, image):
+        """
+        把调色板写入 'L' 或 'P' 模式的图像（'L' 会变为 'P'），像素值即稠密索引，
+        并把透明槽标记为透明索引，保存PNG时写入 tRNS 块。
+        :return: 传入的图像本身。
+        """
+        image.putpalette([channel for color in self.colors for channel in color[:3]])
+        image.info['transparency'] = TRANSPARENT_INDEX
+        return image
+
+    def rgba_lut(self):
+        """返回形状为 (N, 4) 的 uint8 RGBA 查找表，需要 NumPy。"""
+        if self._rgba_lut is None:
+            self._rgba_lut = np.array(self.colors, dtype=np.uint8)
+        return self._rgba_lut
+
+    def value_lut(self, transparent_bg=False):
+        """
+        返回以整数像素值为下标的稠密索引映射数组，需要 NumPy。
+        只有规范的非负整数字符串键（例如 '12'）才能被整数像素值 str() 后命中；
+        键值超过 MAX_LUT_VALUE 时返回 None，调用方应回退到按字符串匹配。
+        """
+        if transparent_bg not in self._value_luts:
+            key_to_index = self.keys_to_indices(transparent_bg)
+            int_keys = {int(k): i for k, i in key_to_index.items()
+                        if isinstance(k, str) and k.isdecimal() and str(int(k)) == k}
+            if max(int_keys, default=0) > MAX_LUT_VALUE:
+                lut = None
+            else:
+                # 至少保留下标0，没有整数键时所有值都映射为透明
+                lut = np.zeros(max(int_keys, default=0) + 1, dtype=np.intp)
+                for value, index in int_keys.items():
+                    lut[value] = index
+            self._value_luts[transparent_bg] = lut
+        return self._value_luts[transparent_bg]
+
+@functools.lru_cache(maxsize=PALETTE_CACHE_SIZE)
+def _compile_cached(palette_items):
+    return CompiledPalette(dict(palette_items))
+
+def compile_palette(palette):
+    """
+    返回调色板的编译形式。内容和键顺序都相同的调色板在整个进程内共享同一个 CompiledPalette。
+    :param palette: 原始调色板字典，或已经编译好的 CompiledPalette。
+    """
+    if isinstance(palette, CompiledPalette):
+        return palette
+    try:
+        # 键的顺序决定稠密索引和索引色图像的调色板，缓存键必须保留顺序，
+        # 否则编译结果会随进程的哈希种子变化
+        palette_items = tuple(palette.items())
+        hash(palette_items)
+    except TypeError:
+        # 含有不可哈希的值（格式错误的数据），跳过缓存直接编译
+        return CompiledPalette(palette)
+    return _compile_cached(palette_items)
+
+def palette_cache_info():
+    """返回进程级调色板缓存的命中统计。"""
+    return _compile_cached.cache_info()
+
+def clear_palette_cache():
+    """清空进程级调色板缓存。"""
+    _compile_cached.cache_clear()
@@ -0,0 +1,157 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+# 每个区段保留的最近样本数，统计值基于这些样本计算
+DEFAULT_MAX_SAMPLES = 200
+# 计算帧率时使用的最近时间点数
+DEFAULT_MAX_TICKS = 120
+
+class _NullSpan:
+    """禁用时使用的空上下文管理器，进入和退出都不做任何事。"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """记录一次区段耗时的上下文管理器。"""
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.record(self.name, time.perf_counter() - self.start)
+        return False
+
+def _percentile(sorted_values, fraction):
+    """最近秩法求百分位数，sorted_values 必须已排序且非空。"""
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class PerfStats:
+    """
+    轻量的区段计时器。默认禁用，禁用时 span() 返回共享的空上下文管理器，开销只有一次属性检查。
+    区段可以在任意线程中记录（例如后台渲染线程），内部用锁保护。
+    """
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES, max_ticks=DEFAULT_MAX_TICKS):
+        """
+        :param max_samples: 每个区段保留的最近样本数。
+        :param max_ticks: 每个帧率计数器保留的最近时间点数。
+        """
+        self.enabled = False
+        self.max_samples = max_samples
+        self.max_ticks = max_ticks
+        self._lock = threading.Lock()
+        self._samples = {}  # 区段名 -> deque[秒]
+        self._counts = {}   # 区段名 -> 启用以来的总次数
+        self._ticks = {}    # 计数器名 -> deque[时间点]
+
+    def span(self, name):
+        """返回计时上下文管理器：with stats.span('render'): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, seconds):
+        """直接记录一个区段的耗时（用于开始和结束不在同一个调用栈中的异步操作）。"""
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def tick(self, name):
+        """记录一个事件发生的时间点，例如动画播放的每一帧，用于计算每秒次数。"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            ticks = self._ticks.get(name)
+            if ticks is None:
+                ticks = self._ticks[name] = deque(maxlen=self.max_ticks)
+            ticks.append(now)
+
+    def rate(self, name):
+        """根据最近的时间点计算每秒次数，样本不足时返回 None。"""
+        with self._lock:
+            ticks = list(self._ticks.get(name, ()))
+        if len(ticks) < 2 or ticks[-1] <= ticks[0]:
+            return None
+        return (len(ticks) - 1) / (ticks[-1] - ticks[0])
+
+    def summary(self):
+        """
+        :return: {区段名: {'count', 'last_ms', 'avg_ms', 'p95_ms', 'max_ms'}}，统计值基于最近的样本。
+        """
+        with self._lock:
+            snapshot = {name: (list(samples), self._counts[name]) for name, samples in self._samples.items()}
+        result = {}
+        for name, (samples, count) in sorted(snapshot.items()):
+            ordered = sorted(samples)
+            result[name] = {
+                'count': count,
+                'last_ms': round(samples[-1] * 1000, 3),
+                'avg_ms': round(sum(samples) / len(samples) * 1000, 3),
+                'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+                'max_ms': round(ordered[-1] * 1000, 3),
+            }
+        return result
+
+    def rates(self):
+        """:return: {计数器名: 每秒次数或 None}。"""
+        with self._lock:
+            names = sorted(self._ticks)
+        return {name: self.rate(name) for name in names}
+
+    def reset(self):
+        """清空所有样本和计数器。"""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._ticks.clear()
+
+    def dump(self, path):
+        """将当前的统计结果写入JSON文件。"""
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'spans': self.summary(),
+            'rates': self.rates(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+# 进程内共享的计时器，渲染器和编辑器都记录到这里
+stats = PerfStats()
+
+def timed(name):
+    """
+    装饰器：启用计时时把函数的每次调用记录为名为 name 的区段。
+    禁用时直接调用原函数，只多一次属性检查。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
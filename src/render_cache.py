@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+from PIL import Image
+
+# 缓存格式版本，渲染输出发生变化时递增以使旧缓存失效
+CACHE_FORMAT_VERSION = 1
+# 默认的缓存容量上限（字节）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_MANIFEST_NAME = 'manifest.json'
+_SHEET_NAME = 'sheet.png'
+
+def _frame_name(index):
+    return f'frame_{index:04d}.png'
+
+def normalize_render_data(data):
+    """
+    提取影响渲染结果的字段，得到用于计算缓存键的规范形式。
+    与 render_from_data 的判断顺序一致：非空的 'frames' 优先于 'pixels'，
+    其他字段（例如 duration_ms）不影响渲染输出，因此不参与缓存键计算。
+    """
+    normalized = {
+        'canvas_size': data.get('canvas_size'),
+        'palette': data.get('palette', {}),
+    }
+    if 'frames' in data and data['frames']:
+        normalized['frames'] = data['frames']
+    elif 'pixels' in data:
+        normalized['pixels'] = data['pixels']
+    return normalized
+
+class RenderCache:
+    """
+    基于内容寻址的磁盘渲染缓存。
+
+    缓存键是规范化数据与渲染选项的 SHA-256 哈希。每个条目是缓存目录下的一个子目录，
+    包含清单文件、逐帧 PNG 和（动画时的）雪碧图。总大小超过上限时按最近使用时间淘汰最旧的条目。
+    """
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param cache_dir: 缓存目录，不存在时自动创建。
+        :param max_bytes: 缓存总大小上限（字节）。
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data, transparent_bg=False, **options):
+        """
+        计算渲染请求的缓存键。
+        :param data: 渲染数据字典。
+        :param transparent_bg: 是否使用透明背景。
+        :param options: 其他会影响渲染输出的选项。
+        :return: 十六进制的 SHA-256 字符串。
+        """
+        payload = {
+            'version': CACHE_FORMAT_VERSION,
+            'data': normalize_render_data(data),
+            'transparent_bg': bool(transparent_bg),
+            'options': options,
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _read_manifest(self, key):
+        """读取条目清单并刷新其最近使用时间，条目不存在或已损坏时返回 None。"""
+        manifest_path = os.path.join(self._entry_dir(key), _MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            os.utime(manifest_path)
+        except (OSError, ValueError):
+            return None
+        return manifest
+
+    def get(self, key):
+        """
+        读取缓存的渲染结果。
+        :return: 与 render_from_data 相同的 (images, sprite_sheet) 元组；未命中时返回 None。
+        """
+        manifest = self._read_manifest(key)
+        if manifest is not None:
+            entry_dir = self._entry_dir(key)
+            try:
+                images = [self._load_image(os.path.join(entry_dir, _frame_name(i)))
+                          for i in range(manifest['frames'])]
+                sprite_sheet = None
+                if manifest['sprite_sheet']:
+                    sprite_sheet = self._load_image(os.path.join(entry_dir, _SHEET_NAME))
+            except (OSError, KeyError):
+                # 条目可能正被其他进程淘汰，按未命中处理
+                images = None
+            if images is not None:
+                self.hits += 1
+                return images, sprite_sheet
+        self.misses += 1
+        return None
+
+    def get_output_file(self, key):
+        """
+        返回缓存中可以直接复制的输出文件（雪碧图或单帧 PNG），避免重新解码和编码。
+        :return: (png_path, frame_count) 元组；未命中时返回 None。
+        """
+        manifest = self._read_manifest(key)
+        if manifest is not None:
+            name = _SHEET_NAME if manifest.get('sprite_sheet') else _frame_name(0)
+            png_path = os.path.join(self._entry_dir(key), name)
+            if os.path.isfile(png_path):
+                self.hits += 1
+                return png_path, manifest.get('frames', 1)
+        self.misses += 1
+        return None
+
+    @staticmethod
+    def _load_image(path):
+        with Image.open(path) as img:
+            img.load()
+            # 索引色输出保持 "P" 模式，其余统一为 RGBA
+            return img.convert('RGBA') if img.mode not in ('RGBA', 'P') else img
+
+    def put(self, key, images, sprite_sheet=None):
+        """
+        写入渲染结果。先写入临时目录再原子重命名，多个进程可以安全地共享同一个缓存目录。
+        """
+        if not images:
+            return
+        tmp_dir = os.path.join(self.cache_dir, f'.tmp-{os.getpid()}-{uuid.uuid4().hex}')
+        try:
+            os.makedirs(tmp_dir)
+            for i, img in enumerate(images):
+                img.save(os.path.join(tmp_dir, _frame_name(i)), 'PNG')
+            if sprite_sheet is not None:
+                sprite_sheet.save(os.path.join(tmp_dir, _SHEET_NAME), 'PNG')
+            with open(os.path.join(tmp_dir, _MANIFEST_NAME), 'w', encoding='utf-8') as f:
+                json.dump({'frames': len(images), 'sprite_sheet': sprite_sheet is not None}, f)
+            os.replace(tmp_dir, self._entry_dir(key))
+            self.stores += 1
+        except OSError:
+            # 其他进程已经写入了同一个条目，或磁盘不可写：缓存失败不影响渲染结果
+            pass
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def _entries(self):
+        """返回 [(最近使用时间, 大小, 目录)] 列表。"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                mtime = os.stat(os.path.join(entry.path, _MANIFEST_NAME)).st_mtime
+            except OSError:
+                continue
+            entries.append((mtime, size, entry.path))
+        return entries
+
+    def evict(self):
+        """按最近使用时间淘汰最旧的条目，直到缓存总大小不超过上限。"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        """删除所有缓存条目。"""
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        """返回缓存命中统计与当前占用，便于验证缓存是否生效。"""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
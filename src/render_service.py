@@ -0,0 +1,334 @@
+import base64
+import io
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from export_pipeline import DEFAULT_PRESET, PNG_PRESETS
+from palette import palette_cache_info
+from perf_stats import PerfStats
+from renderer import render_from_data
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# 同时处理的请求数上限，超出时请求最多排队 DEFAULT_QUEUE_TIMEOUT 秒，之后返回 503
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_QUEUE_TIMEOUT = 5.0
+# 请求体大小和单次批量渲染的文档数上限
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_BATCH_DOCUMENTS = 256
+# 预热时等待全部工作进程到齐的最长时间（秒）
+WARM_UP_TIMEOUT = 30.0
+
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+def render_document(data, transparent_bg=False, indexed=False, preset=DEFAULT_PRESET):
+    """
+    工作进程入口：渲染一个项目文档并编码为PNG（动画为雪碧图）。
+    在工作进程中完成编码，只把PNG字节传回主进程，避免序列化图像对象。
+    编译后的调色板缓存在工作进程内，内容相同的调色板在后续请求中直接复用。
+
+    :return: 包含 'png'（bytes）、'frames'、'size'、'seconds' 和 'palette_cached' 的字典。
+    """
+    start = time.perf_counter()
+    hits_before = palette_cache_info().hits
+    images, sprite_sheet = render_from_data(data, transparent_bg, delta=True, indexed=indexed, prepare=True)
+    if not images:
+        raise ValueError("未能从JSON数据生成任何图像。")
+    output = sprite_sheet or images[0]
+    buffer = io.BytesIO()
+    output.save(buffer, 'PNG', **PNG_PRESETS[preset])
+    return {
+        'png': buffer.getvalue(),
+        'frames': len(images),
+        'size': list(output.size),
+        'seconds': round(time.perf_counter() - start, 6),
+        'palette_cached': palette_cache_info().hits > hits_before,
+    }
+
+# 预热屏障，由进程池的 initializer 在每个工作进程中设置
+_warm_up_barrier = None
+
+def _init_worker(barrier):
+    global _warm_up_barrier
+    _warm_up_barrier = barrier
+
+def _warm_up(_):
+    """
+    预热任务：在屏障处等待，直到每个工作进程都领取了一个预热任务后才返回进程号。
+    已经空闲的进程因此无法连续领走所有任务，进程池必须启动全部工作进程。
+    """
+    try:
+        _warm_up_barrier.wait(WARM_UP_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+    return os.getpid()
+
+class ServiceError(Exception):
+    """请求无法处理时引发，携带返回给客户端的HTTP状态码。"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class RenderService:
+    """
+    无界面的本地渲染服务：通过HTTP接收项目JSON文档，在常驻的进程池中调用 render_from_data 渲染，
+    返回PNG或批量结果。进程池在启动时预热，请求之间复用工作进程及其调色板缓存。
+
+    接口：
+        POST /render          请求体为一个项目文档，返回 image/png。
+        POST /render/batch    请求体为文档列表或 {"documents": [...]}，返回包含 base64 PNG 的JSON。
+        GET  /metrics         吞吐量、延迟和计数器。
+        GET  /health          存活检查。
+    查询参数 transparent、indexed 和 preset 对应 render_from_data 的选项和 PNG 编码预设。
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, jobs=None, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT, quiet=False):
+        """
+        :param jobs: 工作进程数，默认为 CPU 核心数。
+        :param max_concurrent: 同时处理的请求数上限。
+        :param queue_timeout: 请求等待空闲名额的最长时间（秒），超时返回 503。
+        :param quiet: 是否关闭每个请求的访问日志。
+        """
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.quiet = quiet
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                            initargs=(multiprocessing.Barrier(self.jobs),))
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+
+        # 延迟统计复用 PerfStats，始终启用
+        self.stats = PerfStats()
+        self.stats.enabled = True
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'documents': 0, 'frames': 0, 'errors': 0, 'rejected': 0,
+                         'in_flight': 0, 'palette_cache_hits': 0}
+        self.started = time.time()
+
+        self.httpd = ThreadingHTTPServer((host, port), _RequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.service = self
+
+    @property
+    def address(self):
+        """服务实际监听的 (主机, 端口)，端口为0时由系统分配。"""
+        return self.httpd.server_address[:2]
+
+    def warm_up(self):
+        """
+        让进程池立即启动全部工作进程，避免第一批请求承担进程启动的开销。
+        每个工作进程恰好执行一个预热任务，返回实际启动的进程数。
+        """
+        pids = set(self.executor.map(_warm_up, range(self.jobs)))
+        return len(pids)
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        """停止接收请求并关闭进程池。"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.executor.shutdown()
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self.counters[key] += delta
+
+    def render(self, documents, transparent_bg, indexed, preset):
+        """
+        在进程池中并行渲染多个文档。
+        :return: 与 documents 顺序一致的结果列表，每项为 render_document 的返回值或异常对象。
+        """
+        futures = [self.executor.submit(render_document, data, transparent_bg, indexed, preset)
+                   for data in documents]
+        results = []
+        for future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                self._count(errors=1)
+                results.append(e)
+                continue
+            self.stats.record('render', result['seconds'])
+            self.stats.tick('documents')
+            self._count(documents=1, frames=result['frames'], palette_cache_hits=int(result['palette_cached']))
+            results.append(result)
+        return results
+
+    def metrics(self):
+        """:return: 可直接序列化为JSON的服务指标。"""
+        uptime = time.time() - self.started
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, **{
+            'uptime_seconds': round(uptime, 3),
+            'workers': self.jobs,
+            'max_concurrent': self.max_concurrent,
+            'documents_per_second': round(counters['documents'] / uptime, 3) if uptime > 0 else None,
+            'recent_documents_per_second': self.stats.rate('documents'),
+            'latency': self.stats.summary(),
+        })
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = 'PixelArtRenderService/1.0'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if not self.service.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def _read_json(self):
+        length = self.headers.get('Content-Length')
+        if length is None:
+            raise ServiceError(411, "缺少 Content-Length。")
+        if not (length.isascii() and length.isdigit()):
+            raise ServiceError(400, f"无效的 Content-Length：{length!r}。")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise ServiceError(413, f"请求体超过 {MAX_BODY_BYTES} 字节的上限。")
+        try:
+            return json.loads(self.rfile.read(length))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ServiceError(400, f"无效的JSON格式: {e}")
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/metrics':
+            self._send_json(200, self.service.metrics())
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': f"未知的路径：{path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ('/render', '/render/batch'):
+            self._send_json(404, {'error': f"未知的路径：{url.path}"})
+            return
+
+        service = self.service
+        if not service.slots.acquire(timeout=service.queue_timeout):
+            service._count(rejected=1)
+            self._send_json(503, {'error': "服务繁忙，请稍后重试。"})
+            return
+        service._count(requests=1, in_flight=1)
+        start = time.perf_counter()
+        try:
+            query = parse_qs(url.query)
+            options = {
+                'transparent': query.get('transparent', ['0'])[0].lower() in _TRUE_VALUES,
+                'indexed': query.get('indexed', ['0'])[0].lower() in _TRUE_VALUES,
+                'preset': query.get('preset', [DEFAULT_PRESET])[0],
+            }
+            body = self._read_json()
+            if url.path == '/render':
+                self._handle_single(body, options)
+            else:
+                self._handle_batch(body, options)
+        except ServiceError as e:
+            service._count(errors=1)
+            self._send_json(e.status, {'error': str(e)})
+        finally:
+            service.stats.record('request', time.perf_counter() - start)
+            service._count(in_flight=-1)
+            service.slots.release()
+
+    def _check_options(self, options):
+        for key in ('transparent', 'indexed'):
+            # 查询参数已解析为布尔值；请求体中的选项必须是JSON布尔值，避免字符串 "false" 被当作真值
+            if not isinstance(options[key], bool):
+                raise ServiceError(400, f"选项 '{key}' 必须是布尔值（true 或 false），实际为 {options[key]!r}。")
+        if not isinstance(options['preset'], str) or options['preset'] not in PNG_PRESETS:
+            raise ServiceError(400, f"未知的PNG预设：{options['preset']}，可选值为 {', '.join(PNG_PRESETS)}。")
+
+    def _handle_single(self, data, options):
+        self._check_options(options)
+        if not isinstance(data, dict):
+            raise ServiceError(400, "请求体必须是一个项目JSON对象。")
+        result, = self.service.render([data], options['transparent'], options['indexed'], options['preset'])
+        if isinstance(result, Exception):
+            self._send_json(422, {'error': f"渲染失败: {result}"})
+            return
+        self._send(200, result['png'], 'image/png', {
+            'X-Frames': str(result['frames']),
+            'X-Render-Seconds': str(result['seconds']),
+        })
+
+    def _handle_batch(self, body, options):
+        if isinstance(body, dict):
+            documents = body.get('documents')
+            # 请求体中的选项优先于查询参数
+            for key in ('transparent', 'indexed', 'preset'):
+                if key in body:
+                    options[key] = body[key]
+        else:
+            documents = body
+        self._check_options(options)
+        if not isinstance(documents, list) or not all(isinstance(d, dict) for d in documents):
+            raise ServiceError(400, "批量请求体必须是文档列表或包含 'documents' 列表的对象。")
+        if len(documents) > MAX_BATCH_DOCUMENTS:
+            raise ServiceError(413, f"单次批量请求最多包含 {MAX_BATCH_DOCUMENTS} 个文档。")
+
+        start = time.perf_counter()
+        results = []
+        for result in self.service.render(documents, options['transparent'], options['indexed'], options['preset']):
+            if isinstance(result, Exception):
+                results.append({'ok': False, 'error': f"{type(result).__name__}: {result}"})
+            else:
+                results.append({
+                    'ok': True,
+                    'frames': result['frames'],
+                    'size': result['size'],
+                    'seconds': result['seconds'],
+                    'png': base64.b64encode(result['png']).decode('ascii'),
+                })
+        self._send_json(200, {'results': results, 'seconds': round(time.perf_counter() - start, 6)})
+
+# 当该脚本作为主程序运行时
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='启动无界面的本地渲染服务。')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='监听地址。')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口，0 表示由系统分配。')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='工作进程数，默认为 CPU 核心数。')
+    parser.add_argument('--max-concurrent', type=int, default=DEFAULT_MAX_CONCURRENT, help='同时处理的请求数上限。')
+    parser.add_argument('--queue-timeout', type=float, default=DEFAULT_QUEUE_TIMEOUT,
+                        help='请求等待空闲名额的最长时间（秒），超时返回 503。')
+    parser.add_argument('--quiet', action='store_true', help='不输出每个请求的访问日志。')
+    args = parser.parse_args()
+
+    service = RenderService(args.host, args.port, args.jobs, args.max_concurrent, args.queue_timeout, args.quiet)
+    workers = service.warm_up()
+    host, port = service.address
+    print(f"渲染服务已启动: http://{host}:{port}（{workers} 个工作进程）", file=sys.stderr)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
@@ -0,0 +1,120 @@
+import json
+import queue
+import threading
+
+from frame_store import compact_document
+from perf_stats import stats
+from renderer import render_from_data
+
+# 主线程轮询工作线程消息的间隔（毫秒）
+RENDER_POLL_MS = 30
+
+class RenderCancelled(Exception):
+    """渲染任务被取消时在工作线程内部引发，用于尽快中止渲染。"""
+
+class RenderWorker:
+    """
+    在后台线程中解析JSON并渲染，避免阻塞Tk主循环。
+
+    工作线程不接触任何Tk对象：进度和结果放入队列，由主线程通过 root.after 轮询取出后再回调。
+    每次 start() 都会取消仍在进行的任务；被取消或过期任务的消息会被直接丢弃。
+    """
+    def __init__(self, app):
+        """
+        :param app: PixelArtApp 的实例，用于访问 root 以调度轮询。
+        """
+        self.app = app
+        self.messages = queue.Queue()
+        self.generation = 0  # 当前任务的编号，用于识别过期消息
+        self.cancel_event = None
+        self.poll_job = None
+        self.callbacks = None
+
+    @property
+    def busy(self):
+        """是否有正在进行的渲染任务。"""
+        return self.cancel_event is not None
+
+    def start(self, json_string, transparent_bg, on_done, on_error, on_progress=None, indexed=False):
+        """
+        启动新的渲染任务，并取消仍在进行的旧任务。
+
+        :param json_string: 待解析的JSON文本。
+        :param transparent_bg: 是否使用透明背景。
+        :param on_done: 完成时在主线程中以 (data, images, sprite_sheet) 调用。
+                        data 中能紧凑存储的 'frames' / 'pixels' 已被替换为 FrameStore / Frame。
+        :param on_error: 出错时在主线程中以异常对象调用。
+        :param on_progress: 可选，在主线程中以 (已完成帧数, 总帧数) 调用。
+        :param indexed: 是否渲染为 "P" 模式的索引色图像。
+        """
+        self.cancel()
+        self.generation += 1
+        self.cancel_event = threading.Event()
+        self.callbacks = (on_done, on_error, on_progress)
+        thread = threading.Thread(target=self._run,
+                                  args=(self.generation, self.cancel_event, json_string, transparent_bg, indexed),
+                                  daemon=True)
+        thread.start()
+        self._schedule_poll()
+
+    def cancel(self):
+        """取消正在进行的任务。工作线程会在渲染完当前帧后停止，之后的消息都会被丢弃。"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+        self.callbacks = None
+        if self.poll_job:
+            self.app.root.after_cancel(self.poll_job)
+            self.poll_job = None
+
+    def _run(self, generation, cancel_event, json_string, transparent_bg, indexed):
+        """工作线程入口：只做解析和渲染，结果通过队列交给主线程。"""
+        def progress(done, total):
+            if cancel_event.is_set():
+                raise RenderCancelled()
+            self.messages.put((generation, 'progress', (done, total)))
+
+        try:
+            with stats.span('parse_json'):
+                data = json.loads(json_string)
+            # 像素数据在这里一次性转换为紧凑存储，之后的渲染和编辑都直接使用它
+            with stats.span('compact_frames'):
+                compact_document(data)
+            images, sprite_sheet = render_from_data(data, transparent_bg, delta=True, progress=progress,
+                                                    indexed=indexed)
+            if cancel_event.is_set():
+                raise RenderCancelled()
+            self.messages.put((generation, 'done', (data, images, sprite_sheet)))
+        except RenderCancelled:
+            pass
+        except Exception as e:
+            self.messages.put((generation, 'error', e))
+
+    def _schedule_poll(self):
+        self.poll_job = self.app.root.after(RENDER_POLL_MS, self._poll)
+
+    def _poll(self):
+        """在主线程中处理队列中的消息，任务结束前持续轮询。"""
+        self.poll_job = None
+        while True:
+            try:
+                generation, kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation or self.callbacks is None:
+                continue  # 已取消或过期任务的消息
+            on_done, on_error, on_progress = self.callbacks
+            if kind == 'progress':
+                if on_progress:
+                    on_progress(*payload)
+                continue
+            # 任务结束：先清理状态，再回调，回调中可以安全地启动新任务
+            self.cancel_event = None
+            self.callbacks = None
+            if kind == 'done':
+                on_done(*payload)
+            else:
+                on_error(payload)
+            return
+        if self.busy:
+            self._schedule_poll()
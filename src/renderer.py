@@ -1,18 +1,49 @@
+import functools
+import itertools
+
 # 导入Pillow库，用于图像处理
 from PIL import Image
 
-def hex_to_rgb(hex_color):
-    """将十六进制颜色字符串转换为 (R, G, B) 元组。"""
-    # 移除颜色字符串开头的 '#'
-    hex_color = hex_color.lstrip('#')
-    # 将十六进制字符串按每两位分割，并转换为整数，最终返回RGB元组
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+# NumPy 为可选依赖：存在时使用向量化渲染路径，否则回退到逐像素循环
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from frame_store import Frame
+from palette import hex_to_rgb, compile_palette
+from perf_stats import timed
+from validation import prepare_document
 
-def create_image_from_pixels(pixel_data, palette, canvas_width, canvas_height, transparent_bg=False):
+def create_image_from_pixels(pixel_data, palette, canvas_width, canvas_height, transparent_bg=False, indexed=False):
     """
-    从二维像素数据列表创建单个 PIL Image 对象。
+    从二维像素数据列表（或紧凑存储的 Frame）创建单个 PIL Image 对象。
     根据 transparent_bg 标志，决定如何处理值为0的像素。
+    安装了 NumPy 时使用向量化路径，输出与逐像素路径完全一致。
+
+    :param palette: 调色板字典或 CompiledPalette，字典会通过进程级缓存编译。
+    :param indexed: 为True时生成 "P" 模式的索引色图像（透明像素使用透明索引），
+                    内存只有 RGBA 的四分之一；调色板超过 255 种颜色时仍生成 RGBA 图像。
     """
+    compiled = compile_palette(palette)
+    indexed = indexed and compiled.supports_indexed()
+    if np is not None and canvas_width > 0 and canvas_height > 0:
+        return _create_image_vectorized(pixel_data, compiled, canvas_width, canvas_height, transparent_bg, indexed)
+    return _create_image_per_pixel(pixel_data, compiled, canvas_width, canvas_height, transparent_bg, indexed)
+
+def _create_image_per_pixel(pixel_data, compiled, canvas_width, canvas_height, transparent_bg=False, indexed=False):
+    """逐像素绘制的实现，在没有 NumPy 时使用。"""
+    if indexed:
+        # 索引色图像：像素值直接写入稠密索引，默认为透明索引
+        img = compiled.apply_indexed_palette(Image.new('L', (canvas_width, canvas_height), 0))
+        pixels = img.load()
+        for y, row in enumerate(pixel_data[:canvas_height]):
+            for x, value in enumerate(row[:canvas_width]):
+                index = compiled.index_of(value, transparent_bg)
+                compiled.check_index(index)
+                pixels[x, y] = index
+        return img
+
     # 创建一个新的 RGBA 图像，背景完全透明
     img = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
     pixels = img.load()
@@ -22,60 +53,431 @@ def create_image_from_pixels(pixel_data, palette, canvas_width, canvas_height, t
         for x in range(canvas_width):
             # 检查像素数据是否存在于当前坐标
             if y < len(pixel_data) and x < len(pixel_data[y]):
-                pixel_value = pixel_data[y][x]
-                
-                # 如果勾选了透明背景，则跳过值为'0'的像素
-                if transparent_bg and str(pixel_value) == '0':
-                    continue
-
-                # 从调色板中获取颜色并绘制像素
-                color_key = str(pixel_value)
-                if color_key in palette:
-                    color = hex_to_rgb(palette[color_key])
-                    pixels[x, y] = color + (255,)
+                # 从编译好的调色板中获取颜色；透明背景下的'0'和未知的键返回 None
+                color = compiled.rgba_of(pixel_data[y][x], transparent_bg)
+                if color is not None:
+                    pixels[x, y] = color
             # 如果坐标超出像素数据范围，则该像素将保持透明（或背景色）
             
     return img
 
-def create_sprite_sheet(images):
+def _map_int_values(values, value_lut):
+    """将整数像素值数组通过 value_lut 映射为稠密索引，未知的值映射为透明。"""
+    in_range = (values >= 0) & (values < len(value_lut))
+    return np.where(in_range, value_lut[np.where(in_range, values, 0)], 0)
+
+def _as_int_array(rows):
+    """
+    尝试将行数据转换为非负整数数组，数据不规整、包含非整数、负数或布尔值时返回 None。
+    负数可能对应 '-1' 这样的键；NumPy 会把混在整数中的布尔值转换为 0/1，而逐像素路径按 'True'/'False' 匹配。
+    这些情况都交给调用方按 str() 语义处理。
+    """
+    try:
+        arr = np.asarray(rows)
+    except (ValueError, OverflowError):
+        return None
+    if arr.dtype.kind not in 'iu' or (arr.size and arr.min() < 0):
+        return None
+    values = itertools.chain.from_iterable(rows) if arr.ndim == 2 else rows
+    if bool in set(map(type, values)):
+        return None
+    return arr
+
+def _create_image_vectorized(pixel_data, compiled, canvas_width, canvas_height, transparent_bg=False, indexed=False):
+    """
+    NumPy 向量化实现：先将整帧转换为稠密索引数组，再通过 RGBA 查找表一次性映射并构建图像。
+    """
+    key_to_index = compiled.keys_to_indices(transparent_bg)
+    value_lut = compiled.value_lut(transparent_bg)
+    if (isinstance(pixel_data, Frame) and value_lut is not None
+            and (pixel_data.width, pixel_data.height) == (canvas_width, canvas_height)):
+        # 紧凑存储的帧：直接以零拷贝的二维视图映射，无需先构建行列表
+        return image_from_indices(_map_int_values(pixel_data.to_numpy(), value_lut), compiled, indexed)
+    rows = [row[:canvas_width] for row in pixel_data[:canvas_height]]
+
+    # 超出像素数据范围的坐标保持透明（索引0）
+    indices = np.zeros((canvas_height, canvas_width), dtype=np.intp)
+    arr = _as_int_array(rows) if value_lut is not None else None
+    if arr is not None and arr.ndim == 2:
+        # 常见情况：规整的整数二维数组，整帧一次映射
+        indices[:arr.shape[0], :arr.shape[1]] = _map_int_values(arr, value_lut)
+    else:
+        # 参差不齐的行、混合类型、负数或布尔值：逐行处理，并按 str() 语义匹配颜色键
+        for y, row in enumerate(rows):
+            row_arr = _as_int_array(row) if value_lut is not None else None
+            if row_arr is not None and row_arr.ndim == 1:
+                indices[y, :len(row)] = _map_int_values(row_arr, value_lut)
+            else:
+                indices[y, :len(row)] = [key_to_index.get(str(v), 0) for v in row]
+
+    return image_from_indices(indices, compiled, indexed)
+
+def image_from_indices(indices, compiled, indexed=False):
+    """
+    由稠密索引数组（形状为 (高, 宽)）通过 RGBA 查找表一次性构建图像，需要 NumPy。
+    :param indices: CompiledPalette 的稠密索引数组，0 表示透明。
+    :param compiled: 对应的 CompiledPalette。
+    :param indexed: 为True时直接以索引生成 "P" 模式图像，调用方需确认 compiled.supports_indexed()。
+    """
+    if compiled.invalid_keys:
+        # 与逐像素路径保持一致：只有实际用到的非法颜色才会引发异常
+        for index in np.unique(indices):
+            compiled.check_index(int(index))
+
+    if indexed:
+        return compiled.apply_indexed_palette(Image.fromarray(indices.astype(np.uint8)).copy())
+
+    # fromarray 生成的图像与数组共享只读内存，复制一份以便之后可以原地编辑像素
+    return Image.fromarray(compiled.rgba_lut()[indices]).copy()
+
+# 坐标超出像素数据范围时的占位值
+_MISSING = object()
+
+def apply_pixel_updates(image, pixel_data, cells, palette, transparent_bg=False, offset=(0, 0)):
+    """
+    只把 pixel_data 中指定单元格的当前值写入已经渲染好的图像，而不重新渲染整帧。
+    结果与用 create_image_from_pixels 重新渲染后对应像素的颜色一致。
+
+    :param image: 要原地更新的 RGBA Pillow 图像（单帧或雪碧图）。
+    :param pixel_data: 该帧的二维像素数据。
+    :param cells: 发生变化的 (行, 列) 坐标序列。
+    :param palette: 调色板字典或 CompiledPalette。
+    :param transparent_bg: 是否将值为0的像素渲染为透明。
+    :param offset: 帧在 image 中的 (x, y) 偏移，用于直接更新雪碧图中的某一帧。
+    """
+    compiled = compile_palette(palette)
+    pixels = image.load()
+    offset_x, offset_y = offset
+    image_width, image_height = image.size
+    indexed = image.mode == 'P'
+    num_rows = len(pixel_data)
+    for row, col in cells:
+        x, y = offset_x + col, offset_y + row
+        if not (0 <= x < image_width and 0 <= y < image_height):
+            continue
+        value = _MISSING
+        if 0 <= row < num_rows:
+            line = pixel_data[row]
+            if 0 <= col < len(line):
+                value = line[col]
+        if indexed:
+            # 索引色图像由同一个调色板生成，直接写入稠密索引
+            index = 0
+            if value is not _MISSING:
+                index = compiled.index_of(value, transparent_bg)
+                compiled.check_index(index)
+            pixels[x, y] = index
+            continue
+        color = None
+        if value is not _MISSING:
+            color = compiled.rgba_of(value, transparent_bg)
+        pixels[x, y] = color if color is not None else (0, 0, 0, 0)
+
+# 变化的像素超过整帧的这一比例时，直接完整渲染该帧比逐像素更新更快
+DELTA_MAX_CHANGED_RATIO = 0.25
+
+def _frame_value_types(frame):
+    """返回一帧中出现的所有像素值类型。"""
+    if isinstance(frame, Frame):
+        return {int}
+    return set(map(type, itertools.chain.from_iterable(frame)))
+
+def diff_frame_cells(prev_frame, frame, canvas_width, canvas_height, check_types=True):
+    """
+    找出两帧之间渲染结果可能不同的单元格（只考虑画布范围内）。
+    值相等但类型不同（例如 1 和 True）的单元格也视为变化，因为它们对应不同的调色板键。
+
+    :param check_types: 两帧都只包含 int 时可以传入 False，跳过逐行的类型比较。
+    :return: 变化的 (行, 列) 坐标列表。
+    """
+    if (np is not None and isinstance(prev_frame, Frame) and isinstance(frame, Frame)
+            and prev_frame.width == frame.width and prev_frame.height == frame.height):
+        # 两帧都是紧凑存储时整帧一次比较
+        changed_rows, changed_cols = np.nonzero(prev_frame.to_numpy()[:canvas_height, :canvas_width]
+                                                != frame.to_numpy()[:canvas_height, :canvas_width])
+        return list(zip(changed_rows.tolist(), changed_cols.tolist()))
+    cells = []
+    for y in range(min(canvas_height, max(len(prev_frame), len(frame)))):
+        prev_row = prev_frame[y] if y < len(prev_frame) else []
+        row = frame[y] if y < len(frame) else []
+        # 整行比较在C层完成，绝大多数未变化的行在这里就被跳过
+        if prev_row is row or (prev_row == row and
+                               (not check_types or list(map(type, prev_row)) == list(map(type, row)))):
+            continue
+        width = min(canvas_width, max(len(prev_row), len(row)))
+        common = min(width, len(prev_row), len(row))
+        cells.extend((y, x) for x, (a, b) in enumerate(zip(prev_row[:common], row[:common]))
+                     if a != b or type(a) is not type(b))
+        # 只在其中一帧存在的单元格
+        cells.extend((y, x) for x in range(common, width))
+    return cells
+
+def render_frames_delta(frames_data, palette, canvas_width, canvas_height, transparent_bg=False, stats=None,
+                        progress=None, indexed=False):
+    """
+    增量渲染动画帧：第一帧完整渲染，之后每一帧复制上一帧的图像，只重写与上一帧不同的像素。
+    变化的像素超过 DELTA_MAX_CHANGED_RATIO 时该帧改为完整渲染（关键帧）。
+    输出与逐帧调用 create_image_from_pixels 完全一致。
+
+    :param stats: 可选字典，写入 'frames'、'keyframes'、'pixels_total'、'pixels_rewritten' 和 'rewrite_ratio'。
+    :param progress: 可选回调，每渲染完一帧以 (已完成帧数, 总帧数) 调用一次。
+    :param indexed: 是否生成 "P" 模式的索引色图像，见 create_image_from_pixels。
+    :return: 图像列表。
+    """
+    compiled = compile_palette(palette)
+    frame_pixels = canvas_width * canvas_height
+    max_changed = frame_pixels * DELTA_MAX_CHANGED_RATIO
+    images = []
+    keyframes = 0
+    rewritten = 0
+    prev_frame = prev_img = prev_types = None
+    for frame in frames_data:
+        cells = None
+        types = _frame_value_types(frame)
+        if prev_img is not None:
+            check_types = not (types <= {int} and prev_types <= {int})
+            cells = diff_frame_cells(prev_frame, frame, canvas_width, canvas_height, check_types)
+        if cells is None or len(cells) > max_changed:
+            img = create_image_from_pixels(frame, compiled, canvas_width, canvas_height, transparent_bg, indexed)
+            keyframes += 1
+            rewritten += frame_pixels
+        elif cells:
+            img = prev_img.copy()
+            apply_pixel_updates(img, frame, cells, compiled, transparent_bg)
+            rewritten += len(cells)
+        else:
+            # 与上一帧完全相同；仍然复制一份，使每一帧都可以被独立编辑
+            img = prev_img.copy()
+        images.append(img)
+        prev_frame, prev_img, prev_types = frame, img, types
+        if progress:
+            progress(len(images), len(frames_data))
+
+    if stats is not None:
+        total = frame_pixels * len(images)
+        stats.update({
+            'frames': len(images),
+            'keyframes': keyframes,
+            'pixels_total': total,
+            'pixels_rewritten': rewritten,
+            'rewrite_ratio': round(rewritten / total, 4) if total else 0.0,
+        })
+    return images
+
+@functools.lru_cache(maxsize=32)
+def nearest_resize_spans(src_length, dst_length):
+    """
+    计算最近邻缩放时每个源像素在目标图像中覆盖的 [start, end) 区间。
+    通过让 Pillow 缩放一张以坐标为像素值的图像得到映射，保证与 Image.resize(..., Image.NEAREST) 完全一致。
+
+    :return: 长度为 src_length 的 (start, end) 元组列表。
+    """
+    ramp = Image.new('I', (src_length, 1))
+    ramp.putdata(range(src_length))
+    mapping = ramp.resize((dst_length, 1), Image.NEAREST).load()
+    spans = [[dst_length, 0] for _ in range(src_length)]
+    for dst in range(dst_length):
+        src = mapping[dst, 0]
+        spans[src][0] = min(spans[src][0], dst)
+        spans[src][1] = max(spans[src][1], dst + 1)
+    return [tuple(span) if span[1] > span[0] else (0, 0) for span in spans]
+
+@timed('create_sprite_sheet')
+def create_sprite_sheet(images, indexed=False):
     """
     从一个Pillow图像对象列表创建雪碧图。
     背景始终是透明的，它只负责拼接。
+
+    :param indexed: 为True且所有帧都是同一调色板的 "P" 模式图像时，生成 "P" 模式的雪碧图；
+                    否则生成 RGBA 雪碧图。
     """
     if not images:
         return None
 
     canvas_width, canvas_height = images[0].size
     total_width = canvas_width * len(images)
+
+    if indexed and all(img.mode == 'P' for img in images):
+        # 创建一个以透明索引填充的索引色底板，帧的索引直接复制过去
+        palette = images[0].getpalette()
+        if all(img.getpalette() == palette for img in images[1:]):
+            sprite_sheet = Image.new('P', (total_width, canvas_height), images[0].info.get('transparency', 0))
+            sprite_sheet.putpalette(palette)
+            if 'transparency' in images[0].info:
+                sprite_sheet.info['transparency'] = images[0].info['transparency']
+            for i, img in enumerate(images):
+                sprite_sheet.paste(img, (i * canvas_width, 0))
+            return sprite_sheet
     
     # 创建一个完全透明的底板
     sprite_sheet = Image.new('RGBA', (total_width, canvas_height), (0, 0, 0, 0))
 
     # 将每一帧粘贴到底板上
     for i, img in enumerate(images):
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
         sprite_sheet.paste(img, (i * canvas_width, 0), img)
         
     return sprite_sheet
 
-def render_from_data(data, transparent_bg=False):
+class SpriteSheetBuilder:
+    """
+    逐帧构建水平雪碧图，适用于事先不知道帧数的流式渲染。
+    底板容量按需倍增，每帧粘贴后即可丢弃，结果与 create_sprite_sheet 一致。
+    """
+    def __init__(self, frame_width, frame_height, capacity=16):
+        """
+        :param frame_width: 每帧的宽度。
+        :param frame_height: 每帧的高度。
+        :param capacity: 初始可容纳的帧数。
+        """
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.frame_count = 0
+        self._sheet = Image.new('RGBA', (frame_width * capacity, frame_height), (0, 0, 0, 0))
+
+    def add(self, img):
+        """把一帧粘贴到雪碧图的下一列。"""
+        capacity = self._sheet.width // self.frame_width if self.frame_width else self.frame_count + 1
+        if self.frame_count >= capacity:
+            grown = Image.new('RGBA', (self.frame_width * capacity * 2, self.frame_height), (0, 0, 0, 0))
+            grown.paste(self._sheet, (0, 0))
+            self._sheet = grown
+        self._sheet.paste(img, (self.frame_count * self.frame_width, 0), img)
+        self.frame_count += 1
+
+    def build(self):
+        """返回裁剪到实际帧数的雪碧图，没有任何帧时返回None。"""
+        if not self.frame_count:
+            return None
+        return self._sheet.crop((0, 0, self.frame_width * self.frame_count, self.frame_height))
+
+def render_stream(source, transparent_bg=False, on_frame=None):
+    """
+    流式渲染JSON文档：逐帧解码并渲染，同时逐列写入雪碧图，内存占用不随帧数增长。
+
+    'canvas_size' 和 'palette' 需要出现在 'frames' 之前才能边读边渲染；
+    否则会先缓存已解码的帧，待读到这些字段后再渲染。
+
+    :param source: 以文本模式打开的文件对象，或JSON字符串。
+    :param transparent_bg: 是否将值为0的像素渲染为透明。
+    :param on_frame: 可选回调，每渲染完一帧以 (帧索引, 图像) 调用一次。
+    :return: (frame_count, image) 元组。动画时 image 为雪碧图，单帧图像时为该图像。
+    """
+    from json_stream import FrameStreamReader
+
+    reader = FrameStreamReader(source)
+    header = reader.read_header()
+    builder = None
+    pending_frames = []
+
+    def render_frame(pixel_data):
+        try:
+            canvas_width, canvas_height = header['canvas_size']
+        except (KeyError, ValueError, TypeError):
+            raise ValueError("JSON 必须包含一个 'canvas_size' 键，其值为 [宽度, 高度] 列表。")
+        palette = compile_palette(header.get('palette', {}))
+        return create_image_from_pixels(pixel_data, palette, canvas_width, canvas_height, transparent_bg)
+
+    def add_frame(frame):
+        nonlocal builder
+        img = render_frame(frame)
+        if builder is None:
+            builder = SpriteSheetBuilder(img.width, img.height)
+        if on_frame:
+            on_frame(builder.frame_count, img)
+        builder.add(img)
+
+    for frame in reader.iter_frames():
+        if 'canvas_size' in header:
+            add_frame(frame)
+        else:
+            pending_frames.append(frame)
+
+    # 'frames' 之后出现的字段此时已经读入 header
+    for frame in pending_frames:
+        add_frame(frame)
+
+    if builder is not None:
+        return builder.frame_count, builder.build()
+
+    if 'pixels' in header:
+        img = render_frame(header['pixels'])
+        if on_frame:
+            on_frame(0, img)
+        return 1, img
+
+    raise ValueError("JSON 数据必须包含 'pixels' 或 'frames' 键。")
+
+@timed('render_from_data')
+def render_from_data(data, transparent_bg=False, cache=None, delta=False, delta_stats=None, progress=None,
+                     indexed=False, prepare=False):
     """
     从数据字典渲染像素艺术，处理单个图像和动画。
+    :param cache: 可选的 RenderCache。提供时先按数据内容和渲染选项查找缓存，
+                  命中则直接返回缓存的结果，未命中则渲染后写入缓存。
+    :param delta: 是否增量渲染动画帧（见 render_frames_delta），输出与完整渲染一致。
+    :param delta_stats: 可选字典，增量渲染时写入像素重写统计。
+    :param progress: 可选回调，每渲染完一帧以 (已完成帧数, 总帧数) 调用一次。
+                     回调中引发的异常会中止渲染并向上传播，可用于取消。
+    :param indexed: 为True时帧和雪碧图都渲染为 "P" 模式的索引色图像（透明像素使用透明索引），
+                    调色板超过 255 种颜色时仍渲染为 RGBA。
+    :param prepare: 为True时先经过 validation.prepare_document 的摄取阶段：一次遍历校验整个文档，
+                    存在错误时引发 ValueError；规范形式存为 FrameStore，每帧走整帧查表的快速路径，
+                    不再逐像素 str() 转换和越界检查，输出与直接渲染原始数据一致。缓存键仍按原始数据计算。
     """
+    if cache is None:
+        return _render_data(_prepared(data, prepare), transparent_bg, delta, delta_stats, progress, indexed)
+
+    # 只有索引色输出才把该选项计入缓存键，已有的 RGBA 缓存条目保持有效。
+    # 索引色图像的调色板按键的顺序排列，而缓存键按排序后的JSON计算，因此另外记录键的顺序
+    if indexed:
+        palette = data.get('palette', {})
+        key = cache.make_key(data, transparent_bg, indexed=True,
+                             palette_order=list(palette) if isinstance(palette, dict) else None)
+    else:
+        key = cache.make_key(data, transparent_bg)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    images, sprite_sheet = _render_data(_prepared(data, prepare), transparent_bg, delta, delta_stats, progress,
+                                        indexed)
+    cache.put(key, images, sprite_sheet)
+    return images, sprite_sheet
+
+def _prepared(data, prepare):
+    """prepare 为True时返回校验后的规范形式，否则原样返回。"""
+    return prepare_document(data) if prepare else data
+
+def _render_data(data, transparent_bg=False, delta=False, delta_stats=None, progress=None, indexed=False):
+    """render_from_data 的实际渲染逻辑，不经过缓存。"""
     try:
         canvas_width, canvas_height = data['canvas_size']
     except (KeyError, ValueError):
         raise ValueError("JSON 必须包含一个 'canvas_size' 键，其值为 [宽度, 高度] 列表。")
 
-    palette = data.get('palette', {})
+    # 每次渲染只编译一次调色板，内容相同的调色板在进程内复用编译结果
+    palette = compile_palette(data.get('palette', {}))
 
     if 'frames' in data and data['frames']:
         frames_data = data['frames']
-        images = [create_image_from_pixels(frame, palette, canvas_width, canvas_height, transparent_bg) for frame in frames_data]
-        sprite_sheet = create_sprite_sheet(images) # 直接创建雪碧图
+        if delta:
+            images = render_frames_delta(frames_data, palette, canvas_width, canvas_height, transparent_bg,
+                                         delta_stats, progress, indexed)
+        else:
+            images = []
+            for frame in frames_data:
+                images.append(create_image_from_pixels(frame, palette, canvas_width, canvas_height, transparent_bg,
+                                                       indexed))
+                if progress:
+                    progress(len(images), len(frames_data))
+        sprite_sheet = create_sprite_sheet(images, indexed) # 直接创建雪碧图
         return images, sprite_sheet # 返回图像列表和雪碧图
     elif 'pixels' in data:
         pixel_data = data['pixels']
-        img = create_image_from_pixels(pixel_data, palette, canvas_width, canvas_height, transparent_bg)
+        img = create_image_from_pixels(pixel_data, palette, canvas_width, canvas_height, transparent_bg, indexed)
+        if progress:
+            progress(1, 1)
         return [img], None # 返回单图像列表和None
     else:
         raise ValueError("JSON 数据必须包含 'pixels' 或 'frames' 键。")
@@ -84,32 +486,161 @@ def render_from_data(data, transparent_bg=False):
 # 当该脚本作为主程序运行时
 if __name__ == '__main__':
     import json
+    import os
     import argparse
 
     # 创建命令行参数解析器
     parser = argparse.ArgumentParser(description='从 JSON 文件渲染像素艺术。')
     # 添加 'json_file' 参数
-    parser.add_argument('json_file', type=str, help='JSON 文件的路径。')
+    parser.add_argument('json_file', type=str, help='JSON 文件或二进制 .pxb 文件的路径；使用 --validate 时也可以是目录或 glob 模式。')
     # 添加 'output_file' 参数
-    parser.add_argument('output_file', type=str, help='输出图像文件的路径 (仅支持PNG)。')
+    parser.add_argument('output_file', type=str, nargs='?', help='输出文件的路径：.png 渲染图像，.gif/.apng/.webp 导出动画，.pxb 或 .json 转换项目格式。')
     # 添加 '--transparent' 可选参数
     parser.add_argument('--transparent', action='store_true', help='使用透明背景。')
+    # 添加 '--stream' 可选参数
+    parser.add_argument('--stream', action='store_true', help='逐帧流式读取和渲染，适用于帧数很多的大文件（不使用渲染缓存）。')
+    # 添加渲染缓存相关的可选参数
+    parser.add_argument('--cache-dir', type=str, default=None, help='渲染缓存目录，数据和选项未变化时直接使用缓存结果。')
+    parser.add_argument('--cache-max-mb', type=float, default=256, help='渲染缓存的容量上限 (MB)。')
+    # 添加 '--delta' 可选参数
+    parser.add_argument('--delta', action='store_true', help='增量渲染动画：每帧只重写与上一帧不同的像素，并打印重写统计。')
+    # 添加 '--indexed' 可选参数
+    parser.add_argument('--indexed', action='store_true', help='渲染并保存为索引色（P 模式）PNG，文件和内存占用更小。')
+    # 添加 '--duration' 可选参数
+    parser.add_argument('--duration', type=int, default=None, help="导出动画时每帧的持续时间 (ms)，默认使用 JSON 中的 'duration_ms' 或 100。")
+    # 添加 '--compress' 可选参数
+    parser.add_argument('--compress', action='store_true', help='输出 .pxb 时用 zlib 压缩帧数据（文件更小，但不能零拷贝映射）。')
+    # 添加 '--validate' 可选参数
+    parser.add_argument('--validate', action='store_true', help='只校验项目文件并列出问题（不渲染），存在错误时以状态码 1 退出，适用于CI。')
     
     # 解析命令行参数
     args = parser.parse_args()
 
-    # 检查输出文件是否为PNG
-    if not args.output_file.lower().endswith('.png'):
-        print("错误：输出文件必须是 .png 格式。")
+    if args.validate:
+        # 校验模式：逐个文件一次遍历校验，不渲染也不写入任何文件
+        import sys
+        from batch_render import collect_inputs
+        from binary_format import BINARY_EXTENSION, read_binary
+        from validation import validate_document, iter_issue_lines
+
+        inputs = collect_inputs([args.json_file])
+        if not inputs:
+            print(f"错误：没有找到要校验的文件: {args.json_file}")
+            sys.exit(1)
+        failed = 0
+        for path, _ in inputs:
+            try:
+                if path.lower().endswith(BINARY_EXTENSION):
+                    with read_binary(path) as doc:
+                        data = doc.to_data()
+                else:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+            except (ValueError, KeyError, OSError) as e:
+                failed += 1
+                print(f"{path}: 错误: 无法读取: {e}")
+                continue
+            try:
+                report = validate_document(data)
+            except Exception as e:
+                # 校验器自身的异常只让当前文件失败，继续校验其余文件
+                failed += 1
+                print(f"{path}: 错误: 校验时发生异常: {type(e).__name__}: {e}")
+                continue
+            if not report.ok:
+                failed += 1
+            status = '通过' if report.ok else '失败'
+            print(f"{path}: {status}（{report.error_count} 个错误，{report.warning_count} 个警告）")
+            for line in iter_issue_lines(report):
+                print(f"  {line}")
+        print(f"共校验 {len(inputs)} 个文件，{failed} 个失败。")
+        sys.exit(1 if failed else 0)
+
+    if args.output_file is None:
+        parser.error('缺少输出文件的路径（只校验时请使用 --validate）。')
+
+    from binary_format import BINARY_EXTENSION, read_binary, write_binary
+    from animation_export import ANIMATION_FORMATS, export_animation_from_data
+
+    # 检查输出文件的格式
+    output_ext = os.path.splitext(args.output_file)[1].lower()
+    if output_ext not in ('.png', BINARY_EXTENSION, '.json') + tuple(ANIMATION_FORMATS):
+        print(f"错误：输出文件必须是 .png、{'、'.join(ANIMATION_FORMATS)}、{BINARY_EXTENSION} 或 .json 格式。")
+        exit()
+    input_is_binary = args.json_file.lower().endswith(BINARY_EXTENSION)
+
+    if output_ext in ANIMATION_FORMATS:
+        # 导出动画 GIF / APNG / WebP
+        try:
+            if input_is_binary:
+                with read_binary(args.json_file) as doc:
+                    data = doc.to_data()
+            else:
+                with open(args.json_file, 'r') as f:
+                    data = json.load(f)
+            result = export_animation_from_data(data, args.output_file, args.transparent, args.duration)
+            print(f"成功将 {result['frames']} 帧（编码 {result['encoded_frames']} 帧）导出为 {result['format']}: {args.output_file}")
+        except (ValueError, KeyError) as e:
+            print(f"错误: {e}")
+        exit()
+
+    if output_ext != '.png':
+        # 格式转换：JSON <-> 二进制，不进行渲染
+        try:
+            if input_is_binary:
+                with read_binary(args.json_file) as doc:
+                    data = doc.to_data()
+            else:
+                with open(args.json_file, 'r') as f:
+                    data = json.load(f)
+            if output_ext == BINARY_EXTENSION:
+                write_binary(data, args.output_file, args.compress)
+            else:
+                from json_sync import format_project_data
+                json_string = format_project_data(data)
+                with open(args.output_file, 'w', encoding='utf-8') as f:
+                    f.write(json_string)
+            print(f"成功将 {args.json_file} 转换为 {args.output_file}")
+        except (ValueError, KeyError) as e:
+            print(f"错误: {e}")
+        exit()
+
+    if input_is_binary:
+        # 二进制输入：直接在内存映射上渲染
+        try:
+            with read_binary(args.json_file) as doc:
+                images, sprite_sheet = doc.render(args.transparent, args.indexed)
+            (sprite_sheet or images[0]).save(args.output_file, 'PNG')
+            print(f"成功将 {len(images)} 帧渲染到 {args.output_file}")
+        except (ValueError, KeyError) as e:
+            print(f"错误: {e}")
+        exit()
+
+    if args.stream:
+        # 流式模式：边读边渲染，不把所有帧一次性读入内存
+        try:
+            with open(args.json_file, 'r') as f:
+                frame_count, image = render_stream(f, args.transparent)
+            image.save(args.output_file, 'PNG')
+            print(f"成功将 {frame_count} 帧流式渲染到 {args.output_file}")
+        except (ValueError, KeyError) as e:
+            print(f"错误: {e}")
         exit()
 
     # 打开并读取JSON文件
     with open(args.json_file, 'r') as f:
         data = json.load(f)
     
+    cache = None
+    if args.cache_dir:
+        from render_cache import RenderCache
+        cache = RenderCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+
     try:
         # 从数据渲染图像列表和可能的雪碧图
-        images, sprite_sheet = render_from_data(data, args.transparent)
+        delta_stats = {}
+        images, sprite_sheet = render_from_data(data, args.transparent, cache=cache, delta=args.delta,
+                                                delta_stats=delta_stats, indexed=args.indexed, prepare=True)
         
         if not images:
             print("错误：未能从JSON数据生成任何图像。")
@@ -123,4 +654,10 @@ if __name__ == '__main__':
             print(f"成功将单张图片渲染到 {args.output_file}")
 
     except (ValueError, KeyError) as e:
-        print(f"错误: {e}")
\ No newline at end of file
+        print(f"错误: {e}")
+
+    if args.delta and delta_stats:
+        print(f"增量渲染统计: {json.dumps(delta_stats, ensure_ascii=False)}")
+
+    if cache is not None:
+        print(f"缓存统计: {json.dumps(cache.stats(), ensure_ascii=False)}")
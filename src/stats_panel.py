@@ -0,0 +1,109 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from perf_stats import stats
+
+# 统计面板的刷新间隔（毫秒）
+STATS_REFRESH_MS = 500
+
+class StatsPanel:
+    """
+    性能统计面板：一个独立的顶层窗口，定期显示每个计时区段的最近/平均/P95/最大耗时和动画播放帧率，
+    并可以把统计结果导出为JSON文件。面板只在启用计时时存在，关闭窗口等同于取消“性能统计”复选框。
+    """
+    def __init__(self, app):
+        """
+        :param app: PixelArtApp 的实例，用于访问 root 和“性能统计”复选框的变量。
+        """
+        self.app = app
+        self.window = None
+        self.tree = None
+        self.rate_label = None
+        self.refresh_job = None
+
+    def show(self):
+        """创建（或提到前台）统计窗口，并开始定期刷新。"""
+        if self.window is not None:
+            self.window.lift()
+            return
+
+        self.window = tk.Toplevel(self.app.root)
+        self.window.title("性能统计")
+        self.window.geometry("560x320")
+        # 关闭窗口时同步取消复选框，由复选框的回调负责禁用计时
+        self.window.protocol("WM_DELETE_WINDOW", lambda: self.app.perf_stats_var.set(False))
+
+        columns = ('count', 'last', 'avg', 'p95', 'max')
+        headings = ('次数', '最近 (ms)', '平均 (ms)', 'P95 (ms)', '最大 (ms)')
+        self.tree = ttk.Treeview(self.window, columns=columns)
+        self.tree.heading('#0', text='区段')
+        self.tree.column('#0', width=180)
+        for column, heading in zip(columns, headings):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=70, anchor='e')
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        bottom_frame = tk.Frame(self.window)
+        bottom_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        self.rate_label = tk.Label(bottom_frame, text="播放帧率: -")
+        self.rate_label.pack(side=tk.LEFT)
+        tk.Button(bottom_frame, text="导出...", command=self.dump).pack(side=tk.RIGHT)
+        tk.Button(bottom_frame, text="重置", command=self.reset).pack(side=tk.RIGHT, padx=5)
+
+        self.refresh()
+
+    def hide(self):
+        """停止刷新并销毁统计窗口。已记录的样本保留，下次打开时继续显示。"""
+        if self.refresh_job:
+            self.app.root.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+            self.tree = None
+            self.rate_label = None
+
+    def refresh(self):
+        """用最新的统计结果更新表格和帧率标签，并安排下一次刷新。"""
+        if self.refresh_job:
+            self.app.root.after_cancel(self.refresh_job)
+        self.refresh_job = None
+        if self.window is None:
+            return
+
+        summary = stats.summary()
+        for name in set(self.tree.get_children()) - set(summary):
+            self.tree.delete(name)
+        for name, span in summary.items():
+            values = (span['count'], f"{span['last_ms']:.2f}", f"{span['avg_ms']:.2f}",
+                      f"{span['p95_ms']:.2f}", f"{span['max_ms']:.2f}")
+            if self.tree.exists(name):
+                self.tree.item(name, values=values)
+            else:
+                self.tree.insert('', 'end', iid=name, text=name, values=values)
+
+        fps = stats.rate('playback')
+        self.rate_label.config(text=f"播放帧率: {fps:.1f} FPS" if fps is not None else "播放帧率: -")
+        self.refresh_job = self.app.root.after(STATS_REFRESH_MS, self.refresh)
+
+    def reset(self):
+        """清空所有已记录的样本。"""
+        stats.reset()
+        self.refresh()
+
+    def dump(self):
+        """把当前的统计结果导出为JSON文件。"""
+        file_path = filedialog.asksaveasfilename(
+            parent=self.window,
+            initialdir=self.app.output_dir,
+            title="导出性能统计",
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json")]
+        )
+        if not file_path:
+            return
+        try:
+            stats.dump(file_path)
+            messagebox.showinfo("成功", f"性能统计已导出到:\n{file_path}", parent=self.window)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败: {e}", parent=self.window)
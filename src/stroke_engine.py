@@ -0,0 +1,109 @@
+import time
+
+from tools import apply_cells, line_cells
+
+# 两次批量刷新之间的最短间隔（毫秒），约等于一帧显示的时间
+STROKE_FLUSH_MS = 16
+
+class StrokeEngine:
+    """
+    画笔笔触引擎：合并鼠标拖动事件，按显示帧率批量写入和刷新。
+
+    每个拖动事件只把网格坐标加入队列；由 root.after 安排的 flush() 用 Bresenham 直线补齐
+    相邻两个采样点之间跳过的单元格，一次写入所有待处理的单元格，并只刷新一次预览和JSON文本。
+    快速拖动时笔画连续，刷新次数也被限制在每 STROKE_FLUSH_MS 毫秒最多一次。
+    """
+    def __init__(self, app):
+        """
+        :param app: PixelArtApp 的实例，用于访问状态、撤销历史、root 和刷新逻辑。
+        """
+        self.app = app
+        self.value = None       # 当前笔触写入的值
+        self.last_cell = None   # 上一个已写入的采样点，下一段直线从这里开始
+        self.pending = []       # 尚未写入的采样点 (行, 列)；None 表示光标离开了画布，笔画在此断开
+        self.flush_job = None
+        self.last_flush = 0.0   # 上一次刷新的时间（time.perf_counter()）
+
+    def begin(self, row, col, value):
+        """鼠标按下时开始新的笔触，并立即写入第一个单元格，保证单击的反馈没有延迟。"""
+        self.flush()
+        self.value = value
+        self.last_cell = None
+        self.pending.append((row, col))
+        self.flush()
+
+    def add(self, row, col, value):
+        """
+        加入一个拖动采样点。坐标为 None 时表示光标不在画布上，之后的采样点不与之前的相连。
+        写入的值改变（例如切换了按键）时先提交已有的采样点，再开始新的一段。
+        """
+        if value != self.value:
+            self.flush()
+            self.value = value
+            self.last_cell = None
+        self.pending.append(None if row is None else (row, col))
+        self._schedule()
+
+    def _schedule(self):
+        """安排下一次刷新：距离上一次刷新不足一帧时等到下一帧，已经安排过时不重复安排。"""
+        if self.flush_job is not None:
+            return
+        elapsed_ms = (time.perf_counter() - self.last_flush) * 1000
+        delay = max(0, int(STROKE_FLUSH_MS - elapsed_ms))
+        self.flush_job = self.app.root.after(delay, self.flush)
+
+    def flush(self):
+        """把所有待处理的采样点插值后一次写入当前帧，记录到撤销历史，并只刷新一次。"""
+        if self.flush_job is not None:
+            self.app.root.after_cancel(self.flush_job)
+            self.flush_job = None
+        if not self.pending:
+            return
+        samples, self.pending = self.pending, []
+        self.last_flush = time.perf_counter()
+
+        cells = []
+        last_cell = self.last_cell
+        for sample in samples:
+            if sample is None:
+                last_cell = None
+                continue
+            if last_cell is None:
+                cells.append(sample)
+            elif sample != last_cell:
+                # 起点已在上一段写入，只补齐其后的单元格
+                cells.extend(line_cells(last_cell[0], last_cell[1], sample[0], sample[1])[1:])
+            last_cell = sample
+        self.last_cell = last_cell
+
+        state = self.app.state
+        if state.frames_data is not None:
+            frame_index = state.current_frame_index
+            pixel_data = state.frames_data[frame_index]
+        elif state.pixels_data is not None:
+            frame_index = 0
+            pixel_data = state.pixels_data
+        else:
+            return
+        changed, old_values = apply_cells(pixel_data, cells, self.value)
+        if not changed:
+            return
+        for (row, col), old_value in zip(changed, old_values):
+            self.app.history.record(frame_index, row, col, old_value, self.value)
+        self.app.update_canvas_pixels(changed)
+        self.app.json_sync.update_rows(frame_index, [row for row, _ in changed])
+
+    def end(self):
+        """松开鼠标按键时写入剩余的采样点并结束笔触。"""
+        self.flush()
+        self.value = None
+        self.last_cell = None
+
+    def cancel(self):
+        """丢弃尚未写入的采样点，例如像素数据被重新渲染替换之后。"""
+        if self.flush_job is not None:
+            self.app.root.after_cancel(self.flush_job)
+            self.flush_job = None
+        self.pending = []
+        self.value = None
+        self.last_cell = None
@@ -0,0 +1,200 @@
+from array import array
+
+from frame_store import Frame
+
+# 编辑工具
+TOOL_PENCIL = 'pencil'  # 逐格绘制
+TOOL_FILL = 'fill'      # 油漆桶填充相连的同色区域
+TOOL_LINE = 'line'      # 直线
+TOOL_RECT = 'rect'      # 矩形边框
+TOOLS = (TOOL_PENCIL, TOOL_FILL, TOOL_LINE, TOOL_RECT)
+# 工具在界面上显示的名称
+TOOL_LABELS = {TOOL_PENCIL: '画笔', TOOL_FILL: '填充', TOOL_LINE: '直线', TOOL_RECT: '矩形'}
+
+def line_cells(row0, col0, row1, col1):
+    """
+    Bresenham 直线算法：返回从 (row0, col0) 到 (row1, col1)（含两端）经过的单元格，没有重复。
+    :return: [(行, 列)] 列表。
+    """
+    cells = []
+    d_col, d_row = abs(col1 - col0), -abs(row1 - row0)
+    step_col = 1 if col0 < col1 else -1
+    step_row = 1 if row0 < row1 else -1
+    error = d_col + d_row
+    row, col = row0, col0
+    while True:
+        cells.append((row, col))
+        if row == row1 and col == col1:
+            return cells
+        doubled = 2 * error
+        if doubled >= d_row:
+            error += d_row
+            col += step_col
+        if doubled <= d_col:
+            error += d_col
+            row += step_row
+
+def rect_cells(row0, col0, row1, col1, filled=False):
+    """
+    返回以两个对角为端点的矩形所覆盖的单元格，没有重复。
+    :param filled: True 返回整个矩形区域，False 只返回边框。
+    :return: [(行, 列)] 列表。
+    """
+    top, bottom = min(row0, row1), max(row0, row1)
+    left, right = min(col0, col1), max(col0, col1)
+    if filled:
+        return [(row, col) for row in range(top, bottom + 1) for col in range(left, right + 1)]
+    cells = [(top, col) for col in range(left, right + 1)]
+    if bottom > top:
+        cells.extend((bottom, col) for col in range(left, right + 1))
+    if right > left:
+        for row in range(top + 1, bottom):
+            cells.append((row, left))
+            cells.append((row, right))
+    else:
+        cells.extend((row, left) for row in range(top + 1, bottom))
+    return cells
+
+def apply_cells(pixel_data, cells, value):
+    """
+    把 cells 中的单元格原地设为 value。越界和值未变的单元格会被跳过（每行按自身长度判断越界）。
+    :return: (实际变化的 [(行, 列)] 列表, 对应的旧值列表)。
+    """
+    changed = []
+    old_values = []
+    num_rows = len(pixel_data)
+    for row, col in cells:
+        if 0 <= row < num_rows:
+            line = pixel_data[row]
+            if 0 <= col < len(line) and line[col] != value:
+                old_values.append(line[col])
+                line[col] = value
+                changed.append((row, col))
+    return changed, old_values
+
+def _row_line(pixel_data, row):
+    """
+    返回 (序列, lo, hi)：该行的值位于序列的 [lo, hi) 区间。
+    紧凑存储的帧直接使用整帧的扁平缓冲区，行列表则是该行本身。
+    """
+    if isinstance(pixel_data, Frame):
+        lo, hi = pixel_data.row_bounds(row)
+        return pixel_data.buffer, lo, hi
+    line = pixel_data[row]
+    return line, 0, len(line)
+
+def _filled(line, value, count):
+    """返回可以切片赋值给 line 的 count 个 value。"""
+    if isinstance(line, array):
+        return array(line.typecode, (value,)) * count
+    return [value] * count
+
+def _run_end(line, target, col, step, lo, hi):
+    """
+    从 col（其值为 target）出发沿 step（1 或 -1）方向，在 [lo, hi) 内返回连续等于 target 的最后一个下标。
+    以倍增的切片 count() 检查整块，失败时块长减半，比逐格比较少得多的解释器循环。
+    """
+    size = 1
+    while True:
+        if step > 0:
+            stop = min(hi, col + 1 + size)
+            chunk = line[col + 1:stop]
+        else:
+            stop = max(lo, col - size)
+            chunk = line[stop:col]
+        if chunk and chunk.count(target) == len(chunk):
+            col += step * len(chunk)
+            size *= 2
+        elif size == 1 or not chunk:
+            return col
+        else:
+            size //= 2
+
+def flood_fill(pixel_data, row, col, value):
+    """
+    非递归的扫描线填充：把与 (row, col) 四连通且值相同的区域原地设为 value。
+    每次填充一整段连续的单元格（切片赋值），只把相邻行中每段新的连续区域的起点压栈，
+    栈的大小与区域的行段数成正比，不会像逐格递归那样耗尽调用栈。
+    pixel_data 可以是行列表或紧凑存储的 Frame（直接在扁平缓冲区上操作）。
+
+    :return: (填充的行段 [(行, 起始列, 结束列（含）)], 被替换的旧值)。起点越界或旧值与 value 相同时行段为空。
+    """
+    num_rows = len(pixel_data)
+    if not 0 <= row < num_rows:
+        return [], None
+    line, lo, hi = _row_line(pixel_data, row)
+    if not 0 <= col < hi - lo:
+        return [], None
+    target = line[lo + col]
+    if target == value:
+        return [], target
+
+    spans = []
+    stack = [(row, col)]
+    while stack:
+        seed_row, seed_col = stack.pop()
+        line, lo, hi = _row_line(pixel_data, seed_row)
+        if line[lo + seed_col] != target:
+            continue  # 已被其他行段填充
+        start = _run_end(line, target, lo + seed_col, -1, lo, hi) - lo
+        end = _run_end(line, target, lo + seed_col, 1, lo, hi) - lo
+        line[lo + start:lo + end + 1] = _filled(line, value, end - start + 1)
+        spans.append((seed_row, start, end))
+
+        for next_row in (seed_row - 1, seed_row + 1):
+            if not 0 <= next_row < num_rows:
+                continue
+            next_line, next_lo, next_hi = _row_line(pixel_data, next_row)
+            first = next_lo + start
+            last = min(next_lo + end, next_hi - 1)
+            if last < first:
+                continue
+            if next_line[first:last + 1].count(target) == last - first + 1:
+                # 常见情况：相邻行的这一段全部是目标值，只需压栈一次
+                stack.append((next_row, start))
+                continue
+            x = first
+            while x <= last:
+                try:
+                    x = next_line.index(target, x, last + 1)
+                except ValueError:
+                    break
+                stack.append((next_row, x - next_lo))
+                # 跳过这一段连续区域，每段只压栈一次
+                while x <= last and next_line[x] == target:
+                    x += 1
+    return spans, target
+
+class SpanCells:
+    """
+    行段的惰性坐标视图：len() 为单元格总数，迭代时逐个产生 (行, 列)。
+    大面积填充时刷新逻辑通常只需要数量和行号，无需真正展开成坐标列表。
+    """
+    def __init__(self, spans):
+        self.spans = spans
+        self._count = sum(end - start + 1 for _, start, end in spans)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for row, start, end in self.spans:
+            for col in range(start, end + 1):
+                yield row, col
+
+    @property
+    def rows(self):
+        """涉及的行号（可能重复）。"""
+        return [row for row, _, _ in self.spans]
+
+def spans_to_cells(spans):
+    """
+    把行段展开为坐标数组。
+    :return: (rows, cols) 两个 array('I')。
+    """
+    rows = array('I')
+    cols = array('I')
+    for row, start, end in spans:
+        rows.extend(array('I', (row,)) * (end - start + 1))
+        cols.extend(range(start, end + 1))
+    return rows, cols
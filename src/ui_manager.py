@@ -1,6 +1,10 @@
 import tkinter as tk
 from tkinter import scrolledtext, ttk, filedialog, messagebox
 
+from export_pipeline import PNG_PRESETS
+from tools import TOOLS, TOOL_LABELS
+from viewport import DEFAULT_VIEW_SIZE
+
 class UIManager:
     """
     管理所有UI元素的创建和布局。
@@ -31,6 +35,10 @@ class UIManager:
 
         self.app.json_text = scrolledtext.ScrolledText(left_frame, wrap=tk.WORD, width=50, height=30)
         self.app.json_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0,5))
+        # 修改JSON输入时取消正在进行的后台渲染
+        self.app.json_text.bind("<Key>", self.app.event_handlers.handle_json_edit, add='+')
+        self.app.json_text.bind("<<Paste>>", self.app.event_handlers.handle_json_edit, add='+')
+        self.app.json_text.bind("<<Cut>>", self.app.event_handlers.handle_json_edit, add='+')
 
         # --- 右侧主面板 ---
         right_main_frame = ttk.Frame(self.app.paned_window, width=500, height=580)
@@ -44,7 +52,8 @@ class UIManager:
         preview_label.pack(anchor='w')
 
         # 用于显示图像的容器
-        image_container = tk.Frame(right_content_frame, width=258, height=258, relief=tk.SUNKEN, bg='#f0f0f0')
+        image_container = tk.Frame(right_content_frame, width=DEFAULT_VIEW_SIZE + 2, height=DEFAULT_VIEW_SIZE + 2,
+                                   relief=tk.SUNKEN, bg='#f0f0f0')
         image_container.pack(pady=5)
         image_container.pack_propagate(False)  # 防止容器因内容而缩放
 
@@ -57,6 +66,34 @@ class UIManager:
         self.app.image_label.bind("<B1-Motion>", self.app.event_handlers.handle_draw)
         self.app.image_label.bind("<Button-3>", self.app.event_handlers.handle_erase)
         self.app.image_label.bind("<B3-Motion>", self.app.event_handlers.handle_erase)
+        # 松开按键时结束笔触，整次拖动作为一条撤销记录
+        self.app.image_label.bind("<ButtonRelease-1>", self.app.event_handlers.handle_stroke_end)
+        self.app.image_label.bind("<ButtonRelease-3>", self.app.event_handlers.handle_stroke_end)
+        # 滚轮缩放（Windows/macOS 为 MouseWheel，X11 为按钮4/5），中键拖动平移
+        self.app.image_label.bind("<MouseWheel>", self.app.event_handlers.handle_zoom)
+        self.app.image_label.bind("<Button-4>", self.app.event_handlers.handle_zoom)
+        self.app.image_label.bind("<Button-5>", self.app.event_handlers.handle_zoom)
+        self.app.image_label.bind("<Button-2>", self.app.event_handlers.handle_pan_start)
+        self.app.image_label.bind("<B2-Motion>", self.app.event_handlers.handle_pan)
+
+        # 撤销/重做快捷键。大写的 keysym 也要绑定，Caps Lock 打开时 Ctrl+Z 产生的是 <Control-Z>；
+        # 重做用带 Shift 修饰的绑定，Tk 会优先匹配修饰键更多的那一个
+        for key in ("<Control-z>", "<Control-Z>"):
+            self.root.bind(key, self.app.event_handlers.handle_undo)
+        for key in ("<Control-y>", "<Control-Y>", "<Control-Shift-Z>", "<Control-Shift-z>"):
+            self.root.bind(key, self.app.event_handlers.handle_redo)
+
+        # --- 视口缩放控制条 ---
+        view_controls_frame = tk.Frame(right_content_frame)
+        view_controls_frame.pack(fill=tk.X)
+        tk.Button(view_controls_frame, text="－", width=2,
+                  command=self.app.event_handlers.handle_zoom_out).pack(side=tk.LEFT)
+        tk.Button(view_controls_frame, text="＋", width=2,
+                  command=self.app.event_handlers.handle_zoom_in).pack(side=tk.LEFT, padx=(2, 0))
+        tk.Button(view_controls_frame, text="适应",
+                  command=self.app.event_handlers.handle_zoom_fit).pack(side=tk.LEFT, padx=(2, 0))
+        self.app.zoom_label = tk.Label(view_controls_frame, text="")
+        self.app.zoom_label.pack(side=tk.LEFT, padx=5)
 
         # --- 动画控制条 ---
         animation_controls_frame = tk.Frame(right_content_frame)
@@ -90,9 +127,32 @@ class UIManager:
         self.app.palette_container.pack(fill=tk.BOTH, expand=True)
 
 
+        tool_frame = tk.Frame(controls_frame)
+        tool_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(tool_frame, text="工具:").pack(side=tk.LEFT)
+        for tool in TOOLS:
+            tk.Radiobutton(tool_frame, text=TOOL_LABELS[tool], value=tool, variable=self.app.tool_var,
+                           indicatoron=False, padx=4).pack(side=tk.LEFT, padx=(2, 0))
+
         self.app.transparent_check = tk.Checkbutton(controls_frame, text="透明背景", var=self.app.transparent_var)
         self.app.transparent_check.pack(anchor='w', pady=(0, 5))
 
+        self.app.indexed_check = tk.Checkbutton(controls_frame, text="索引色 (P 模式)", var=self.app.indexed_var)
+        self.app.indexed_check.pack(anchor='w', pady=(0, 5))
+
+        self.app.perf_stats_check = tk.Checkbutton(controls_frame, text="性能统计", var=self.app.perf_stats_var)
+        self.app.perf_stats_check.pack(anchor='w', pady=(0, 5))
+
+        self.app.export_frames_check = tk.Checkbutton(controls_frame, text="同时导出逐帧PNG", var=self.app.export_frames_var)
+        self.app.export_frames_check.pack(anchor='w', pady=(0, 5))
+
+        preset_frame = tk.Frame(controls_frame)
+        preset_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(preset_frame, text="PNG 压缩:").pack(side=tk.LEFT)
+        self.app.export_preset_combo = ttk.Combobox(preset_frame, textvariable=self.app.export_preset_var,
+                                                    values=list(PNG_PRESETS), state='readonly', width=10)
+        self.app.export_preset_combo.pack(side=tk.LEFT, padx=5)
+
         duration_frame = tk.Frame(controls_frame)
         duration_frame.pack(fill=tk.X, pady=(0, 10))
         tk.Label(duration_frame, text="持续时间 (ms):").pack(side=tk.LEFT)
@@ -102,8 +162,20 @@ class UIManager:
         self.app.load_button = tk.Button(controls_frame, text="加载JSON文件...", command=self.app.file_io.load_json_file)
         self.app.load_button.pack(fill=tk.X, pady=(5, 5))
 
+        self.app.asset_browser_button = tk.Button(controls_frame, text="素材浏览器...", command=self.app.asset_browser.show)
+        self.app.asset_browser_button.pack(fill=tk.X, pady=(0, 5))
+
         self.app.render_button = tk.Button(controls_frame, text="渲染 / 播放动画", command=self.app.render_image)
         self.app.render_button.pack(fill=tk.X, pady=(0, 5))
 
+        self.app.render_progress = ttk.Progressbar(controls_frame, mode='determinate')
+        self.app.render_progress.pack(fill=tk.X, pady=(0, 5))
+
         self.app.save_button = tk.Button(controls_frame, text="另存为...", command=self.app.file_io.save_image, state=tk.DISABLED)
-        self.app.save_button.pack(fill=tk.X)
\ No newline at end of file
+        self.app.save_button.pack(fill=tk.X)
+
+        self.app.export_animation_button = tk.Button(controls_frame, text="导出动画...", command=self.app.file_io.save_animation)
+        self.app.export_animation_button.pack(fill=tk.X, pady=(5, 0))
+
+        self.app.export_binary_button = tk.Button(controls_frame, text="导出二进制...", command=self.app.file_io.save_binary)
+        self.app.export_binary_button.pack(fill=tk.X, pady=(5, 0))
\ No newline at end of file
@@ -0,0 +1,370 @@
+import itertools
+from array import array
+
+# NumPy 为可选依赖：存在时干净的整帧一次完成检查，否则逐行检查
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from frame_store import STORE_TYPECODES, Frame, FrameStore
+from palette import MAX_LUT_VALUE, compile_palette
+
+# 每份报告最多保留的问题条数，超出的只计数
+DEFAULT_MAX_ISSUES = 200
+# 问题级别：ERROR 会导致渲染失败或结果不确定，WARNING 的数据可以渲染，但会被补齐、裁剪或显示为透明
+ERROR = 'error'
+WARNING = 'warning'
+# 像素值允许的JSON标量类型（bool 是 int 的子类）；列表、对象等其他类型无法作为调色板键匹配
+_SCALAR_TYPES = (int, float, str, type(None))
+
+class ValidationIssue:
+    """一个校验问题：级别、说明以及所在的帧、行、列（不适用时为 None）。"""
+    __slots__ = ('level', 'message', 'frame', 'row', 'col')
+
+    def __init__(self, level, message, frame=None, row=None, col=None):
+        self.level = level
+        self.message = message
+        self.frame = frame
+        self.row = row
+        self.col = col
+
+    @property
+    def location(self):
+        """位置描述，例如 '第 2 帧 第 5 行 第 7 列'；文档级的问题返回空字符串。"""
+        parts = []
+        if self.frame is not None:
+            parts.append(f'第 {self.frame} 帧')
+        if self.row is not None:
+            parts.append(f'第 {self.row} 行')
+        if self.col is not None:
+            parts.append(f'第 {self.col} 列')
+        return ' '.join(parts)
+
+    def to_dict(self):
+        return {'level': self.level, 'message': self.message, 'frame': self.frame, 'row': self.row, 'col': self.col}
+
+    def __str__(self):
+        prefix = '错误' if self.level == ERROR else '警告'
+        location = self.location
+        return f'{prefix}: {location}: {self.message}' if location else f'{prefix}: {self.message}'
+
+class ValidationReport:
+    """
+    一次校验的结果。所有问题都会计数，但只保留前 max_issues 条，
+    避免整帧都是未知颜色之类的数据产生成千上万条重复的问题。
+    """
+    def __init__(self, max_issues=DEFAULT_MAX_ISSUES):
+        self.max_issues = max_issues
+        self.issues = []
+        self.error_count = 0
+        self.warning_count = 0
+
+    @property
+    def ok(self):
+        """没有错误时为 True（可以有警告）。"""
+        return self.error_count == 0
+
+    @property
+    def suppressed(self):
+        """超出 max_issues 而未保留的问题数。"""
+        return self.error_count + self.warning_count - len(self.issues)
+
+    def add(self, level, message, frame=None, row=None, col=None):
+        if level == ERROR:
+            self.error_count += 1
+        else:
+            self.warning_count += 1
+        if len(self.issues) < self.max_issues:
+            self.issues.append(ValidationIssue(level, message, frame, row, col))
+
+    def to_dict(self):
+        return {'ok': self.ok, 'errors': self.error_count, 'warnings': self.warning_count,
+                'issues': [issue.to_dict() for issue in self.issues]}
+
+def _canonical_int(key):
+    """键是规范的非负整数字符串（例如 '12'，而不是 '012' 或 '+1'）时返回对应的整数，否则返回 None。"""
+    if isinstance(key, str) and key.isdecimal() and key.isascii() and str(int(key)) == key:
+        return int(key)
+    return None
+
+def _check_canvas_size(data, report):
+    """:return: (宽, 高)，canvas_size 无效时返回 None。"""
+    canvas_size = data.get('canvas_size')
+    if canvas_size is None:
+        report.add(ERROR, "缺少 'canvas_size' 键。")
+        return None
+    if (not isinstance(canvas_size, (list, tuple)) or len(canvas_size) != 2
+            or not all(type(v) is int and v >= 0 for v in canvas_size)):
+        report.add(ERROR, f"'canvas_size' 必须是 [宽度, 高度] 两个非负整数，实际为 {canvas_size!r}。")
+        return None
+    return tuple(canvas_size)
+
+def _palette_mapping(palette):
+    """
+    为规范形式分配整数像素值：规范的整数键保持原值，其他键（例如 '01'、'a'）依次分配未被占用的整数；
+    未知的值和超出范围的单元格统一写为一个没有对应键的值（优先为 0），渲染为透明。
+
+    :return: (规范调色板, {原键: 新整数}, 透明填充值)。
+    """
+    used = {_canonical_int(key) for key in palette} - {None}
+    next_value = max(used, default=0) + 1
+    key_to_value = {}
+    normalized = {}
+    for key, color in palette.items():
+        value = _canonical_int(key)
+        if value is None:
+            value = next_value
+            next_value += 1
+        key_to_value[key] = value
+        normalized[str(value)] = color
+    fill_value = 0 if 0 not in used else next_value
+    return normalized, key_to_value, fill_value
+
+def _clean_value_mask(clean_values):
+    """干净像素值的布尔查找表（需要 NumPy）；没有 NumPy 或值过大时返回 None，只做逐行检查。"""
+    if np is None or max(clean_values) > MAX_LUT_VALUE:
+        return None
+    mask = np.zeros(max(clean_values) + 1, dtype=bool)
+    mask[list(clean_values)] = True
+    return mask
+
+def _clean_frame_array(frame, width, height, clean_mask):
+    """
+    整帧一次检查：帧恰好 高 x 宽，值都是整数（不含布尔值）并且都在 clean_mask 中时，
+    返回 (高, 宽) 的整数数组，否则返回 None，由调用方逐行定位问题。
+    """
+    if len(frame) != height:
+        return None
+    try:
+        arr = np.asarray(frame)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if arr.shape != (height, width) or arr.dtype.kind not in 'iu':
+        return None
+    if arr.size and (arr.min() < 0 or arr.max() >= len(clean_mask) or not clean_mask[arr].all()):
+        return None
+    # NumPy 会把混在整数中的布尔值转换为 0/1，而它们对应不同的调色板键
+    if not set(map(type, itertools.chain.from_iterable(frame))) <= {int}:
+        return None
+    return arr
+
+def _check_row(report, row, frame_index, row_index, width, clean_values, key_to_value, fill_value,
+               used_keys, normalize):
+    """
+    校验一行并返回规范形式（normalize 为 False 时返回 None）。
+    常见的干净行只需在C层完成几次整行检查；只有存在问题的行才逐个单元格定位并重新映射。
+    """
+    if isinstance(row, memoryview):
+        # 紧凑存储的帧：行长度由 Frame 保证，值都是整数
+        row = row.tolist()
+    elif not isinstance(row, list):
+        report.add(ERROR, f'行必须是列表，实际为 {type(row).__name__}。', frame_index, row_index)
+        return [fill_value] * width if normalize else None
+
+    if len(row) != width:
+        action = '右侧补齐为透明' if len(row) < width else '超出的部分被忽略'
+        report.add(WARNING, f'行的长度为 {len(row)}，画布宽度为 {width}，{action}。', frame_index, row_index)
+    if set(map(type, row)) <= {int}:
+        values = set(row)
+        if values <= clean_values:
+            # 干净的行：值都是整数并且都有对应的规范整数键（或为 0）
+            used_keys.update(values)
+            if not normalize:
+                return None
+            if len(row) == width:
+                return row
+            return row[:width] + [fill_value] * (width - len(row))
+
+    normalized = []
+    for col, value in enumerate(row[:width]):
+        key = str(value)
+        if type(value) is int and value in clean_values:
+            used_keys.add(value)
+            normalized.append(value)
+            continue
+        if not isinstance(value, _SCALAR_TYPES):
+            report.add(ERROR, f'像素值必须是整数，实际为 {type(value).__name__}。', frame_index, row_index, col)
+            normalized.append(fill_value)
+            continue
+        if key in key_to_value:
+            if type(value) is not int:
+                # 与渲染器一致按 str() 匹配，但紧凑存储和编辑器只接受整数
+                report.add(WARNING, f'像素值 {value!r} 的类型为 {type(value).__name__}，按键 {key!r} 匹配。',
+                           frame_index, row_index, col)
+            used_keys.add(key)
+            normalized.append(key_to_value[key])
+            continue
+        if value != 0 or type(value) is not int:
+            report.add(WARNING, f'像素值 {value!r} 不在调色板中，渲染为透明。', frame_index, row_index, col)
+        normalized.append(fill_value)
+    if not normalize:
+        return None
+    return normalized + [fill_value] * (width - len(normalized))
+
+def _check_frame(report, frame, frame_index, width, height, clean_values, clean_mask, key_to_value, fill_value,
+                 used_keys, normalize):
+    """
+    校验一帧并返回规范形式（normalize 为 False 时返回 None）：干净的帧原样返回 Frame 或整数数组，
+    其他帧返回补齐、重新映射后的行列表。
+    """
+    if isinstance(frame, Frame) and (frame.width, frame.height) == (width, height):
+        # 紧凑存储的帧形状已经规整，只需检查出现过的值
+        values = set(frame.buffer)
+        if values <= clean_values:
+            used_keys.update(values)
+            return frame if normalize else None
+    elif clean_mask is not None and isinstance(frame, list):
+        arr = _clean_frame_array(frame, width, height, clean_mask)
+        if arr is not None:
+            used_keys.update(np.flatnonzero(np.bincount(arr.ravel())).tolist())
+            return arr if normalize else None
+    elif not isinstance(frame, (list, Frame)):
+        report.add(ERROR, f'帧必须是行列表，实际为 {type(frame).__name__}。', frame_index)
+        return [[fill_value] * width for _ in range(height)] if normalize else None
+
+    if len(frame) != height:
+        action = '底部补齐为透明' if len(frame) < height else '超出的行被忽略'
+        report.add(WARNING, f'帧有 {len(frame)} 行，画布高度为 {height}，{action}。', frame_index)
+    rows = []
+    for row_index, row in enumerate(frame[:height]):
+        rows.append(_check_row(report, row, frame_index, row_index, width, clean_values, key_to_value,
+                               fill_value, used_keys, normalize))
+    if not normalize:
+        return None
+    rows.extend([fill_value] * width for _ in range(height - len(rows)))
+    return rows
+
+def _frames_to_store(frames, width, height, max_value):
+    """
+    把规范形式的帧（整数数组、Frame 或行列表）存为 FrameStore。值都已经检查过，
+    不必像 FrameStore.from_lists 那样再逐个扫描类型。max_value 超出 uint16 范围时返回 None。
+    """
+    for typecode in STORE_TYPECODES:
+        if max_value < 1 << (8 * array(typecode).itemsize):
+            break
+    else:
+        return None
+    store_frames = []
+    for frame in frames:
+        if isinstance(frame, Frame):
+            buffer = array(typecode, frame.buffer)
+        elif isinstance(frame, list):
+            buffer = array(typecode, itertools.chain.from_iterable(frame))
+        else:
+            buffer = array(typecode)
+            buffer.frombytes(frame.astype(np.dtype(typecode)).tobytes())
+        store_frames.append(Frame(buffer, width, height))
+    return FrameStore(store_frames, width, height)
+
+def _validate(data, max_issues, normalize):
+    report = ValidationReport(max_issues)
+    if not isinstance(data, dict):
+        report.add(ERROR, f'项目数据必须是JSON对象，实际为 {type(data).__name__}。')
+        return report, None
+
+    canvas_size = _check_canvas_size(data, report)
+
+    palette = data.get('palette', {})
+    if not isinstance(palette, dict):
+        report.add(ERROR, f"'palette' 必须是对象，实际为 {type(palette).__name__}。")
+        palette = {}
+    for key in palette:
+        if _canonical_int(key) is None:
+            report.add(WARNING, f'调色板键 {key!r} 不是规范的非负整数，整数像素值无法直接匹配它，规范形式中将重新编号。')
+    compiled = compile_palette(palette)
+    normalized_palette, key_to_value, fill_value = _palette_mapping(palette)
+    # 值为这些整数的单元格无需重新映射：规范的整数键，以及在没有 '0' 键时同样渲染为透明的 0
+    clean_values = {value for key, value in key_to_value.items() if str(value) == key}
+    clean_values.add(0)
+    clean_mask = _clean_value_mask(clean_values)
+
+    frames = data.get('frames')
+    if 'frames' in data and frames:
+        if not isinstance(frames, (list, FrameStore)):
+            report.add(ERROR, f"'frames' 必须是帧列表，实际为 {type(frames).__name__}。")
+            return report, None
+    elif 'pixels' in data:
+        frames = None
+        if not isinstance(data['pixels'], (list, Frame)):
+            report.add(ERROR, f"'pixels' 必须是行列表，实际为 {type(data['pixels']).__name__}。")
+    else:
+        report.add(ERROR, "项目数据必须包含 'pixels' 或非空的 'frames' 键。")
+        return report, None
+
+    if canvas_size is None:
+        return report, None
+    width, height = canvas_size
+    used_keys = set()
+    normalize = normalize and report.ok
+    if frames is not None:
+        normalized_frames = [_check_frame(report, frame, index, width, height, clean_values, clean_mask,
+                                          key_to_value, fill_value, used_keys, normalize)
+                             for index, frame in enumerate(frames)]
+    elif isinstance(data['pixels'], (list, Frame)):
+        normalized_frames = [_check_frame(report, data['pixels'], None, width, height, clean_values, clean_mask,
+                                          key_to_value, fill_value, used_keys, normalize)]
+    else:
+        normalized_frames = None
+
+    # 无法解析的颜色只有在实际用到时才会让渲染失败
+    for index, key in compiled.invalid_keys.items():
+        used = key in used_keys or _canonical_int(key) in used_keys
+        report.add(ERROR if used else WARNING,
+                   f'调色板键 {key!r} 的颜色 {palette[key]!r} 不是有效的十六进制颜色'
+                   + ('，渲染时会失败。' if used else '（未被使用）。'))
+
+    if not normalize or not report.ok or normalized_frames is None:
+        return report, None
+    normalized = {key: value for key, value in data.items() if key not in ('frames', 'pixels')}
+    normalized['canvas_size'] = [width, height]
+    normalized['palette'] = normalized_palette
+    store = _frames_to_store(normalized_frames, width, height, max(max(key_to_value.values(), default=0), fill_value))
+    if store is None:
+        # 值超出 uint16 范围时保留行列表；干净的行可能与输入共享，复制一份
+        normalized_frames = [[list(row) for row in frame] if isinstance(frame, list) else frame.tolist()
+                             for frame in normalized_frames]
+    if frames is not None:
+        normalized['frames'] = store if store is not None else normalized_frames
+    else:
+        normalized['pixels'] = store[0] if store is not None else normalized_frames[0]
+    return report, normalized
+
+def validate_document(data, max_issues=DEFAULT_MAX_ISSUES):
+    """
+    一次遍历校验整个项目文档，报告所有问题及其所在的帧、行、列。
+    :return: ValidationReport。
+    """
+    report, _ = _validate(data, max_issues, normalize=False)
+    return report
+
+def validate_and_normalize(data, max_issues=DEFAULT_MAX_ISSUES):
+    """
+    在校验的同一次遍历中生成规范形式：每帧恰好 高 x 宽（短的行补齐为透明，多余的裁剪），
+    所有像素值都是整数并且是调色板中规范的整数键，或是没有对应键的透明填充值。
+    规范形式尽可能存为 FrameStore / Frame，渲染器直接走整帧查表的快速路径，无需逐像素的 str() 和越界检查；
+    非整数的像素值（负数、布尔值、字符串等）与渲染器一样按 str() 匹配调色板键，
+    因此无论透明背景开或关，渲染结果都与原始数据完全一致。
+
+    :return: (ValidationReport, 规范形式的项目数据)。存在错误时规范形式为 None。
+    """
+    return _validate(data, max_issues, normalize=True)
+
+def prepare_document(data, max_issues=DEFAULT_MAX_ISSUES):
+    """
+    渲染前的摄取阶段：校验文档并返回规范形式，渲染器随后对每帧走整帧查表的快速路径。
+    存在错误时引发 ValueError，消息中列出前几个错误及其位置。
+    """
+    report, normalized = validate_and_normalize(data, max_issues)
+    if normalized is None:
+        errors = [f'{issue.location}: {issue.message}' if issue.location else issue.message
+                  for issue in report.issues if issue.level == ERROR]
+        raise ValueError(f"项目数据有 {report.error_count} 个错误: {'; '.join(errors[:5])}")
+    return normalized
+
+def iter_issue_lines(report):
+    """逐行产生报告中的问题，最后说明被省略的条数。"""
+    for issue in report.issues:
+        yield str(issue)
+    if report.suppressed:
+        yield f'……另有 {report.suppressed} 个问题未列出。'
@@ -0,0 +1,273 @@
+import math
+from collections import OrderedDict
+
+from PIL import Image
+
+from renderer import nearest_resize_spans
+
+# 预览区域的默认大小（屏幕像素）
+DEFAULT_VIEW_SIZE = 256
+# 可用的缩放级别（每个画布像素对应的屏幕像素数）。小于1的级别都是 1/2^k，保证整块瓦片的屏幕尺寸是整数
+ZOOM_LEVELS = (1 / 32, 1 / 16, 1 / 8, 1 / 4, 1 / 2, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48, 64)
+# 瓦片的目标边长（屏幕像素）
+TILE_SCREEN_SIZE = 128
+# 缓存的瓦片数上限，超出时淘汰最久未使用的瓦片
+TILE_CACHE_SIZE = 512
+# 缓存的视口图像数上限：固定缩放和平移下播放动画时，每一帧拼接好的视口图像直接复用
+VIEW_CACHE_SIZE = 64
+
+def indexed_colors(pil_image):
+    """返回索引色图像每个索引对应的 RGBA 颜色，与 convert('RGBA') 的结果一致。"""
+    palette = pil_image.getpalette() or []
+    transparency = pil_image.info.get('transparency')
+    return [tuple(palette[i:i + 3]) + (0 if i // 3 == transparency else 255,)
+            for i in range(0, len(palette), 3)]
+
+class Viewport:
+    """
+    可缩放、可平移的预览视口：只渲染屏幕上可见的区域。
+
+    帧图像按当前缩放级别切分为瓦片，每块瓦片只在第一次可见时缩放一次并缓存（LRU）；
+    重绘时只把可见的瓦片拼接到视口大小的图像上，编辑时只修补受影响瓦片中的像素块。
+    拼接好的视口图像也按帧缓存（LRU），缩放和平移不变时播放动画只是切换已有的图像。
+    因此预览和编辑的开销与视口（屏幕）大小成正比，而不是与画布大小成正比。
+    本类不依赖Tk，屏幕坐标均相对于视口左上角。
+    """
+    def __init__(self, view_width=DEFAULT_VIEW_SIZE, view_height=DEFAULT_VIEW_SIZE):
+        """
+        :param view_width: 视口宽度（屏幕像素）。
+        :param view_height: 视口高度（屏幕像素）。
+        """
+        self.view_width = view_width
+        self.view_height = view_height
+        self.canvas_size = (0, 0)
+        self.zoom = 1
+        self.pan_x = 0  # 画布左上角在视口中的屏幕坐标
+        self.pan_y = 0
+        self.tiles = OrderedDict()  # (id(帧图像), 瓦片列, 瓦片行) -> (帧图像, 瓦片图像)，只包含当前缩放级别
+        self.views = OrderedDict()  # (id(帧图像), 缩放, 平移, 版本) -> (帧图像, 视口图像)
+        self.view_image = None
+        self._view_key = None  # 上一次拼接时的 (帧图像, 缩放, 平移, 版本)
+        self._version = 0      # 瓦片内容被修改时递增
+
+    # --- 变换 ---
+
+    def reset(self, canvas_width, canvas_height):
+        """画布尺寸变化（例如渲染了新的数据）时调用：清空瓦片缓存并缩放到适应视口。"""
+        self.canvas_size = (canvas_width, canvas_height)
+        self.clear()
+        self.fit()
+
+    def fit(self):
+        """选择能完整显示画布的最大缩放级别，并居中。"""
+        canvas_width, canvas_height = self.canvas_size
+        fitting = [zoom for zoom in ZOOM_LEVELS
+                   if canvas_width * zoom <= self.view_width and canvas_height * zoom <= self.view_height]
+        self._set_zoom(fitting[-1] if fitting else ZOOM_LEVELS[0], None, None)
+        self.pan_x, self.pan_y = self._clamp_pan(0, 0, center=True)
+
+    def zoom_by(self, steps, screen_x=None, screen_y=None):
+        """
+        按缩放级别放大（steps > 0）或缩小（steps < 0），保持 (screen_x, screen_y) 下的画布位置不动，
+        省略时以视口中心为基准。
+        :return: 缩放级别是否发生了变化。
+        """
+        index = min(range(len(ZOOM_LEVELS)), key=lambda i: abs(ZOOM_LEVELS[i] - self.zoom))
+        index = max(0, min(len(ZOOM_LEVELS) - 1, index + steps))
+        if ZOOM_LEVELS[index] == self.zoom:
+            return False
+        if screen_x is None:
+            screen_x, screen_y = self.view_width // 2, self.view_height // 2
+        self._set_zoom(ZOOM_LEVELS[index], screen_x, screen_y)
+        return True
+
+    def _set_zoom(self, zoom, screen_x, screen_y):
+        if screen_x is not None:
+            # 锚点下的画布坐标在缩放前后保持不变
+            canvas_x = (screen_x - self.pan_x) / self.zoom
+            canvas_y = (screen_y - self.pan_y) / self.zoom
+            self.pan_x, self.pan_y = self._clamp_pan(round(screen_x - canvas_x * zoom),
+                                                     round(screen_y - canvas_y * zoom), zoom=zoom)
+        if zoom != self.zoom:
+            # 只缓存当前缩放级别的瓦片，编辑时也只需修补这一级
+            self.clear()
+        self.zoom = zoom
+
+    def pan_by(self, dx, dy):
+        """
+        平移视口（屏幕像素）。画布小于视口的方向保持居中。
+        :return: 平移位置是否发生了变化。
+        """
+        pan = self._clamp_pan(self.pan_x + dx, self.pan_y + dy)
+        if pan == (self.pan_x, self.pan_y):
+            return False
+        self.pan_x, self.pan_y = pan
+        return True
+
+    def _clamp_pan(self, pan_x, pan_y, zoom=None, center=False):
+        """把平移限制在画布覆盖视口的范围内；画布比视口小的方向居中显示。"""
+        screen_width, screen_height = self.screen_size(zoom)
+        def clamp(pan, screen_length, view_length):
+            if screen_length <= view_length:
+                return (view_length - screen_length) // 2
+            if center:
+                return -(screen_length - view_length) // 2
+            return max(view_length - screen_length, min(0, pan))
+        return clamp(pan_x, screen_width, self.view_width), clamp(pan_y, screen_height, self.view_height)
+
+    def screen_size(self, zoom=None):
+        """整个画布在当前（或给定）缩放级别下的屏幕尺寸。"""
+        zoom = self.zoom if zoom is None else zoom
+        canvas_width, canvas_height = self.canvas_size
+        return math.ceil(canvas_width * zoom), math.ceil(canvas_height * zoom)
+
+    def screen_to_grid(self, screen_x, screen_y):
+        """
+        将视口中的屏幕坐标转换为像素网格坐标。
+        :return: (行, 列) 元组，坐标不在画布上时返回 None。
+        """
+        if not (0 <= screen_x < self.view_width and 0 <= screen_y < self.view_height):
+            return None
+        col = math.floor((screen_x - self.pan_x) / self.zoom)
+        row = math.floor((screen_y - self.pan_y) / self.zoom)
+        canvas_width, canvas_height = self.canvas_size
+        if not (0 <= col < canvas_width and 0 <= row < canvas_height):
+            return None
+        return row, col
+
+    # --- 瓦片 ---
+
+    @property
+    def tile_cells(self):
+        """当前缩放级别下一块瓦片覆盖的画布像素数（边长）。"""
+        if self.zoom >= 1:
+            return max(1, TILE_SCREEN_SIZE // int(self.zoom))
+        return int(TILE_SCREEN_SIZE / self.zoom)
+
+    def _tile_bounds(self, tile_x, tile_y):
+        """:return: 瓦片覆盖的画布区域 (左, 上, 右, 下)。"""
+        cells = self.tile_cells
+        canvas_width, canvas_height = self.canvas_size
+        return (tile_x * cells, tile_y * cells,
+                min((tile_x + 1) * cells, canvas_width), min((tile_y + 1) * cells, canvas_height))
+
+    def _get_tile(self, pil_image, tile_x, tile_y):
+        """返回缓存的瓦片图像，不存在时从帧图像裁剪并按最近邻缩放。"""
+        key = (id(pil_image), tile_x, tile_y)
+        entry = self.tiles.get(key)
+        if entry is not None and entry[0] is pil_image:
+            self.tiles.move_to_end(key)
+            return entry[1]
+
+        left, top, right, bottom = self._tile_bounds(tile_x, tile_y)
+        tile = pil_image.crop((left, top, right, bottom))
+        # 索引色图像先转换为 RGBA，Tk 才能正确显示透明像素
+        if tile.mode != 'RGBA':
+            tile = tile.convert('RGBA')
+        size = (math.ceil((right - left) * self.zoom), math.ceil((bottom - top) * self.zoom))
+        if size != tile.size:
+            tile = tile.resize(size, Image.NEAREST)
+
+        # 同时保存帧图像的引用，保证 id() 在缓存期间不会被复用
+        self.tiles[key] = (pil_image, tile)
+        while len(self.tiles) > TILE_CACHE_SIZE:
+            self.tiles.popitem(last=False)
+        return tile
+
+    def visible_tiles(self):
+        """:return: 与视口相交的 (瓦片列, 瓦片行) 列表。"""
+        canvas_width, canvas_height = self.canvas_size
+        if canvas_width <= 0 or canvas_height <= 0:
+            return []
+        cells = self.tile_cells
+        tile_screen = cells * self.zoom
+        screen_width, screen_height = self.screen_size()
+        def tile_range(pan, view_length, screen_length, canvas_length):
+            first = max(0, -pan)
+            last = min(screen_length, view_length - pan) - 1
+            if last < first:
+                return range(0)
+            count = math.ceil(canvas_length / cells)
+            return range(int(first // tile_screen), min(count, int(last // tile_screen) + 1))
+        return [(tile_x, tile_y)
+                for tile_y in tile_range(self.pan_y, self.view_height, screen_height, canvas_height)
+                for tile_x in tile_range(self.pan_x, self.view_width, screen_width, canvas_width)]
+
+    def render(self, pil_image):
+        """
+        拼接帧图像在视口中可见的部分。已经拼接过的 (帧, 缩放, 平移, 内容) 直接返回缓存的图像，
+        返回的图像不应被修改。
+        :return: 视口大小的 RGBA 图像；与上一次的结果相同（帧、变换和内容都未变化）时返回 None。
+        """
+        if pil_image.size != self.canvas_size:
+            self.reset(*pil_image.size)
+        key = (pil_image, self.zoom, self.pan_x, self.pan_y, self._version)
+        if self._view_key is not None and self._view_key[0] is pil_image and self._view_key[1:] == key[1:]:
+            return None
+
+        cache_key = (id(pil_image),) + key[1:]
+        entry = self.views.get(cache_key)
+        if entry is not None and entry[0] is pil_image:
+            self.views.move_to_end(cache_key)
+            view = entry[1]
+        else:
+            view = Image.new('RGBA', (self.view_width, self.view_height), (0, 0, 0, 0))
+            tile_screen = self.tile_cells * self.zoom
+            for tile_x, tile_y in self.visible_tiles():
+                view.paste(self._get_tile(pil_image, tile_x, tile_y),
+                           (self.pan_x + int(tile_x * tile_screen), self.pan_y + int(tile_y * tile_screen)))
+            # 同时保存帧图像的引用，保证 id() 在缓存期间不会被复用
+            self.views[cache_key] = (pil_image, view)
+            while len(self.views) > VIEW_CACHE_SIZE:
+                self.views.popitem(last=False)
+        self.view_image = view
+        self._view_key = key
+        return view
+
+    def update_cells(self, pil_image, cells):
+        """
+        把帧图像中发生变化的像素写入已缓存的瓦片，只修补对应的像素块，不重新缩放。
+        尚未缓存的瓦片会在下次可见时从帧图像重新生成，无需处理。
+        :param cells: 发生变化的 (行, 列) 坐标序列。
+        """
+        cells_per_tile = self.tile_cells
+        canvas_width, canvas_height = self.canvas_size
+        source_pixels = pil_image.load()
+        colors = indexed_colors(pil_image) if pil_image.mode == 'P' else None
+        image_id = id(pil_image)
+        for row, col in cells:
+            if not (0 <= row < canvas_height and 0 <= col < canvas_width):
+                continue
+            tile_x, tile_y = col // cells_per_tile, row // cells_per_tile
+            entry = self.tiles.get((image_id, tile_x, tile_y))
+            if entry is None or entry[0] is not pil_image:
+                continue
+            tile = entry[1]
+            left, top, right, bottom = self._tile_bounds(tile_x, tile_y)
+            x0, x1 = nearest_resize_spans(right - left, tile.width)[col - left]
+            y0, y1 = nearest_resize_spans(bottom - top, tile.height)[row - top]
+            if x1 > x0 and y1 > y0:
+                color = source_pixels[col, row]
+                if colors is not None:
+                    color = colors[color]
+                tile.paste(color, (x0, y0, x1, y1))
+        # 已拼接的视口图像都包含修改前的像素
+        self.views.clear()
+        self._version += 1
+
+    def discard(self, pil_image):
+        """丢弃某一帧图像的所有瓦片，例如该帧被重新渲染、替换之后。"""
+        image_id = id(pil_image)
+        for key in [key for key, entry in self.tiles.items() if key[0] == image_id and entry[0] is pil_image]:
+            del self.tiles[key]
+        for key in [key for key, entry in self.views.items() if key[0] == image_id and entry[0] is pil_image]:
+            del self.views[key]
+        self._version += 1
+
+    def clear(self):
+        """清空瓦片和视口图像的缓存，例如重新渲染或切换透明背景后。"""
+        self.tiles.clear()
+        self.views.clear()
+        self.view_image = None
+        self._view_key = None
+        self._version += 1
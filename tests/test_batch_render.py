@@ -0,0 +1,36 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from batch_render import collect_inputs, render_batch
+
+ASSET = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'blue_slime_idle.json')
+
+class OutputClashTest(unittest.TestCase):
+    """不同来源中的同名文件不能静默地覆盖彼此的输出。"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for name in ('x/a.json', 'y/a.json', 'y/b.json'):
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(ASSET, path)
+
+    def test_clashing_outputs_are_reported(self):
+        sources = [os.path.join(self.root, 'x'), os.path.join(self.root, 'y')]
+        output_dir = os.path.join(self.root, 'out')
+        summary = render_batch(collect_inputs(sources), output_dir, jobs=1)
+
+        self.assertEqual((summary['total'], summary['succeeded'], summary['failed']), (3, 2, 1))
+        failed = [r for r in summary['files'] if not r['ok']]
+        self.assertEqual(failed[0]['input'], os.path.join(self.root, 'y', 'a.json'))
+        self.assertIn('冲突', failed[0]['error'])
+        self.assertEqual(sorted(os.listdir(output_dir)), ['a.png', 'b.png'])
+
+if __name__ == '__main__':
+    unittest.main()
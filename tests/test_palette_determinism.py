@@ -0,0 +1,36 @@
+import hashlib
+import os
+import subprocess
+import sys
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+ASSET = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'blue_slime_idle.json')
+
+# 在子进程中渲染为索引色PNG，输出PNG字节的摘要
+_RENDER_SCRIPT = """
+import hashlib, io, json, sys
+from renderer import render_from_data
+with open(sys.argv[1], 'r', encoding='utf-8') as f:
+    data = json.load(f)
+images, sprite_sheet = render_from_data(data, True, indexed=True)
+buffer = io.BytesIO()
+(sprite_sheet or images[0]).save(buffer, 'PNG')
+print(hashlib.md5(buffer.getvalue()).hexdigest())
+"""
+
+class PaletteDeterminismTest(unittest.TestCase):
+    """稠密索引按调色板键的原顺序分配，索引色输出不能随进程的哈希种子变化。"""
+
+    def render_digest(self, hash_seed):
+        env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+        result = subprocess.run([sys.executable, '-c', _RENDER_SCRIPT, ASSET], cwd=SRC_DIR, env=env,
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+
+    def test_indexed_png_independent_of_hash_seed(self):
+        digests = {self.render_digest(seed) for seed in (1, 2, 3, 4)}
+        self.assertEqual(len(digests), 1, digests)
+
+if __name__ == '__main__':
+    unittest.main()
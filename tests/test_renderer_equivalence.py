@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import renderer
+from palette import compile_palette
+
+PALETTE = {'0': '#000000', '1': '#FF0000', '2': '#00FF00', '-1': '#0000FF', 'True': '#FFFF00', 'a': '#00FFFF'}
+
+class VectorizedEquivalenceTest(unittest.TestCase):
+    """NumPy 向量化路径与逐像素路径的输出必须逐字节一致。"""
+
+    def assert_same(self, pixel_data, palette, width=4, height=3):
+        compiled = compile_palette(palette)
+        for transparent_bg in (False, True):
+            for indexed in (False, True):
+                indexed = indexed and compiled.supports_indexed()
+                with self.subTest(pixels=pixel_data, palette=palette, transparent_bg=transparent_bg, indexed=indexed):
+                    expected = renderer._create_image_per_pixel(pixel_data, compiled, width, height,
+                                                                transparent_bg, indexed)
+                    actual = renderer._create_image_vectorized(pixel_data, compiled, width, height,
+                                                               transparent_bg, indexed)
+                    self.assertEqual(actual.mode, expected.mode)
+                    self.assertEqual(actual.tobytes(), expected.tobytes())
+
+    def test_regular_ints(self):
+        self.assert_same([[0, 1, 2, 1], [2, 2, 0, 1], [1, 0, 0, 2]], PALETTE)
+
+    def test_no_int_keys(self):
+        self.assert_same([[0, 1, 2, 1], [2, 2, 0, 1], [1, 0, 0, 2]], {'a': '#FF0000', '01': '#00FF00'})
+
+    def test_missing_palette(self):
+        self.assert_same([[0, 1, 2, 1], [2, 2, 0, 1]], {})
+
+    def test_negative_values(self):
+        self.assert_same([[-1, 1, 2, 1], [2, -1, 0, 1], [1, 0, -5, 2]], PALETTE)
+        self.assert_same([[0, 1], [-1]], PALETTE)
+
+    def test_bools_mixed_with_ints(self):
+        self.assert_same([[True, 1, 2, False], [2, 2, 0, 1], [1, 0, True, 2]], PALETTE)
+        self.assert_same([[True, False, True, True], [False] * 4, [True] * 4], PALETTE)
+        self.assert_same([[0, 1, True], [1, 2]], PALETTE)
+
+    def test_ragged_and_mixed_rows(self):
+        self.assert_same([[0, 1, 2, 1, 2, 2], [2], [], [1, 'a', '2', 1.0]], PALETTE)
+        self.assert_same([[0, 1], [70000, 1, 2, 0]], PALETTE)
+
+if __name__ == '__main__':
+    unittest.main()